@@ -0,0 +1,457 @@
+"""Benchmarks run by `cmilker bench`.
+
+Each benchmark runs in a fresh interpreter (so import caches and Qt state
+don't leak between runs) under the offscreen platform plugin, and reports
+its median timings in milliseconds. Screenshots are synthetic and grabs go
+through ReplayCaptureBackend, so no display or screencapture is needed.
+Results can be saved as a JSON baseline and later runs compared with it.
+This module imports only the standard library; the probes themselves run
+in the child processes.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RUNS = 5
+WARMUP_RUNS = 1 # In-process probes discard their first run (lazy imports, first-use caches)
+SCREEN_SIZE = (2560, 1600) # Synthetic screenshot, about a laptop's retina screen
+SELECTION_SIZE = 256 # Side of the selection reduced per sample mode
+PALETTE_SIZES = ((10, "10"), (1000, "1k"), (100_000, "100k"))
+EXPORT_SIZES = ((100_000, "100k"), (1_000_000, "1m"))
+LIBRARY_PALETTES = (500, 2000) # Palettes x colors in the searched library: 1M colors
+LIBRARY_SEARCHES = (("orange_r5", 0xFF8800, 5.0), ("grey_r5", 0x808080, 5.0), ("white_r5", 0xFFFFFF, 5.0),
+                    ("blue_r15", 0x3366CC, 15.0)) # Greys and white are the densest regions
+CONTRAST_SIZE = 10_000 # Colors in the contrast-checked palette: 50M pairs
+FRAME_COUNT = 20 # Frames per sampled sequence, each a 1920x1080 synthetic screenshot
+
+
+def _child_env(data_dir):
+    """Environment for a benchmark child: offscreen Qt, src/ importable, a throwaway autosave directory."""
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen", CMILKER_DATA_DIR=data_dir,
+               CMILKER_SOCKET=os.path.join(data_dir, "cmilker.sock"))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [SRC_DIR, env.get("PYTHONPATH")]))
+    return env
+
+
+# --- Startup ---
+def startup_probe():
+    """Child side of the startup benchmark: times MainWindow up to its first paint.
+
+    Prints one JSON object of stage timings (ms since the probe started) and
+    the wall-clock time of the first paint, so the parent can add interpreter
+    startup.
+    """
+    start = time.perf_counter()
+    marks = {}
+
+    def mark(name):
+        marks[name] = (time.perf_counter() - start) * 1000
+
+    import main
+    mark("import")
+    from PyQt6.QtCore import QEvent, QObject, QTimer
+    from PyQt6.QtWidgets import QApplication
+    app = QApplication([sys.argv[0]])
+    app.setApplicationName("Color Milker")
+    mark("application")
+    window = main.MainWindow()
+    mark("window")
+    finish_startup = window.finish_startup
+
+    def ready():
+        # The deferred work MainWindow schedules after its first paint
+        finish_startup()
+        mark("ready")
+        QTimer.singleShot(0, app.quit)
+
+    window.finish_startup = ready
+
+    class FirstPaint(QObject):
+        def eventFilter(self, watched, event):
+            if event.type() == QEvent.Type.Paint and "first_paint" not in marks:
+                mark("first_paint")
+                marks["first_paint_epoch"] = time.time()
+            return False
+
+    first_paint = FirstPaint()
+    window.installEventFilter(first_paint)
+    window.show()
+    app.exec()
+    window.close()
+    print(json.dumps(marks))
+
+
+def bench_startup(runs=DEFAULT_RUNS):
+    """Median time to MainWindow's first paint, with an empty autosave directory."""
+    samples = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as data_dir:
+            launched = time.time()
+            result = subprocess.run([sys.executable, "-c", "import benchmarks; benchmarks.startup_probe()"],
+                                    env=_child_env(data_dir), cwd=SRC_DIR, capture_output=True, text=True,
+                                    check=True)
+        marks = json.loads(result.stdout.strip().splitlines()[-1])
+        marks["first_paint_wall"] = (marks.pop("first_paint_epoch") - launched) * 1000
+        samples.append(marks)
+    return {name: round(statistics.median(sample[name] for sample in samples), 2) for name in samples[0]}
+
+
+# --- In-process benchmarks ---
+def _run_probe(probe, runs):
+    """Runs benchmarks.<probe> in a fresh interpreter; returns the medians of its samples after warm-up."""
+    with tempfile.TemporaryDirectory() as data_dir:
+        result = subprocess.run([sys.executable, "-c", f"import benchmarks; benchmarks.{probe}({WARMUP_RUNS + runs})"],
+                                env=_child_env(data_dir), cwd=SRC_DIR, capture_output=True, text=True, check=True)
+    samples = json.loads(result.stdout.strip().splitlines()[-1])
+    return {name: round(statistics.median(values[WARMUP_RUNS:]), 3) for name, values in samples.items()}
+
+
+def _timed(samples, name, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    samples.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+    return result
+
+
+def _application():
+    from PyQt6.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([sys.argv[0]])
+
+
+def synthetic_screenshot(width=SCREEN_SIZE[0], height=SCREEN_SIZE[1], seed=0):
+    """A screenshot-like QImage: flat panels, gradients and some noise, so no reduction hits a shortcut."""
+    import numpy as np
+    from PyQt6.QtGui import QImage
+
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    pixels = np.empty((height, width, 4), dtype=np.uint8)
+    pixels[..., 0] = (x * 255 // max(width - 1, 1)) # BGRA in memory (Format_RGB32)
+    pixels[..., 1] = (y * 255 // max(height - 1, 1))
+    pixels[..., 2] = ((x // 64 + y // 64) % 8) * 32
+    pixels[..., 3] = 255
+    pixels[..., :3] ^= rng.integers(0, 8, size=(height, width, 3), dtype=np.uint8)
+    image = QImage(pixels.data, width, height, width * 4, QImage.Format.Format_RGB32)
+    return image.copy() # Detach from the NumPy buffer
+
+
+def _palette_colors(count, seed=0):
+    import numpy as np
+    # Distinct colors, so deduplication never shrinks the workload
+    rng = np.random.default_rng(seed)
+    return rng.choice(1 << 24, size=count, replace=False).astype(np.uint32)
+
+
+def grab_probe(runs):
+    """Child side of the grab benchmark: screenshot decode, pixel reduction and a full replay grab."""
+    from PyQt6.QtCore import QEventLoop, QRect, QTimer
+    from PyQt6.QtGui import QImage, QPixmap
+    from capture import ReplayCaptureBackend, _render_region
+    from grabber import ScreenColorGrabber
+    from sampling import SampleMode
+
+    app = _application()
+    screenshot = synthetic_screenshot()
+    screen_pixmap = QPixmap.fromImage(screenshot) # What QScreenCaptureBackend crops a selection from
+    selection = screenshot.copy(QRect(1000, 600, SELECTION_SIZE, SELECTION_SIZE))
+    samples = {}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "screen.png")
+        screenshot.save(path)
+        grabber = ScreenColorGrabber(backend=ReplayCaptureBackend([path]))
+        grabber.sample_mode = SampleMode.MEDIAN
+        loop = QEventLoop()
+        grabber.grabbing_finished.connect(loop.quit)
+        for _ in range(runs):
+            _timed(samples, "decode_png", QImage, path)
+            for mode in SampleMode:
+                _timed(samples, f"reduce_{mode.value}", ScreenColorGrabber._get_color_from_screenshot, selection, mode)
+            _timed(samples, "reduce_median_full", ScreenColorGrabber._get_color_from_screenshot, screenshot,
+                   SampleMode.MEDIAN)
+            for mode in (SampleMode.CENTER, SampleMode.MEDIAN): # Full-screen selection to the sampled QImage
+                _timed(samples, f"render_{mode.value}_full", _render_region, screen_pixmap, screen_pixmap.rect(), mode)
+
+            def grab():
+                QTimer.singleShot(0, grabber.start_grabbing)
+                loop.exec()
+            _timed(samples, "replay_grab", grab) # Decode and reduce on the pool, result back on the GUI thread
+    app.processEvents()
+    print(json.dumps(samples))
+
+
+def palette_probe(runs):
+    """Child side of the palette benchmark: adding colors to, clearing and restoring a visible PaletteWindow."""
+    from PyQt6.QtGui import QColor
+    from palette_window import PaletteWindow
+
+    app = _application()
+    samples = {}
+    for _ in range(runs):
+        for count, label in PALETTE_SIZES:
+            window = PaletteWindow()
+            window.show()
+            app.processEvents()
+            colors = [QColor.fromRgb(int(rgb)) for rgb in _palette_colors(count)]
+
+            def add_one_by_one():
+                for color in colors:
+                    window.add_color(color)
+                app.processEvents() # Includes the view update
+            _timed(samples, f"add_color_{label}", add_one_by_one)
+            window.model.clear()
+            app.processEvents()
+
+            packed = _palette_colors(count, seed=1)
+
+            def add_bulk():
+                window.add_colors(packed)
+                app.processEvents()
+            _timed(samples, f"add_colors_{label}", add_bulk)
+
+            def clear():
+                window.clear_palette()
+                app.processEvents()
+            _timed(samples, f"clear_{label}", clear)
+
+            def undo_clear():
+                window.history.undo()
+                app.processEvents()
+            _timed(samples, f"undo_clear_{label}", undo_clear)
+            window.close()
+            window.deleteLater()
+            app.processEvents()
+    print(json.dumps(samples))
+
+
+def export_probe(runs):
+    """Child side of the export benchmark: writing the JSON and CSV exports to disk."""
+    import numpy as np
+    from exporters import export_palette
+    from palette_store import OPAQUE
+
+    samples = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for count, label in EXPORT_SIZES:
+            colors = _palette_colors(count) | np.uint32(OPAQUE)
+            for fmt in ("json", "csv"):
+                path = os.path.join(directory, f"palette.{fmt}")
+                for _ in range(runs):
+                    _timed(samples, f"{fmt}_{label}", export_palette, colors, path, fmt)
+    print(json.dumps(samples))
+
+
+def library_probe(runs):
+    """Child side of the library benchmark: color searches over a 1M-color library, and saving into it."""
+    import numpy as np
+    from library import PaletteLibrary
+
+    rng = np.random.default_rng(0)
+    palettes, size = LIBRARY_PALETTES
+
+    def palette_colors():
+        # Mostly arbitrary colors plus a band of near-greys, as UI palettes tend to have
+        greys = rng.integers(0, 256, size // 4).astype(np.uint32) * np.uint32(0x010101)
+        greys ^= rng.integers(0, 4, len(greys)).astype(np.uint32)
+        return np.concatenate([rng.integers(0, 1 << 24, size - len(greys), dtype=np.uint32), greys])
+
+    samples = {}
+    with tempfile.TemporaryDirectory() as directory:
+        with PaletteLibrary(os.path.join(directory, "library.sqlite3")) as library:
+            library.add_palettes((f"Palette {index}", palette_colors(), ("bench",) if index % 4 == 0 else (), "bench")
+                                 for index in range(palettes))
+            for _ in range(runs):
+                for name, rgb, radius in LIBRARY_SEARCHES:
+                    _timed(samples, f"search_{name}", library.search, rgb, radius)
+                _timed(samples, "search_grey_r5_tagged", library.search, 0x808080, 5.0, 50, "bench")
+                _timed(samples, "list", library.palettes)
+                _timed(samples, "save_2k", library.add_palette, "Saved", palette_colors())
+    print(json.dumps(samples))
+
+
+def contrast_probe(runs):
+    """Child side of the contrast benchmark: level counts, full WCAG/APCA matrices and the passing pairs."""
+    from contrast import LEVELS, contrast_blocks, passing_pairs, summarize
+
+    def exhaust(blocks):
+        for _ in blocks:
+            pass
+
+    colors = _palette_colors(CONTRAST_SIZE)
+    samples = {}
+    for _ in range(runs):
+        _timed(samples, "summary", summarize, colors)
+        _timed(samples, "wcag_matrix", exhaust, contrast_blocks(colors, "wcag"))
+        _timed(samples, "apca_matrix", exhaust, contrast_blocks(colors, "apca"))
+        _timed(samples, "pairs_aa", exhaust, passing_pairs(colors, LEVELS["AA"]))
+    print(json.dumps(samples))
+
+
+def frames_probe(runs):
+    """Child side of the frames benchmark: sampling fixed targets across JPEG and PNG sequences."""
+    from frames import Target, iter_samples
+
+    def sample(paths, targets):
+        for _, frames, error in iter_samples(paths, targets, "median"): # In this process
+            if error is not None:
+                raise RuntimeError(error)
+
+    cases = (("jpeg_top", "jpg", [Target("point", 40, 30, 1, 1), Target("logo", 100, 60, 32, 32)]),
+             ("jpeg_bottom", "jpg", [Target("point", 1800, 1000, 1, 1)]),
+             ("jpeg_full_frame", "jpg", [Target("frame", 0, 0, 1920, 1080)]),
+             ("png_top", "png", [Target("point", 40, 30, 1, 1), Target("logo", 100, 60, 32, 32)]))
+    samples = {}
+    with tempfile.TemporaryDirectory() as directory:
+        image = synthetic_screenshot(1920, 1080)
+        sequences = {}
+        for extension in ("jpg", "png"):
+            sequences[extension] = [os.path.join(directory, f"frame_{index:04}.{extension}") for index in range(FRAME_COUNT)]
+            for path in sequences[extension]:
+                image.save(path, quality=90)
+        for _ in range(runs):
+            for name, extension, targets in cases:
+                _timed(samples, name, sample, sequences[extension], targets)
+    print(json.dumps(samples))
+
+
+def bench_grab(runs=DEFAULT_RUNS):
+    """Decoding a synthetic screenshot, reducing a selection per sample mode, and a full replay grab."""
+    return _run_probe("grab_probe", runs)
+
+
+def bench_palette(runs=DEFAULT_RUNS):
+    """PaletteWindow.add_color one by one, add_colors in bulk, clear_palette and undoing it, at several sizes."""
+    return _run_probe("palette_probe", runs)
+
+
+def bench_export(runs=DEFAULT_RUNS):
+    """Writing the JSON and CSV exports of 100k and 1M colors."""
+    return _run_probe("export_probe", runs)
+
+
+def bench_library(runs=DEFAULT_RUNS):
+    """Proximity searches over a 1M-color palette library, listing it, and saving a 2k-color palette."""
+    return _run_probe("library_probe", runs)
+
+
+def bench_contrast(runs=DEFAULT_RUNS):
+    """Contrast of every pair in a 10k-color palette: per-level counts, both matrices and the AA pairs."""
+    return _run_probe("contrast_probe", runs)
+
+
+def bench_frames(runs=DEFAULT_RUNS):
+    """Sampling fixed points and regions across 20-frame 1080p JPEG and PNG sequences."""
+    return _run_probe("frames_probe", runs)
+
+
+BENCHMARKS = {
+    "startup": bench_startup,
+    "grab": bench_grab,
+    "palette": bench_palette,
+    "export": bench_export,
+    "library": bench_library,
+    "contrast": bench_contrast,
+    "frames": bench_frames,
+}
+
+
+# --- Comparison ---
+DEFAULT_THRESHOLD = 10.0 # Percent slower than the baseline that counts as a regression
+DEFAULT_MIN_DELTA_MS = 1.0 # Smaller differences are noise, whatever their percentage
+
+
+def compare_results(baseline, results, threshold=DEFAULT_THRESHOLD, min_delta_ms=DEFAULT_MIN_DELTA_MS):
+    """Compares two {benchmark: {metric: ms}} results; returns (lines, regressions).
+
+    Only benchmarks present in results are compared. A metric regresses when
+    it is more than threshold percent and more than min_delta_ms slower than
+    in the baseline. Metrics missing from either side are listed but never
+    count as regressions.
+    """
+    lines = []
+    regressions = []
+    for name in sorted(results):
+        old = baseline.get(name, {})
+        new = results.get(name, {})
+        for metric in sorted(set(old) | set(new)):
+            label = f"{name}.{metric}"
+            if metric not in old or metric not in new:
+                lines.append(f"  {label:<32} {'only in ' + ('results' if metric in new else 'baseline'):>28}")
+                continue
+            before, after = old[metric], new[metric]
+            change = (after - before) * 100 / before if before else 0.0
+            regressed = change > threshold and after - before > min_delta_ms
+            if regressed:
+                regressions.append(label)
+            lines.append(f"{'!' if regressed else ' '} {label:<32} {before:>10.2f} -> {after:>10.2f} ms "
+                         f"{change:+7.1f}%{'  REGRESSION' if regressed else ''}")
+    return lines, regressions
+
+
+def _load_results(path, parser):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        parser.error(f"cannot read {path}: {e}")
+
+
+# --- Command ---
+def bench_command(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="cmilker bench",
+                                     description="Run offscreen benchmarks and print median timings (ms) as JSON.")
+    parser.add_argument("names", nargs="*", metavar="NAME", help=f"benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help=f"runs per benchmark (default {DEFAULT_RUNS})")
+    parser.add_argument("--budget-ms", type=float,
+                        help="exit with status 1 if startup's first_paint_wall exceeds this")
+    parser.add_argument("-o", "--output", help="also write the results to this JSON file (e.g. a baseline)")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="compare the results with a saved baseline and exit with status 1 on regressions")
+    parser.add_argument("--results", metavar="FILE",
+                        help="with --compare, compare these saved results instead of running the benchmarks")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"percent slowdown that counts as a regression (default {DEFAULT_THRESHOLD:g})")
+    parser.add_argument("--min-delta-ms", type=float, default=DEFAULT_MIN_DELTA_MS,
+                        help=f"ignore slowdowns smaller than this (default {DEFAULT_MIN_DELTA_MS:g} ms)")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark: {', '.join(unknown)}")
+    if args.results and not args.compare:
+        parser.error("--results needs --compare")
+
+    baseline = _load_results(args.compare, parser) if args.compare else None
+    if args.results:
+        results = _load_results(args.results, parser)
+    else:
+        # Against a baseline, run the benchmarks it has unless told otherwise
+        names = args.names or [name for name in (baseline or BENCHMARKS) if name in BENCHMARKS]
+        results = {name: BENCHMARKS[name](args.runs) for name in names}
+        text = json.dumps(results, indent=2)
+        print(text)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+
+    status = 0
+    if baseline is not None:
+        lines, regressions = compare_results(baseline, results, args.threshold, args.min_delta_ms)
+        print(f"Compared with {args.compare} (regression: >{args.threshold:g}% and >{args.min_delta_ms:g} ms slower):")
+        print("\n".join(lines))
+        if regressions:
+            print(f"cmilker bench: {len(regressions)} regression(s): {', '.join(regressions)}", file=sys.stderr)
+            status = 1
+
+    if args.budget_ms is not None and "startup" in results:
+        first_paint = results["startup"]["first_paint_wall"]
+        if first_paint > args.budget_ms:
+            print(f"cmilker bench: startup first paint {first_paint:.1f} ms exceeds the {args.budget_ms:g} ms budget",
+                  file=sys.stderr)
+            status = 1
+    return status
@@ -0,0 +1,484 @@
+"""Screen capture backends for ScreenColorGrabber.
+
+Each backend returns a CaptureResult holding the captured QImage and the
+time spent in every stage of the capture, so the cost of different capture
+paths (in-process grab vs. the screencapture PNG round trip) can be compared.
+
+When the grab reduces to a single color, the backends only turn the part of
+the capture that the sample mode reads into a QImage (sampling.decode_region):
+one pixel for CENTER, an evenly spaced subsample for large selections.
+"""
+import itertools
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from PyQt6.QtCore import QEventLoop, QPoint, QRect, Qt, pyqtSignal
+from PyQt6.QtGui import QColor, QCursor, QGuiApplication, QImage, QImageIOHandler, QImageReader, QPainter, QPen
+from PyQt6.QtWidgets import QWidget
+
+import tracing
+from sampling import SampleMode, decode_region
+
+
+class CaptureResult:
+    """A captured image plus per-stage timings in seconds.
+
+    points holds (x, y) pixel positions in image when the user placed
+    sample points instead of dragging a selection, else None.
+    """
+    __slots__ = ("image", "timings", "backend", "points")
+
+    def __init__(self, image: QImage, timings: dict, backend: str, points=None):
+        self.image = image
+        self.timings = timings
+        self.backend = backend
+        self.points = points
+
+    def format_timings(self):
+        """Returns the stage timings as a one-line summary in milliseconds."""
+        stages = ", ".join(f"{stage} {seconds * 1000:.1f} ms" for stage, seconds in self.timings.items())
+        total = sum(self.timings.values()) * 1000
+        return f"{self.backend}: {stages} (total {total:.1f} ms)"
+
+
+class _StageTimer:
+    """Records the duration of consecutive named stages, also as capture.<stage> trace spans."""
+    def __init__(self, backend):
+        self.timings = {}
+        self.backend = backend
+        self._last = time.perf_counter_ns()
+
+    def lap(self, stage):
+        now = time.perf_counter_ns()
+        self.timings[stage] = (now - self._last) / 1e9
+        tracing.add_span(f"capture.{stage}", self._last, now, backend=self.backend)
+        self._last = now
+
+
+class CaptureBackend:
+    """Base class for capture backends.
+
+    capture() returns a CaptureResult, or None if the user cancelled.
+    Errors are raised as CaptureError. Backends with thread_safe set may
+    have capture() called from a worker thread; the others must be driven
+    from the GUI thread with begin_capture(). pick_points asks interactive
+    backends to let the user click sample points instead of dragging a
+    selection; only those with can_pick_points set honour it. sample_mode, when set, is the statistic
+    the capture will be reduced with, so only the pixels it reads need to be
+    decoded.
+    """
+    name = "base"
+    thread_safe = True
+    can_pick_points = False
+    pick_points = False
+    sample_mode: SampleMode | None = None
+
+    def capture(self):
+        raise NotImplementedError
+
+    def begin_capture(self, callback):
+        """Starts a capture without blocking; callback(result, error) runs on completion."""
+        try:
+            callback(self.capture(), None)
+        except CaptureError as e:
+            callback(None, e)
+
+    def cancel(self):
+        """Aborts an in-progress capture, if the backend supports it."""
+
+    def grab_into(self, target: QImage, center: QPoint) -> bool:
+        """Draws the pixels centred on center (global coordinates) into target, for live sampling.
+
+        target is a caller-owned, preallocated image that is reused every
+        frame. Returns False if nothing could be grabbed this time; backends
+        that can only capture interactively raise CaptureError.
+        """
+        raise CaptureError(f"The {self.name} backend cannot sample live")
+
+
+def _draw_centred(target, source, x, y):
+    """Copies the target-sized block of source centred on (x, y) into target, black outside source."""
+    width, height = target.width(), target.height()
+    left, top = x - width // 2, y - height // 2
+    if left < 0 or top < 0 or left + width > source.width() or top + height > source.height():
+        target.fill(Qt.GlobalColor.black)
+    painter = QPainter(target)
+    painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_Source)
+    if isinstance(source, QImage):
+        painter.drawImage(0, 0, source, left, top, width, height)
+    else:
+        painter.drawPixmap(0, 0, source, left, top, width, height)
+    painter.end()
+
+
+def _render_region(source, rect, sample_mode):
+    """Returns the part of source (a QPixmap or QImage) inside rect that sample_mode reads, as a QImage.
+
+    Without a sample mode this is a plain copy of rect. Downscaling is
+    nearest-neighbour, so every pixel is an unblended source pixel, and only
+    the returned image is allocated.
+    """
+    if sample_mode is None:
+        part = source.copy(rect)
+        return part if isinstance(part, QImage) else part.toImage()
+    clip, size = decode_region(rect.width(), rect.height(), sample_mode)
+    clip.translate(rect.topLeft())
+    # Keep a 32-bit source's format so the pixels are copied unconverted
+    keep = isinstance(source, QImage) and source.depth() == 32
+    image = QImage(size, source.format() if keep else QImage.Format.Format_RGB32)
+    painter = QPainter(image)
+    painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_Source)
+    # No SmoothPixmapTransform hint, so scaling picks pixels instead of averaging them
+    if isinstance(source, QImage):
+        painter.drawImage(image.rect(), source, clip)
+    else:
+        painter.drawPixmap(image.rect(), source, clip)
+    painter.end()
+    return image
+
+
+def read_image(path, sample_mode=None):
+    """Decodes the image file at path, or only the part of it sample_mode reads.
+
+    The clip rect is decoded natively by handlers that support it (JPEG) and
+    cropped right after decoding by the others (PNG). A reduced size is only
+    requested for MEAN from handlers that scale natively: their scaling
+    averages pixels, which keeps the mean but not the median or mode.
+    """
+    reader = QImageReader(os.fspath(path))
+    size = reader.size()
+    if sample_mode is not None and size.isValid() and not size.isEmpty():
+        clip, scaled = decode_region(size.width(), size.height(), sample_mode)
+        if clip.size() != size:
+            reader.setClipRect(clip)
+        if (scaled != clip.size() and sample_mode is SampleMode.MEAN
+                and reader.supportsOption(QImageIOHandler.ImageOption.ScaledSize)):
+            reader.setScaledSize(scaled)
+    return reader.read()
+
+
+class CaptureError(RuntimeError):
+    """Raised when a backend fails to produce an image."""
+
+
+# --- In-process capture ---
+class SelectionOverlay(QWidget):
+    """Full-screen overlay showing a frozen capture and letting the user drag a selection.
+
+    With pick_points set the user clicks any number of sample points instead
+    (Backspace removes the last one, Enter or right-click finishes).
+    """
+    selection_finished = pyqtSignal(QRect) # Logical coordinates; null rect if cancelled
+    points_finished = pyqtSignal(list) # Logical QPoints; empty if cancelled
+
+    MARKER_RADIUS = 5
+
+    def __init__(self, screen, pixmap, pick_points=False):
+        super().__init__(None, Qt.WindowType.FramelessWindowHint | Qt.WindowType.WindowStaysOnTopHint
+                         | Qt.WindowType.Tool)
+        self._pixmap = pixmap
+        self._origin = None
+        self._selection = QRect()
+        self._pick_points = pick_points
+        self._points = []
+        self.setGeometry(screen.geometry())
+        self.setCursor(Qt.CursorShape.CrossCursor)
+        self.setMouseTracking(True)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.drawPixmap(self.rect(), self._pixmap)
+        painter.fillRect(self.rect(), QColor(0, 0, 0, 80)) # Dim everything outside the selection
+        if not self._selection.isNull():
+            painter.drawPixmap(self._selection, self._pixmap, self._source_rect(self._selection))
+            painter.setPen(QPen(QColor(255, 255, 255), 1, Qt.PenStyle.DashLine))
+            painter.drawRect(self._selection.adjusted(0, 0, -1, -1))
+        radius = self.MARKER_RADIUS
+        for number, point in enumerate(self._points, 1):
+            painter.setPen(QPen(QColor(0, 0, 0), 3))
+            painter.drawEllipse(point, radius, radius)
+            painter.setPen(QPen(QColor(255, 255, 255), 1))
+            painter.drawEllipse(point, radius, radius)
+            painter.drawText(point.x() + radius + 2, point.y() - radius, str(number))
+
+    def _source_rect(self, rect):
+        ratio = self._pixmap.devicePixelRatio()
+        return QRect(round(rect.x() * ratio), round(rect.y() * ratio),
+                     round(rect.width() * ratio), round(rect.height() * ratio))
+
+    def mousePressEvent(self, event):
+        if self._pick_points:
+            if event.button() == Qt.MouseButton.LeftButton:
+                self._points.append(event.position().toPoint())
+                self.update()
+            else:
+                self._finish_points()
+            return
+        if event.button() == Qt.MouseButton.LeftButton:
+            self._origin = event.position().toPoint()
+            self._selection = QRect(self._origin, self._origin)
+            self.update()
+        else:
+            self.cancel()
+
+    def mouseMoveEvent(self, event):
+        if self._origin is not None:
+            self._selection = QRect(self._origin, event.position().toPoint()).normalized()
+            self.update()
+
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton and self._origin is not None:
+            # A plain click selects the single pixel under the cursor
+            selection = QRect(self._origin, event.position().toPoint()).normalized()
+            self._finish(selection if selection.width() > 1 else QRect(self._origin, self._origin))
+
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key.Key_Escape:
+            self.cancel()
+        elif self._pick_points and event.key() in (Qt.Key.Key_Return, Qt.Key.Key_Enter):
+            self._finish_points()
+        elif self._pick_points and event.key() == Qt.Key.Key_Backspace and self._points:
+            self._points.pop()
+            self.update()
+
+    def cancel(self):
+        self._points = []
+        if self._pick_points:
+            self._finish_points()
+        else:
+            self._finish(QRect())
+
+    def _finish(self, rect):
+        if not self.isVisible():
+            return # Already finished
+        self.hide()
+        self.selection_finished.emit(rect)
+        self.deleteLater()
+
+    def _finish_points(self):
+        if not self.isVisible():
+            return
+        self.hide()
+        self.points_finished.emit(list(self._points))
+        self.deleteLater()
+
+
+class QScreenCaptureBackend(CaptureBackend):
+    """Grabs the screen straight into memory with QScreen.grabWindow.
+
+    With a fixed region the grab is immediate; otherwise the screen under the
+    cursor is frozen in an overlay and the user drags a selection, which is
+    cropped from the in-memory capture. QScreen must be used from the GUI
+    thread, so this backend is driven with begin_capture().
+    """
+    name = "qscreen"
+    thread_safe = False
+    can_pick_points = True
+
+    def __init__(self, region: QRect | None = None):
+        self.region = region
+        self._overlay = None
+
+    def capture(self):
+        """Blocking capture; runs a local event loop while the user selects."""
+        loop = QEventLoop()
+        outcome = []
+
+        def on_done(result, error):
+            outcome.append((result, error))
+            loop.quit()
+
+        self.begin_capture(on_done)
+        if not outcome:
+            loop.exec()
+        result, error = outcome[0]
+        if error is not None:
+            raise error
+        return result
+
+    def begin_capture(self, callback):
+        timer = _StageTimer(self.name)
+        screen = QGuiApplication.screenAt(QCursor.pos()) or QGuiApplication.primaryScreen()
+        if screen is None:
+            callback(None, CaptureError("No screen available to capture"))
+            return
+
+        if self.region is not None:
+            geometry = screen.geometry()
+            region = self.region.translated(-geometry.x(), -geometry.y())
+            pixmap = screen.grabWindow(0, region.x(), region.y(), region.width(), region.height())
+            timer.lap("grab")
+            if pixmap.isNull():
+                callback(None, CaptureError("QScreen.grabWindow returned no image"))
+                return
+            image = _render_region(pixmap, pixmap.rect(), self.sample_mode)
+            timer.lap("to_image")
+            callback(CaptureResult(image, timer.timings, self.name), None)
+            return
+
+        pixmap = screen.grabWindow(0)
+        timer.lap("grab")
+        if pixmap.isNull():
+            callback(None, CaptureError("QScreen.grabWindow returned no image"))
+            return
+
+        def on_selection(selection):
+            self._overlay = None
+            timer.lap("select")
+            if selection.isNull():
+                callback(None, None)
+                return
+            ratio = pixmap.devicePixelRatio()
+            source = QRect(round(selection.x() * ratio), round(selection.y() * ratio),
+                           max(1, round(selection.width() * ratio)), max(1, round(selection.height() * ratio)))
+            # Converts just the selection (or the part of it that is sampled), not the whole screen
+            image = _render_region(pixmap, source.intersected(pixmap.rect()), self.sample_mode)
+            timer.lap("crop")
+            callback(CaptureResult(image, timer.timings, self.name), None)
+
+        def on_points(points):
+            self._overlay = None
+            timer.lap("select")
+            if not points:
+                callback(None, None)
+                return
+            ratio = pixmap.devicePixelRatio()
+            image = pixmap.toImage()
+            timer.lap("to_image")
+            device_points = [(round(point.x() * ratio), round(point.y() * ratio)) for point in points]
+            callback(CaptureResult(image, timer.timings, self.name, device_points), None)
+
+        self._overlay = SelectionOverlay(screen, pixmap, self.pick_points)
+        self._overlay.selection_finished.connect(on_selection)
+        self._overlay.points_finished.connect(on_points)
+        self._overlay.showFullScreen()
+        self._overlay.activateWindow()
+
+    def cancel(self):
+        if self._overlay is not None:
+            self._overlay.cancel()
+
+    def grab_into(self, target, center):
+        """Grabs the few pixels around center and draws them into target.
+
+        Not allocation-free: QScreen.grabWindow returns a new QPixmap every
+        call, though only one covering target's size; the reuse is in
+        target, which is drawn into in place.
+        """
+        screen = QGuiApplication.screenAt(center) or QGuiApplication.primaryScreen()
+        if screen is None:
+            return False
+        # Grab just enough logical pixels to cover target in device pixels
+        ratio = screen.devicePixelRatio()
+        width, height = math.ceil(target.width() / ratio), math.ceil(target.height() / ratio)
+        geometry = screen.geometry()
+        x, y = center.x() - geometry.x() - width // 2, center.y() - geometry.y() - height // 2
+        pixmap = screen.grabWindow(0, x, y, width, height)
+        if pixmap.isNull():
+            return False
+        pixmap.setDevicePixelRatio(1) # Draw device pixels 1:1
+        _draw_centred(target, pixmap, pixmap.width() // 2, pixmap.height() // 2)
+        return True
+
+
+# --- macOS screencapture fallback ---
+class ScreencaptureBackend(CaptureBackend):
+    """Runs macOS `screencapture -i` into a temporary PNG and decodes it."""
+    name = "screencapture"
+
+    def __init__(self):
+        self._process = None
+
+    @staticmethod
+    def is_available():
+        return sys.platform == "darwin" and shutil.which("screencapture") is not None
+
+    def capture(self):
+        timer = _StageTimer(self.name)
+        fd, temp_file = tempfile.mkstemp(suffix='.png')
+        os.close(fd)
+        timer.lap("mkstemp")
+        try:
+            # Interactive mode lets the user select a portion of the screen
+            self._process = subprocess.Popen(['screencapture', '-i', '-o', '-t', 'png', temp_file])
+            returncode = self._process.wait()
+            self._process = None
+            timer.lap("subprocess")
+            if returncode < 0:
+                return None # Terminated by cancel()
+            if returncode != 0:
+                raise CaptureError(f"screencapture exited with status {returncode}")
+            # An empty file means the user cancelled
+            cancelled = os.path.getsize(temp_file) == 0
+            timer.lap("stat")
+            if cancelled:
+                return None
+            image = read_image(temp_file, self.sample_mode)
+            timer.lap("decode")
+            if image.isNull():
+                raise CaptureError("Failed to load screenshot image")
+        except (OSError, subprocess.SubprocessError) as e:
+            raise CaptureError(f"Error capturing screenshot: {e}") from e
+        finally:
+            try:
+                os.unlink(temp_file)
+            except OSError as e:
+                tracing.warning(f"Error removing temp file: {e}")
+            timer.lap("unlink")
+        return CaptureResult(image, timer.timings, self.name)
+
+    def cancel(self):
+        process = self._process
+        if process is not None and process.poll() is None:
+            process.terminate()
+
+
+# --- Replay (headless/testing) ---
+class ReplayCaptureBackend(CaptureBackend):
+    """Replays image files or QImage buffers in order, cycling when exhausted.
+
+    Needs no screen, so the grab pipeline can run under QT_QPA_PLATFORM=offscreen.
+    """
+    name = "replay"
+
+    def __init__(self, sources):
+        if not sources:
+            raise ValueError("ReplayCaptureBackend needs at least one image or path")
+        self._sources = itertools.cycle(list(sources))
+
+    def capture(self):
+        timer = _StageTimer(self.name)
+        source = next(self._sources)
+        if isinstance(source, QImage):
+            image = source if self.sample_mode is None else _render_region(source, source.rect(), self.sample_mode)
+            timer.lap("buffer")
+        else:
+            image = read_image(source, self.sample_mode)
+            timer.lap("decode")
+            if image.isNull():
+                raise CaptureError(f"Failed to load replay image {source}")
+        return CaptureResult(image, timer.timings, self.name)
+
+    def grab_into(self, target, center):
+        """Treats the next source as the screen, with its top-left corner at (0, 0)."""
+        source = next(self._sources)
+        image = source if isinstance(source, QImage) else QImage(os.fspath(source))
+        if image.isNull():
+            raise CaptureError(f"Failed to load replay image {source}")
+        _draw_centred(target, image, center.x(), center.y())
+        return True
+
+
+def default_backend():
+    """Returns the in-process backend; screencapture is used as a fallback."""
+    return QScreenCaptureBackend()
+
+
+def fallback_backend():
+    """Returns the backend to retry with when the default fails, or None."""
+    return ScreencaptureBackend() if ScreencaptureBackend.is_available() else None
@@ -0,0 +1,213 @@
+"""Command-line entry point behind the cmilker wrapper.
+
+With no command it starts the GUI; any arguments besides the ones below
+are passed on to Qt.
+Headless commands are listed in COMMANDS; they never import QtWidgets, so
+they run on machines without a display.
+
+    cmilker [--trace FILE [--trace-format chrome|json] [--trace-buffer N]] [-v]
+    cmilker extract [-k N] [--method median-cut|kmeans] [--format jsonl|csv]
+                    [-j JOBS] [-o FILE] PATH...
+    cmilker grab [--mode MODE] [--add] [--no-start]
+    cmilker add [--no-start] COLOR...
+    cmilker export [--format FORMAT] [-o FILE] [--no-start]
+    cmilker library [--library FILE] add [-t TAG]... FILE...
+    cmilker library [--library FILE] list [-t TAG]
+    cmilker library [--library FILE] search [-r RADIUS] [-n LIMIT] [-t TAG] COLOR
+    cmilker library [--library FILE] remove ID...
+    cmilker contrast [-l AA-large|AA|AAA] [--format csv|json] [--matrix wcag|apca]
+                     [--summary] [-o FILE] PALETTE
+    cmilker sample [-p [NAME=]X,Y]... [-r [NAME=]X,Y,W,H]... [--mode MODE] [-j JOBS]
+                   [-o FILE] PATH...
+    cmilker bench [--runs N] [--budget-ms MS] [-o FILE] [--compare BASELINE [--results FILE]
+                  [--threshold PCT] [--min-delta-ms MS]] [NAME...]
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp", ".tif", ".tiff", ".ppm"}
+
+
+# --- extract ---
+def iter_image_paths(paths, key=None):
+    """Yields image files from paths, walking directories in sorted order (by key, if given)."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort(key=key)
+                for name in sorted(files, key=key):
+                    if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def extract_file(path, count, method, max_pixels):
+    """Decodes an image file and returns its (packed rgb, population) palette."""
+    from PyQt6.QtGui import QImage
+    from quantize import extract_palette
+    from sampling import image_to_rgb_view
+
+    image = QImage(path)
+    if image.isNull():
+        raise ValueError("not a readable image")
+    pixels, image = image_to_rgb_view(image)
+    return extract_palette(pixels, count, method, max_pixels)
+
+
+def _extract_job(job):
+    """Process-pool worker: (path, ...) -> (path, palette or None, error or None)."""
+    path = job[0]
+    try:
+        return path, extract_file(*job), None
+    except Exception as e: # Report and carry on with the other files
+        return path, None, str(e) or type(e).__name__
+
+
+def _color_entry(rgb):
+    return {"hex": f"#{rgb:06X}", "rgb": [rgb >> 16 & 0xFF, rgb >> 8 & 0xFF, rgb & 0xFF]}
+
+
+class JsonLinesWriter:
+    """One {"file", "colors": [{"hex", "rgb"}]} object per line, entries shaped like the JSON export."""
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, path, palette):
+        record = {"file": path, "colors": [_color_entry(rgb) for rgb, _ in palette]}
+        self.stream.write(json.dumps(record) + "\n")
+
+
+class CsvWriter:
+    """FILE,HEX,R,G,B rows, the CSV export's columns with the source file first."""
+    def __init__(self, stream):
+        self.writer = csv.writer(stream)
+        self.writer.writerow(["FILE", "HEX", "R", "G", "B"])
+
+    def write(self, path, palette):
+        self.writer.writerows([path, f"#{rgb:06X}", rgb >> 16 & 0xFF, rgb >> 8 & 0xFF, rgb & 0xFF]
+                              for rgb, _ in palette)
+
+
+WRITERS = {"jsonl": JsonLinesWriter, "csv": CsvWriter}
+
+
+def extract_command(argv):
+    from quantize import MAX_PIXELS, METHODS
+
+    parser = argparse.ArgumentParser(prog="cmilker extract",
+                                     description="Extract a K-color palette from each image file.")
+    parser.add_argument("paths", nargs="+", metavar="PATH", help="image files or directories to walk")
+    parser.add_argument("-k", "--colors", type=int, default=8, help="colors per image (default 8)")
+    parser.add_argument("--method", choices=METHODS, default="median-cut")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="jsonl")
+    parser.add_argument("--max-pixels", type=int, default=MAX_PIXELS,
+                        help=f"pixels sampled per image (default {MAX_PIXELS})")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("-o", "--output", help="write to this file instead of stdout")
+    args = parser.parse_args(argv)
+    if args.colors < 1:
+        parser.error("--colors must be at least 1")
+
+    jobs = ((path, args.colors, args.method, args.max_pixels) for path in iter_image_paths(args.paths))
+    stream = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    failures = 0
+    try:
+        writer = WRITERS[args.format](stream)
+        if args.jobs > 1:
+            executor = ProcessPoolExecutor(max_workers=args.jobs)
+            results = executor.map(_extract_job, jobs, chunksize=8)
+        else:
+            executor = None
+            results = map(_extract_job, jobs)
+        try:
+            for path, palette, error in results: # In input order, as they complete
+                if error is not None:
+                    failures += 1
+                    print(f"cmilker extract: {path}: {error}", file=sys.stderr)
+                else:
+                    writer.write(path, palette)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+    return 1 if failures else 0
+
+
+# --- sample ---
+def sample_command(argv):
+    from frames import sample_command
+    return sample_command(argv)
+
+
+# --- grab / add / export (clients of the running app) ---
+def grab_command(argv):
+    from daemon_client import grab_command
+    return grab_command(argv)
+
+
+def add_command(argv):
+    from daemon_client import add_command
+    return add_command(argv)
+
+
+def export_command(argv):
+    from daemon_client import export_command
+    return export_command(argv)
+
+
+# --- library ---
+def library_command(argv):
+    from library import library_command
+    return library_command(argv)
+
+
+# --- contrast ---
+def contrast_command(argv):
+    from contrast import contrast_command
+    return contrast_command(argv)
+
+
+# --- bench ---
+def bench_command(argv):
+    from benchmarks import bench_command
+    return bench_command(argv)
+
+
+COMMANDS = {
+    "extract": extract_command,
+    "sample": sample_command,
+    "bench": bench_command,
+    "grab": grab_command,
+    "add": add_command,
+    "export": export_command,
+    "library": library_command,
+    "contrast": contrast_command,
+}
+
+
+def run(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in COMMANDS:
+        return COMMANDS[argv[0]](argv[1:])
+    if argv and argv[0] in ("-h", "--help"):
+        print(__doc__.strip())
+        return 0
+    # A single instance: a second start just brings the running one forward
+    from daemon_client import show_running_instance
+    if show_running_instance():
+        print("Color Milker is already running")
+        return 0
+    import main
+    return main.run(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(run())
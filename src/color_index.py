@@ -0,0 +1,189 @@
+"""Perceptual nearest-color lookup over a palette or a named-color table.
+
+Colors are indexed in a perceptual space by a KD-tree: CIELAB for the
+"de2000" metric, OKLab for "ok". ΔE-OK is plain Euclidean distance in OKLab,
+so those searches are exact. For ΔE2000 the tree returns the nearest
+candidates by ΔE76 (Euclidean Lab), which are then re-ranked with the
+vectorized CIEDE2000 formula.
+
+Added colors go to a small unindexed tail that is scanned with NumPy; the
+tree is rebuilt from everything on the first query after the tail outgrows
+TAIL_LIMIT, so bulk inserts never pay for a rebuild they don't need. This
+module has no Qt dependency.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from colorspace import as_packed, delta_e_2000, rgb_to_lab, rgb_to_oklab
+
+LEAF_SIZE = 128 # Points per KD-tree leaf; leaves are scanned with NumPy
+TAIL_LIMIT = 4096 # Unindexed colors tolerated before the next query rebuilds
+_RERANK = 32 # ΔE76 candidates re-ranked by ΔE2000
+
+METRICS = {
+    "de2000": ("ΔE2000", rgb_to_lab),
+    "ok": ("ΔE-OK", rgb_to_oklab),
+}
+
+Match = namedtuple("Match", "rgb distance name") # rgb is packed 0xRRGGBB; name may be None
+
+
+class _KDTree:
+    """Static KD-tree over (N, 3) points, stored as flat per-node arrays.
+
+    Nodes are heap-numbered from 1; node i's children are 2i and 2i+1 and
+    every leaf holds a contiguous slice of the points, which are kept
+    permuted as (3, N) columns so slicing and reductions stay contiguous.
+    """
+    __slots__ = ("columns", "order", "split_dim", "split_value", "start", "end", "first_leaf")
+
+    def __init__(self, points):
+        count = len(points)
+        depth = 0
+        while (count >> depth) > LEAF_SIZE:
+            depth += 1
+        self.first_leaf = 1 << depth
+        nodes = 2 << depth
+        self.split_dim = np.zeros(nodes, dtype=np.int8)
+        self.split_value = np.zeros(nodes)
+        self.start = np.zeros(nodes, dtype=np.int64)
+        self.end = np.zeros(nodes, dtype=np.int64)
+        columns = np.ascontiguousarray(points.T)
+        order = np.arange(count)
+
+        self.end[1] = count
+        for node in range(1, self.first_leaf):
+            lo, hi = int(self.start[node]), int(self.end[node])
+            mid = (hi - lo) // 2
+            if mid:
+                segment = columns[:, lo:hi]
+                dim = int(np.argmax(segment.max(axis=1) - segment.min(axis=1)))
+                permutation = np.argpartition(segment[dim], mid)
+                columns[:, lo:hi] = segment[:, permutation]
+                order[lo:hi] = order[lo:hi][permutation]
+                self.split_dim[node] = dim
+                self.split_value[node] = columns[dim, lo + mid]
+            self.start[2 * node], self.end[2 * node] = lo, lo + mid
+            self.start[2 * node + 1], self.end[2 * node + 1] = lo + mid, hi
+
+        self.columns = columns
+        self.order = order
+
+    def query(self, point, k, best):
+        """Updates best, a sorted list of (squared distance, original index), with the k nearest."""
+        self._search(1, point, point[:, None], k, best, self.split_dim.tolist(), self.split_value.tolist())
+
+    def _search(self, node, point, column, k, best, split_dim, split_value):
+        if node >= self.first_leaf:
+            lo, hi = self.start[node], self.end[node]
+            if hi > lo:
+                _merge(best, k, ((self.columns[:, lo:hi] - column) ** 2).sum(axis=0), self.order[lo:hi])
+            return
+        diff = point[split_dim[node]] - split_value[node]
+        near, far = (2 * node, 2 * node + 1) if diff < 0 else (2 * node + 1, 2 * node)
+        self._search(near, point, column, k, best, split_dim, split_value)
+        if len(best) < k or diff * diff < best[-1][0]:
+            self._search(far, point, column, k, best, split_dim, split_value)
+
+
+def _merge(best, k, distances, indices):
+    """Folds candidate (distance, index) arrays into the sorted best list."""
+    if len(distances) > k:
+        keep = np.argpartition(distances, k)[:k]
+        distances, indices = distances[keep], indices[keep]
+    if best and len(best) >= k:
+        closer = distances < best[-1][0]
+        distances, indices = distances[closer], indices[closer]
+    if len(distances):
+        best.extend(zip(distances.tolist(), indices.tolist()))
+        best.sort()
+        del best[k:]
+
+
+class NearestColorIndex:
+    """Incrementally updated nearest-color index.
+
+    colors are packed RGB(A) integers; names, if given, is a parallel
+    sequence reported in matches (e.g. for a named-color table).
+    """
+    def __init__(self, colors=(), names=None, metric="de2000"):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown color metric: {metric!r}")
+        self.metric = metric
+        self.label, self._convert = METRICS[metric]
+        self._colors = np.empty(0, dtype=np.uint32) # Growable; the first _size entries are live
+        self._points = np.empty((0, 3))
+        self._size = 0
+        self._names = None
+        self._tree = None
+        self._indexed = 0 # Colors covered by the tree; the rest are the tail
+        self.reset(colors, names)
+
+    def __len__(self):
+        return self._size
+
+    def reset(self, colors=(), names=None):
+        """Replaces the indexed colors."""
+        self._colors = as_packed(colors) & np.uint32(0xFFFFFF)
+        self._points = self._convert(self._colors)
+        self._size = len(self._colors)
+        self._names = list(names) if names is not None else None
+        self._tree = None
+        self._indexed = 0
+
+    def add(self, colors):
+        """Adds colors (unnamed); they are searchable immediately."""
+        colors = as_packed(colors) & np.uint32(0xFFFFFF)
+        if not len(colors):
+            return
+        needed = self._size + len(colors)
+        if needed > len(self._colors):
+            capacity = max(needed, 2 * len(self._colors), 64)
+            grown_colors = np.empty(capacity, dtype=np.uint32)
+            grown_points = np.empty((capacity, 3))
+            grown_colors[:self._size] = self._colors[:self._size]
+            grown_points[:self._size] = self._points[:self._size]
+            self._colors, self._points = grown_colors, grown_points
+        self._colors[self._size:needed] = colors
+        self._points[self._size:needed] = self._convert(colors)
+        self._size = needed
+        if self._names is not None:
+            self._names.extend([None] * len(colors))
+
+    def _ensure_tree(self):
+        # The tail may grow with the tree, keeping rebuilds rare for huge palettes
+        tail_limit = max(TAIL_LIMIT, self._indexed // 32)
+        if self._size - self._indexed > tail_limit or (self._tree is None and self._size):
+            self._tree = _KDTree(self._points[:self._size])
+            self._indexed = self._size
+
+    def nearest(self, rgb, k=1):
+        """Returns up to k Matches for packed color rgb, closest first."""
+        if not self._size:
+            return []
+        self._ensure_tree()
+        point = self._convert(rgb)[0]
+        candidates = k if self.metric == "ok" else max(k, _RERANK)
+
+        best = []
+        self._tree.query(point, candidates, best)
+        tail = self._points[self._indexed:self._size]
+        if len(tail):
+            _merge(best, candidates, ((tail - point) ** 2).sum(axis=1), np.arange(self._indexed, self._size))
+
+        indices = np.array([index for _, index in best], dtype=np.int64)
+        if self.metric == "ok":
+            distances = np.sqrt([distance for distance, _ in best])
+        else:
+            distances = delta_e_2000(self._points[indices], point)
+            ranked = np.argsort(distances, kind="stable")[:k]
+            indices, distances = indices[ranked], distances[ranked]
+        return [Match(int(self._colors[i]), float(d), self._names[i] if self._names else None)
+                for i, d in zip(indices.tolist(), distances.tolist())]
+
+
+def named_color_index(metric="de2000"):
+    """Index over the bundled CSS/X11 named colors."""
+    from named_colors import CSS_COLORS
+    return NearestColorIndex(list(CSS_COLORS.values()), list(CSS_COLORS), metric)
@@ -0,0 +1,320 @@
+"""Vectorized color-space conversions for packed colors.
+
+Every space converts to and from gamma-encoded sRGB in 0..1, so convert()
+can go between any two of them with whole arrays at once: one row per
+color, one column per channel. Packed 0x(AA)RRGGBB integers are the
+"packed" space; decoding them to linear light goes through a precomputed
+256-entry lookup table instead of the sRGB transfer function.
+
+Channel ranges:
+    rgb: 0..255              hsl, hsv: H in degrees, S/L/V in 0..100
+    linear, xyz: 0..1        lab, lch: L in 0..100, h in degrees
+    oklab, oklch: L in 0..1  cmyk: 0..100
+
+This module has no Qt dependency.
+"""
+import numpy as np
+
+# sRGB 8-bit channel value -> 0..1 and -> linear light, precomputed once
+SRGB_UNIT = np.arange(256) / 255.0
+SRGB_TO_LINEAR = np.where(SRGB_UNIT <= 0.04045, SRGB_UNIT / 12.92, ((SRGB_UNIT + 0.055) / 1.055) ** 2.4)
+
+# Linear sRGB -> CIE XYZ (D65)
+_RGB_TO_XYZ = np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041],
+])
+_XYZ_TO_RGB = np.linalg.inv(_RGB_TO_XYZ)
+_WHITE_D65 = np.array([0.95047, 1.0, 1.08883])
+
+# Linear sRGB -> OKLab (Björn Ottosson)
+_RGB_TO_LMS = np.array([
+    [0.4122214708, 0.5363325363, 0.0514459929],
+    [0.2119034982, 0.6806995451, 0.1073969566],
+    [0.0883024619, 0.2817188376, 0.6299787005],
+])
+_LMS_TO_OKLAB = np.array([
+    [0.2104542553, 0.7936177850, -0.0040720468],
+    [1.9779984951, -2.4285922050, 0.4505937099],
+    [0.0259040371, 0.7827717662, -0.8086757660],
+])
+_LMS_TO_RGB = np.linalg.inv(_RGB_TO_LMS)
+_OKLAB_TO_LMS = np.linalg.inv(_LMS_TO_OKLAB)
+
+
+# --- Packed colors ---
+def as_packed(colors):
+    """Returns colors as a 1-D uint32 array."""
+    return np.atleast_1d(np.asarray(colors, dtype=np.uint32))
+
+
+def unpack_rgb(colors):
+    """Splits packed colors into an (N, 3) uint8 array of R, G, B."""
+    packed = as_packed(colors)
+    rgb = np.empty((len(packed), 3), dtype=np.uint8)
+    rgb[:, 0] = packed >> 16
+    rgb[:, 1] = packed >> 8
+    rgb[:, 2] = packed
+    return rgb
+
+
+def pack_rgb(rgb):
+    """Packs an (N, 3) array of 0-255 R, G, B values into 0xRRGGBB integers."""
+    rgb = np.asarray(rgb, dtype=np.uint32)
+    return (rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2]
+
+
+# --- sRGB transfer function ---
+def encode_srgb(linear):
+    """Linear light -> gamma-encoded sRGB, both 0..1."""
+    linear = np.clip(linear, 0, 1)
+    return np.where(linear <= 0.0031308, 12.92 * linear, 1.055 * linear ** (1 / 2.4) - 0.055)
+
+
+def decode_srgb(srgb):
+    """Gamma-encoded sRGB -> linear light, both 0..1."""
+    srgb = np.asarray(srgb, dtype=np.float64)
+    return np.where(srgb <= 0.04045, srgb / 12.92, ((srgb + 0.055) / 1.055) ** 2.4)
+
+
+def linear_rgb(colors):
+    """Linear-light sRGB of packed colors, (N, 3) in 0..1."""
+    return SRGB_TO_LINEAR[unpack_rgb(colors)]
+
+
+# --- Cylindrical and subtractive spaces (from gamma-encoded sRGB) ---
+def _hue(srgb, high, delta):
+    r, g, b = srgb[:, 0], srgb[:, 1], srgb[:, 2]
+    safe = np.where(delta == 0, 1, delta)
+    hue = np.where(high == r, ((g - b) / safe) % 6,
+                   np.where(high == g, (b - r) / safe + 2, (r - g) / safe + 4))
+    return np.where(delta == 0, 0, hue * 60)
+
+
+def srgb_to_hsl(srgb):
+    high, low = srgb.max(axis=1), srgb.min(axis=1)
+    delta = high - low
+    lightness = (high + low) / 2
+    divisor = 1 - np.abs(2 * lightness - 1)
+    saturation = np.where(divisor == 0, 0, delta / np.where(divisor == 0, 1, divisor))
+    return np.stack((_hue(srgb, high, delta), saturation * 100, lightness * 100), axis=1)
+
+
+def hsl_to_srgb(hsl):
+    hue, saturation, lightness = hsl[:, 0:1], hsl[:, 1:2] / 100, hsl[:, 2:3] / 100
+    k = (np.array([0, 8, 4]) + hue / 30) % 12
+    a = saturation * np.minimum(lightness, 1 - lightness)
+    return lightness - a * np.clip(np.minimum(k - 3, 9 - k), -1, 1)
+
+
+def srgb_to_hsv(srgb):
+    high, low = srgb.max(axis=1), srgb.min(axis=1)
+    delta = high - low
+    saturation = np.where(high == 0, 0, delta / np.where(high == 0, 1, high))
+    return np.stack((_hue(srgb, high, delta), saturation * 100, high * 100), axis=1)
+
+
+def hsv_to_srgb(hsv):
+    hue, saturation, value = hsv[:, 0:1], hsv[:, 1:2] / 100, hsv[:, 2:3] / 100
+    k = (np.array([5, 3, 1]) + hue / 60) % 6
+    return value - value * saturation * np.clip(np.minimum(k, 4 - k), 0, 1)
+
+
+def srgb_to_cmyk(srgb):
+    high = srgb.max(axis=1)
+    black = 1 - high
+    safe = np.where(high == 0, 1, high)[:, None]
+    cmy = np.where(high[:, None] == 0, 0, (high[:, None] - srgb) / safe)
+    return np.column_stack((cmy, black)) * 100
+
+
+def cmyk_to_srgb(cmyk):
+    cmyk = cmyk / 100
+    return (1 - cmyk[:, :3]) * (1 - cmyk[:, 3:4])
+
+
+# --- CIE and OK spaces (from linear light) ---
+def linear_to_xyz(linear):
+    return linear @ _RGB_TO_XYZ.T
+
+
+def xyz_to_linear(xyz):
+    return xyz @ _XYZ_TO_RGB.T
+
+
+def _lab_f(t):
+    return np.where(t > 216 / 24389, np.cbrt(t), (24389 / 27 * t + 16) / 116)
+
+
+def _lab_f_inverse(f):
+    return np.where(f > 6 / 29, f ** 3, (116 * f - 16) * 27 / 24389)
+
+
+def xyz_to_lab(xyz):
+    f = _lab_f(xyz / _WHITE_D65)
+    lab = np.empty_like(f)
+    lab[:, 0] = 116 * f[:, 1] - 16
+    lab[:, 1] = 500 * (f[:, 0] - f[:, 1])
+    lab[:, 2] = 200 * (f[:, 1] - f[:, 2])
+    return lab
+
+
+def lab_to_xyz(lab):
+    fy = (lab[:, 0] + 16) / 116
+    f = np.stack((fy + lab[:, 1] / 500, fy, fy - lab[:, 2] / 200), axis=1)
+    return _lab_f_inverse(f) * _WHITE_D65
+
+
+def linear_to_oklab(linear):
+    return np.cbrt(linear @ _RGB_TO_LMS.T) @ _LMS_TO_OKLAB.T
+
+
+def oklab_to_linear(oklab):
+    return ((oklab @ _OKLAB_TO_LMS.T) ** 3) @ _LMS_TO_RGB.T
+
+
+def to_polar(lab):
+    """Lab-like -> LCh-like: lightness, chroma, hue in degrees."""
+    chroma = np.hypot(lab[:, 1], lab[:, 2])
+    hue = np.degrees(np.arctan2(lab[:, 2], lab[:, 1])) % 360
+    return np.stack((lab[:, 0], chroma, hue), axis=1)
+
+
+def from_polar(lch):
+    hue = np.radians(lch[:, 2])
+    return np.stack((lch[:, 0], lch[:, 1] * np.cos(hue), lch[:, 1] * np.sin(hue)), axis=1)
+
+
+# --- Any-to-any conversion ---
+# space -> (to gamma-encoded sRGB, from gamma-encoded sRGB); linear-light
+# spaces are chained through the transfer function
+_VIA_SRGB = {
+    "rgb": (lambda v: v / 255, lambda s: s * 255),
+    "hsl": (hsl_to_srgb, srgb_to_hsl),
+    "hsv": (hsv_to_srgb, srgb_to_hsv),
+    "cmyk": (cmyk_to_srgb, srgb_to_cmyk),
+}
+_VIA_LINEAR = {
+    "linear": (lambda v: v, lambda linear: linear),
+    "xyz": (xyz_to_linear, linear_to_xyz),
+    "lab": (lambda v: xyz_to_linear(lab_to_xyz(v)), lambda linear: xyz_to_lab(linear_to_xyz(linear))),
+    "lch": (lambda v: xyz_to_linear(lab_to_xyz(from_polar(v))), lambda linear: to_polar(xyz_to_lab(linear_to_xyz(linear)))),
+    "oklab": (oklab_to_linear, linear_to_oklab),
+    "oklch": (lambda v: oklab_to_linear(from_polar(v)), lambda linear: to_polar(linear_to_oklab(linear))),
+}
+SPACES = ("packed",) + tuple(_VIA_SRGB) + tuple(_VIA_LINEAR)
+
+
+def convert(values, source, target):
+    """Converts an array of colors from one space (see SPACES) to another.
+
+    "packed" values are 0x(AA)RRGGBB integers and come back as 0xRRGGBB
+    uint32, rounded and clamped to the sRGB gamut; every other space is an
+    (N, channels) float array.
+    """
+    if source not in SPACES or target not in SPACES:
+        raise ValueError(f"Unknown color space: {source if source not in SPACES else target!r}")
+
+    # Decode to sRGB or linear light, whichever the source naturally gives
+    srgb = linear = None
+    if source == "packed":
+        rgb = unpack_rgb(values)
+        if target in _VIA_LINEAR:
+            linear = SRGB_TO_LINEAR[rgb]
+        else:
+            srgb = SRGB_UNIT[rgb]
+    else:
+        values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+        if source in _VIA_SRGB:
+            srgb = _VIA_SRGB[source][0](values)
+        else:
+            linear = _VIA_LINEAR[source][0](values)
+
+    if target == "packed":
+        if srgb is None:
+            srgb = encode_srgb(linear)
+        return pack_rgb(np.rint(np.clip(srgb, 0, 1) * 255))
+    if target in _VIA_SRGB:
+        return _VIA_SRGB[target][1](encode_srgb(linear) if srgb is None else srgb)
+    return _VIA_LINEAR[target][1](decode_srgb(srgb) if linear is None else linear)
+
+
+def rgb_to_lab(colors):
+    """CIELAB (D65) of packed colors: L in 0..100."""
+    return convert(colors, "packed", "lab")
+
+
+def rgb_to_oklab(colors):
+    """OKLab of packed colors: L in 0..1."""
+    return convert(colors, "packed", "oklab")
+
+
+# --- Formatting ---
+# CSS Color 4 notation where one exists (device-cmyk for CMYK)
+_FORMATS = {
+    "rgb": "rgb({:.0f} {:.0f} {:.0f})",
+    "hsl": "hsl({:.0f} {:.0f}% {:.0f}%)",
+    "hsv": "hsv({:.0f} {:.0f}% {:.0f}%)",
+    "lab": "lab({:.1f}% {:.1f} {:.1f})",
+    "lch": "lch({:.1f}% {:.1f} {:.1f})",
+    "oklab": "oklab({:.3f} {:.3f} {:.3f})",
+    "oklch": "oklch({:.3f} {:.3f} {:.1f})",
+    "cmyk": "device-cmyk({:.0f}% {:.0f}% {:.0f}% {:.0f}%)",
+}
+FORMAT_SPACES = tuple(_FORMATS)
+
+
+def format_colors(colors, space):
+    """Formats packed colors as CSS-style strings in space (see FORMAT_SPACES)."""
+    template = _FORMATS[space]
+    return [template.format(*row) for row in convert(colors, "packed", space).tolist()]
+
+
+# --- Color differences ---
+def delta_e_ok(oklab, reference):
+    """Euclidean distance in OKLab from each row of oklab to reference."""
+    return np.sqrt(((np.asarray(oklab) - reference) ** 2).sum(axis=-1))
+
+
+def delta_e_2000(lab, reference):
+    """CIEDE2000 difference from each row of lab to the single color reference."""
+    lab = np.atleast_2d(lab)
+    L1, a1, b1 = reference
+    L2, a2, b2 = lab[:, 0], lab[:, 1], lab[:, 2]
+
+    C1 = np.hypot(a1, b1)
+    C2 = np.hypot(a2, b2)
+    C_mean7 = ((C1 + C2) / 2) ** 7
+    G = 0.5 * (1 - np.sqrt(C_mean7 / (C_mean7 + 25.0 ** 7)))
+    a1p, a2p = (1 + G) * a1, (1 + G) * a2
+    C1p, C2p = np.hypot(a1p, b1), np.hypot(a2p, b2)
+    h1p = np.degrees(np.arctan2(b1, a1p)) % 360
+    h2p = np.degrees(np.arctan2(b2, a2p)) % 360
+
+    dLp = L2 - L1
+    dCp = C2p - C1p
+    dhp = h2p - h1p
+    dhp = np.where(dhp > 180, dhp - 360, np.where(dhp < -180, dhp + 360, dhp))
+    dhp = np.where(C1p * C2p == 0, 0, dhp)
+    dHp = 2 * np.sqrt(C1p * C2p) * np.sin(np.radians(dhp / 2))
+
+    Lp_mean = (L1 + L2) / 2
+    Cp_mean = (C1p + C2p) / 2
+    h_sum = h1p + h2p
+    hp_mean = np.where(np.abs(h1p - h2p) > 180,
+                       np.where(h_sum < 360, h_sum + 360, h_sum - 360), h_sum) / 2
+    hp_mean = np.where(C1p * C2p == 0, h_sum, hp_mean)
+
+    T = (1 - 0.17 * np.cos(np.radians(hp_mean - 30)) + 0.24 * np.cos(np.radians(2 * hp_mean))
+         + 0.32 * np.cos(np.radians(3 * hp_mean + 6)) - 0.20 * np.cos(np.radians(4 * hp_mean - 63)))
+    d_theta = 30 * np.exp(-(((hp_mean - 275) / 25) ** 2))
+    Cp_mean7 = Cp_mean ** 7
+    R_C = 2 * np.sqrt(Cp_mean7 / (Cp_mean7 + 25.0 ** 7))
+    S_L = 1 + 0.015 * (Lp_mean - 50) ** 2 / np.sqrt(20 + (Lp_mean - 50) ** 2)
+    S_C = 1 + 0.045 * Cp_mean
+    S_H = 1 + 0.015 * Cp_mean * T
+    R_T = -np.sin(np.radians(2 * d_theta)) * R_C
+
+    return np.sqrt((dLp / S_L) ** 2 + (dCp / S_C) ** 2 + (dHp / S_H) ** 2
+                   + R_T * (dCp / S_C) * (dHp / S_H))
@@ -0,0 +1,177 @@
+"""Perceptual near-duplicate merging ("consolidate palette").
+
+Colors closer than a ΔE threshold are merged by greedy leader clustering:
+every color ends up within the threshold of its cluster's leader, and
+leaders are more than the threshold apart, so a smooth gradient is never
+chained into one cluster. Distances are CIE76 (Euclidean CIELAB).
+
+Lab is bucketed into cubes with sides of one threshold, so only leaders
+in the 27 surrounding cubes are ever compared with a color. Cubes are
+processed in 8 parity classes (coordinates mod 2): two cubes of the same
+class are never adjacent, so every cube of a class is clustered at once
+with vectorized NumPy passes. A color first joins the nearest leader from
+an earlier class; otherwise the earliest unclustered color of each cube
+becomes a leader. Clusters are reported in order of their first color.
+This module has no Qt dependency.
+"""
+from collections import namedtuple
+from itertools import product
+
+import numpy as np
+
+from colorspace import as_packed, convert, rgb_to_lab
+
+REPRESENTATIVES = ("first", "mean", "frequent")
+DEFAULT_THRESHOLD = 2.3 # About one just-noticeable difference
+
+_OFFSETS = np.array(list(product((-1, 0, 1), repeat=3)))
+
+Consolidation = namedtuple("Consolidation", "colors labels sizes")
+# colors: packed 0xRRGGBB representatives, in order of each cluster's first color
+# labels: cluster index of every input color
+# sizes: input colors per cluster
+
+
+def _cell_keys(cells):
+    # Pack three small signed cube coordinates into one int64 key; adding
+    # _cell_keys(offset) - _cell_keys(0) to a key moves it by offset
+    shifted = cells + (1 << 20)
+    return (shifted[..., 0] << 42) | (shifted[..., 1] << 21) | shifted[..., 2]
+
+
+def leader_clusters(points, threshold):
+    """Greedy leader clustering of (N, 3) points; returns each point's leader index.
+
+    Within a cube, earlier points become leaders first.
+    """
+    count = len(points)
+    limit = threshold * threshold
+    cells = np.floor(points / threshold).astype(np.int64)
+    cube_keys, cube_of = np.unique(_cell_keys(cells), return_inverse=True)
+    cube_cells = cells[np.unique(cube_of, return_index=True)[1]]
+    parity = (cube_cells[:, 0] & 1) << 2 | (cube_cells[:, 1] & 1) << 1 | (cube_cells[:, 2] & 1)
+
+    # neighbors[k] is the id of the occupied cube at _OFFSETS[k] from each cube, or -1.
+    # The shifted keys stay sorted, so each lookup is a cheap merge-like search.
+    deltas = _cell_keys(_OFFSETS) - _cell_keys(np.zeros(3, dtype=np.int64))
+    neighbors = np.empty((len(_OFFSETS), len(cube_keys)), dtype=np.int64)
+    for k, delta in enumerate(deltas.tolist()):
+        found = np.searchsorted(cube_keys, cube_keys + delta)
+        found[found == len(cube_keys)] = 0
+        neighbors[k] = np.where(cube_keys[found] == cube_keys + delta, found, -1)
+
+    leader = np.full(count, -1, dtype=np.int64)
+    slots = np.full((len(cube_keys) + 1, 4), -1, dtype=np.int64) # Leaders per cube; row -1 stays empty
+    filled = np.zeros(len(cube_keys), dtype=np.int64)
+    point_parity = parity[cube_of]
+
+    for group in range(8):
+        members = np.flatnonzero(point_parity == group)
+        if not len(members):
+            continue
+
+        # Join the nearest earlier leader within reach, one neighboring cube
+        # and one leader slot of that cube at a time
+        if filled.any():
+            best = np.full(len(members), np.inf)
+            chosen = np.full(len(members), -1, dtype=np.int64)
+            member_points = points[members]
+            member_cubes = cube_of[members]
+            for k in range(len(_OFFSETS)):
+                cube = neighbors[k][member_cubes]
+                for slot in range(slots.shape[1]):
+                    candidates = slots[cube, slot]
+                    has = np.flatnonzero(candidates >= 0)
+                    if not len(has):
+                        break
+                    candidates = candidates[has]
+                    distance = ((member_points[has] - points[candidates]) ** 2).sum(axis=1)
+                    closer = distance < best[has]
+                    best[has[closer]] = distance[closer]
+                    chosen[has[closer]] = candidates[closer]
+            joined = best <= limit
+            leader[members[joined]] = chosen[joined]
+            members = members[~joined]
+
+        # The earliest free point of each cube leads; its cube-mates within
+        # reach follow. Repeat until the class is exhausted.
+        while len(members):
+            cubes, first, which = np.unique(cube_of[members], return_index=True, return_inverse=True)
+            heads = members[first]
+            if filled[cubes].max() == slots.shape[1]:
+                slots = np.concatenate([slots, np.full_like(slots, -1)], axis=1)
+            slots[cubes, filled[cubes]] = heads
+            filled[cubes] += 1
+            lead = heads[which]
+            close = ((points[members] - points[lead]) ** 2).sum(axis=1) <= limit
+            leader[members[close]] = lead[close]
+            members = members[~close]
+    return leader
+
+
+def consolidate(colors, threshold=DEFAULT_THRESHOLD, representative="first"):
+    """Merges colors within threshold ΔE76 of a shared cluster leader; returns a Consolidation.
+
+    representative picks each cluster's color: its first color, the
+    occurrence-weighted mean in Lab, or its most frequent member (earliest
+    on ties). Exact duplicates always merge.
+    """
+    if representative not in REPRESENTATIVES:
+        raise ValueError(f"Unknown representative: {representative!r}")
+    packed = as_packed(colors) & np.uint32(0xFFFFFF)
+    if not len(packed):
+        empty = np.empty(0, dtype=np.uint32)
+        return Consolidation(empty, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+
+    # Work on unique colors, ranked by first appearance
+    unique, first_index, inverse, occurrences = np.unique(packed, return_index=True, return_inverse=True,
+                                                          return_counts=True)
+    rank_order = np.argsort(first_index, kind="stable")
+    rank = np.empty_like(rank_order)
+    rank[rank_order] = np.arange(len(rank_order))
+    ranked = unique[rank_order]
+    ranked_counts = occurrences[rank_order]
+    lab = rgb_to_lab(ranked)
+
+    leaders = leader_clusters(lab, threshold) if threshold > 0 else np.arange(len(ranked))
+    _, first_rank, cluster_of_leader = np.unique(leaders, return_index=True, return_inverse=True)
+    # Number clusters by their first color
+    renumber = np.empty_like(first_rank)
+    renumber[np.argsort(first_rank, kind="stable")] = np.arange(len(first_rank))
+    cluster_of_rank = renumber[cluster_of_leader]
+    first_rank = np.sort(first_rank)
+    clusters = len(first_rank)
+    sizes = np.bincount(cluster_of_rank, weights=ranked_counts, minlength=clusters).astype(np.int64)
+
+    if representative == "first":
+        result = ranked[first_rank]
+    elif representative == "mean":
+        weights = ranked_counts.astype(float)
+        sums = np.stack([np.bincount(cluster_of_rank, weights=lab[:, axis] * weights, minlength=clusters)
+                         for axis in range(3)], axis=1)
+        result = convert(sums / sizes[:, None], "lab", "packed")
+    else:
+        # Highest count per cluster; among equals the lowest rank wins
+        order = np.lexsort((np.arange(len(ranked)), -ranked_counts, cluster_of_rank))
+        starts = np.searchsorted(cluster_of_rank[order], np.arange(clusters))
+        result = ranked[order[starts]]
+
+    labels = cluster_of_rank[rank[inverse]]
+    return Consolidation(result.astype(np.uint32), labels, sizes)
+
+
+def merge_report(consolidation, colors, limit=50):
+    """Text lines describing each merged cluster, largest first (at most limit lines)."""
+    packed = as_packed(colors) & np.uint32(0xFFFFFF)
+    merged = np.flatnonzero(consolidation.sizes > 1)
+    merged = merged[np.argsort(-consolidation.sizes[merged], kind="stable")]
+    lines = []
+    for cluster in merged[:limit].tolist():
+        members = np.unique(packed[consolidation.labels == cluster])
+        shown = ", ".join(f"#{rgb:06X}" for rgb in members[:6].tolist())
+        more = f" and {len(members) - 6} more" if len(members) > 6 else ""
+        lines.append(f"#{int(consolidation.colors[cluster]):06X} ← {consolidation.sizes[cluster]} colors "
+                     f"({shown}{more})")
+    if len(merged) > limit:
+        lines.append(f"... and {len(merged) - limit} more merged clusters")
+    return lines
@@ -0,0 +1,307 @@
+"""Text contrast between every pair of palette colors: WCAG 2.x ratios and APCA.
+
+The WCAG contrast ratio of two colors is (L1 + 0.05) / (L2 + 0.05) for
+their relative luminances, lighter over darker, so it is symmetric and
+1..21. APCA (the candidate for WCAG 3, version 0.0.98G-4g) reports a
+lightness contrast Lc of text on a background instead: positive for dark
+text on a light background, negative the other way round, about -108..106.
+
+Luminances are computed once per color; the N x N matrices are built from
+them in row blocks of at most BLOCK_ELEMENTS cells, so a 10k-color palette
+never holds 100M floats at once. Pair counts per level need no matrix at
+all: with luminances sorted, the partners passing a threshold are a
+suffix found by binary search. The report and exports go through
+unique_colors(), so duplicates count once.
+This module has no Qt dependency.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from colorspace import SRGB_TO_LINEAR, SRGB_UNIT, as_packed, unpack_rgb
+
+# Minimum ratios, weakest first. AAA for large text needs 4.5, the same as AA.
+LEVELS = {"AA-large": 3.0, "AA": 4.5, "AAA": 7.0}
+DEFAULT_LEVEL = "AA"
+BLOCK_ELEMENTS = 1 << 21 # Matrix cells per block: 16 MB of float64
+METRICS = ("wcag", "apca")
+
+_WCAG_WEIGHTS = np.array([0.2126, 0.7152, 0.0722])
+
+# APCA 0.0.98G-4g constants
+_APCA_WEIGHTS = np.array([0.2126729, 0.7151522, 0.0721750])
+_APCA_LINEAR = SRGB_UNIT ** 2.4 # APCA uses a plain 2.4 power, not the piecewise sRGB curve
+_BLACK_THRESHOLD, _BLACK_CLAMP = 0.022, 1.414
+_NORMAL_BACKGROUND, _NORMAL_TEXT = 0.56, 0.57 # Dark text on a light background
+_REVERSE_BACKGROUND, _REVERSE_TEXT = 0.65, 0.62 # Light text on a dark background
+_SCALE, _OFFSET, _LOW_CLIP = 1.14, 0.027, 0.1
+
+ContrastSummary = namedtuple("ContrastSummary", "colors pairs passing isolated")
+# colors: distinct colors analyzed; pairs: unordered pairs of them
+# passing: {level: pairs meeting it}; isolated: {level: colors with no partner meeting it}
+
+
+def unique_colors(colors):
+    """The distinct colors (alpha dropped) in order of first appearance."""
+    packed = as_packed(colors) & np.uint32(0xFFFFFF)
+    _, first = np.unique(packed, return_index=True)
+    return packed[np.sort(first)]
+
+
+# --- Luminance ---
+def relative_luminance(colors):
+    """WCAG relative luminance of packed colors, 0..1."""
+    return SRGB_TO_LINEAR[unpack_rgb(colors)] @ _WCAG_WEIGHTS
+
+
+def apca_luminance(colors):
+    """APCA screen luminance of packed colors, with near-black soft-clamped."""
+    y = _APCA_LINEAR[unpack_rgb(colors)] @ _APCA_WEIGHTS
+    return np.where(y > _BLACK_THRESHOLD, y, y + np.clip(_BLACK_THRESHOLD - y, 0, None) ** _BLACK_CLAMP)
+
+
+# --- Pairwise contrast ---
+def contrast_ratio(luminance_a, luminance_b):
+    """WCAG contrast ratio of luminances, broadcast against each other."""
+    a = np.asarray(luminance_a) + 0.05
+    b = np.asarray(luminance_b) + 0.05
+    return np.maximum(a, b) / np.minimum(a, b)
+
+
+class _ApcaTerms:
+    """Per-color powers of APCA luminance, so a block is two subtractions and a select."""
+    __slots__ = ("y", "normal_background", "normal_text", "reverse_background", "reverse_text")
+
+    def __init__(self, y):
+        self.y = y
+        self.normal_background = y ** _NORMAL_BACKGROUND
+        self.normal_text = y ** _NORMAL_TEXT
+        self.reverse_background = y ** _REVERSE_BACKGROUND
+        self.reverse_text = y ** _REVERSE_TEXT
+
+    def lc(self, text, background):
+        """Lc of the colors at index text on those at background (index arrays or slices), broadcast."""
+        # Normal polarity is always positive and reverse never is, so the low clip and offset
+        # apply to |Lc|. Luminances under 0.0005 apart (APCA's delta-Y minimum) land inside the clip anyway.
+        lc = np.where(self.y[background] > self.y[text],
+                      self.normal_background[background] - self.normal_text[text],
+                      self.reverse_background[background] - self.reverse_text[text])
+        lc *= _SCALE
+        clipped = np.abs(lc) < _LOW_CLIP
+        lc -= np.copysign(_OFFSET, lc)
+        lc[clipped] = 0.0
+        lc *= 100
+        return lc
+
+
+def apca_contrast(text, background):
+    """APCA Lc of packed text colors on packed background colors, element by element."""
+    text, background = as_packed(text), as_packed(background)
+    terms = _ApcaTerms(apca_luminance(np.concatenate([text, background])))
+    return terms.lc(np.arange(len(text)), np.arange(len(text), len(text) + len(background)))
+
+
+def _block_rows(columns, block_elements):
+    return max(1, block_elements // max(columns, 1))
+
+
+def contrast_blocks(colors, metric="wcag", block_elements=BLOCK_ELEMENTS):
+    """Yields (first row, block) slices of the N x N contrast matrix of colors, as given.
+
+    A block holds whole rows against every column. For "apca", rows are
+    the text color and columns the background.
+    """
+    colors = as_packed(colors)
+    count = len(colors)
+    rows = _block_rows(count, block_elements)
+    if metric == "wcag":
+        offset = relative_luminance(colors) + 0.05
+        for start in range(0, count, rows):
+            row = offset[start:start + rows, None]
+            yield start, np.maximum(row, offset) / np.minimum(row, offset)
+    elif metric == "apca":
+        terms = _ApcaTerms(apca_luminance(colors))
+        for start in range(0, count, rows):
+            yield start, terms.lc(np.s_[start:start + rows, None], np.s_[:]) # Slices: views, no gathers
+    else:
+        raise ValueError(f"Unknown contrast metric: {metric!r}")
+
+
+def passing_pairs(colors, minimum, block_elements=BLOCK_ELEMENTS):
+    """Yields (i, j, ratio) arrays of the pairs i < j of colors whose ratio is at least minimum.
+
+    Pairs come in row-major order, one upper-triangle block at a time.
+    """
+    offset = relative_luminance(colors) + 0.05
+    scaled = minimum * offset
+    count = len(offset)
+    rows = _block_rows(count, block_elements)
+    for start in range(0, count - 1, rows):
+        stop = min(start + rows, count - 1)
+        # high >= minimum * low, as summarize() counts; the minimum is over 1, so only one side can hold
+        passed = offset[start:stop, None] >= scaled[start + 1:]
+        passed |= offset[start + 1:] >= scaled[start:stop, None]
+        # Only the block's first columns reach back below the diagonal
+        width = stop - start
+        passed[:, :width] &= np.arange(start + 1, start + 1 + width) > np.arange(start, stop)[:, None]
+        i, j = np.nonzero(passed)
+        i += start
+        j += start + 1
+        a, b = offset[i], offset[j]
+        yield i, j, np.maximum(a, b) / np.minimum(a, b)
+
+
+def summarize(colors):
+    """Counts the pairs meeting each level without building the matrix; returns a ContrastSummary."""
+    offset = np.sort(relative_luminance(colors) + 0.05)
+    count = len(offset)
+    passing, isolated = {}, {}
+    for level, minimum in LEVELS.items():
+        # Partners lighter than each color by the ratio; each pair is counted from its darker side
+        first = np.searchsorted(offset, minimum * offset, side="left")
+        passing[level] = int((count - first).sum())
+        # A color's best partner is the darkest or the lightest color
+        if count:
+            best_high = offset[-1] >= minimum * offset
+            best_low = offset >= minimum * offset[0]
+            isolated[level] = int(count - np.count_nonzero(best_high | best_low))
+        else:
+            isolated[level] = 0
+    return ContrastSummary(count, count * (count - 1) // 2, passing, isolated)
+
+
+def describe(summary, level):
+    """One line summing up a ContrastSummary at level."""
+    passing = summary.passing[level]
+    share = f" ({passing / summary.pairs:.1%})" if summary.pairs else ""
+    isolated = summary.isolated[level]
+    return (f"{summary.colors:,} colors, {summary.pairs:,} pairs: {passing:,} meet {level} "
+            f"(≥ {LEVELS[level]:g}:1){share}; {isolated:,} {'color has' if isolated == 1 else 'colors have'} "
+            f"no {level} partner")
+
+
+# --- Export ---
+def pair_rows(colors, level, progress=None):
+    """Yields (a, b, ratio, level, Lc a on b, Lc b on a) lists per block of passing pairs."""
+    terms = _ApcaTerms(apca_luminance(colors))
+    names = np.array(list(LEVELS))
+    minimums = np.array(list(LEVELS.values()))
+    requested = list(LEVELS).index(level)
+    for i, j, ratio in passing_pairs(colors, LEVELS[level]):
+        # Truncated, not rounded, so a listed 4.49 never passes as 4.5
+        shown = np.floor(ratio * 100) / 100
+        # At least the requested level: a ratio a rounding error under its minimum still passed high >= minimum * low
+        levels = names[np.maximum(np.searchsorted(minimums, ratio, side="right") - 1, requested)]
+        yield zip(colors[i].tolist(), colors[j].tolist(), shown.tolist(), levels.tolist(),
+                  np.round(terms.lc(i, j), 1).tolist(), np.round(terms.lc(j, i), 1).tolist())
+        if progress is not None and len(i):
+            progress(int(i[-1]) + 1)
+
+
+def write_pairs_csv(f, colors, level, progress):
+    f.write("COLOR_A,COLOR_B,RATIO,LEVEL,APCA_A_ON_B,APCA_B_ON_A\r\n")
+    for rows in pair_rows(colors, level, progress):
+        f.write("".join(f"#{a:06X},#{b:06X},{ratio:.2f},{name},{lc_ab:.1f},{lc_ba:.1f}\r\n"
+                        for a, b, ratio, name, lc_ab, lc_ba in rows))
+
+
+def write_pairs_json(f, colors, level, progress):
+    f.write(f'{{\n  "level": "{level}",\n  "minimum_ratio": {LEVELS[level]:g},\n  "colors": {len(colors)},\n'
+            '  "pairs": [')
+    separator = "\n"
+    for rows in pair_rows(colors, level, progress):
+        for a, b, ratio, name, lc_ab, lc_ba in rows:
+            f.write(f'{separator}    {{"a": "#{a:06X}", "b": "#{b:06X}", "ratio": {ratio:.2f}, '
+                    f'"level": "{name}", "apca": [{lc_ab:.1f}, {lc_ba:.1f}]}}')
+            separator = ",\n"
+    f.write("\n  ]\n}" if separator != "\n" else "]\n}")
+
+
+PAIR_WRITERS = {"csv": write_pairs_csv, "json": write_pairs_json}
+
+
+def write_matrix_csv(f, colors, metric, progress):
+    """The full matrix: a header row of colors, then one row per color."""
+    labels = [f"#{rgb:06X}" for rgb in colors.tolist()]
+    f.write(",".join([metric.upper()] + labels) + "\r\n")
+    cell = "{:.2f}" if metric == "wcag" else "{:.1f}"
+    row_template = ",".join([cell] * len(labels)) # One format call per row
+    for start, block in contrast_blocks(colors, metric):
+        f.write("".join(f"{labels[start + k]},{row_template.format(*row)}\r\n" for k, row in enumerate(block.tolist())))
+        progress(start + len(block))
+
+
+def export_pairs(colors, path, level=DEFAULT_LEVEL, fmt="csv", progress=None, is_cancelled=None):
+    """Writes the pairs of distinct colors meeting level to path, atomically; returns how many colors were checked.
+
+    progress(rows done, rows) and is_cancelled() work as in exporters.export_palette.
+    """
+    from exporters import ExportCancelled, atomic_output
+
+    if level not in LEVELS:
+        raise ValueError(f"Unknown level {level!r}; choose from {', '.join(LEVELS)}")
+    writer = PAIR_WRITERS[fmt]
+    colors = unique_colors(colors)
+
+    def report(done):
+        if is_cancelled is not None and is_cancelled():
+            raise ExportCancelled()
+        if progress is not None:
+            progress(done, len(colors))
+
+    with atomic_output(path, f".{fmt}") as f:
+        writer(f, colors, level, report)
+    return len(colors)
+
+
+# --- Command line ---
+def contrast_command(argv):
+    """`cmilker contrast`: the pairs of an exported palette that meet a WCAG level."""
+    import argparse
+    import sys
+
+    from palette_io import PaletteFormatError, iter_palette_colors
+
+    parser = argparse.ArgumentParser(
+        prog="cmilker contrast",
+        description="List the color pairs of a CSV or JSON palette that meet a WCAG 2.x contrast level, "
+                    "with their APCA contrast both ways.")
+    parser.add_argument("palette", metavar="PALETTE", help="an exported .csv or .json palette")
+    parser.add_argument("-l", "--level", choices=LEVELS, default=DEFAULT_LEVEL,
+                        help=f"minimum level a pair must meet (default {DEFAULT_LEVEL})")
+    parser.add_argument("--format", choices=sorted(PAIR_WRITERS), default="csv")
+    parser.add_argument("--matrix", choices=METRICS,
+                        help="write the full N x N matrix of WCAG ratios or APCA Lc (text rows on "
+                             "background columns) as CSV instead of the pairs")
+    parser.add_argument("--summary", action="store_true", help="only print the per-level pair counts")
+    parser.add_argument("-o", "--output", help="write to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    try:
+        colors = unique_colors(np.fromiter(iter_palette_colors(args.palette), dtype=np.uint32))
+    except (OSError, UnicodeDecodeError, PaletteFormatError) as e:
+        print(f"cmilker contrast: {args.palette}: {e}", file=sys.stderr)
+        return 1
+    summary = summarize(colors)
+    for level in LEVELS: # On stderr unless it is the whole output
+        print(describe(summary, level), file=sys.stdout if args.summary else sys.stderr)
+    if args.summary:
+        return 0
+
+    def write(f):
+        if args.matrix:
+            write_matrix_csv(f, colors, args.matrix, lambda done: None)
+        else:
+            PAIR_WRITERS[args.format](f, colors, args.level, lambda done: None)
+
+    if args.output is None:
+        write(sys.stdout)
+        return 0
+    from exporters import atomic_output
+    try:
+        with atomic_output(args.output, ".csv" if args.matrix else f".{args.format}") as f:
+            write(f)
+    except OSError as e:
+        print(f"cmilker contrast: {args.output}: {e}", file=sys.stderr)
+        return 1
+    return 0
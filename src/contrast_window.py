@@ -0,0 +1,256 @@
+"""The palette contrast report: which color pairs are readable as text on each other.
+
+Built by PaletteWindow the first time it is opened. contrast.py does the
+work on QThreadPool, so the 50M pairs of a 10k-color palette never block
+the GUI thread; the window lists the first pairs and exports all of them.
+"""
+import itertools
+import os
+
+from PyQt6.QtCore import QObject, QRunnable, Qt, QThreadPool, pyqtSignal
+from PyQt6.QtGui import QColor, QFont, QIcon, QPainter, QPixmap
+from PyQt6.QtWidgets import (
+    QComboBox,
+    QFileDialog,
+    QHBoxLayout,
+    QLabel,
+    QMessageBox,
+    QPushButton,
+    QTreeWidget,
+    QTreeWidgetItem,
+    QVBoxLayout,
+    QWidget,
+)
+
+import tracing
+from contrast import DEFAULT_LEVEL, LEVELS, describe, export_pairs, pair_rows, summarize, unique_colors
+from exporters import ExportCancelled
+
+DISPLAY_LIMIT = 1000 # Pairs listed; exports have them all
+
+
+def _sample(text_rgb, background_rgb, width=36, height=18):
+    """"Aa" in one color on the other."""
+    pixmap = QPixmap(width, height)
+    pixmap.fill(QColor.fromRgb(background_rgb))
+    painter = QPainter(pixmap)
+    font = QFont()
+    font.setPixelSize(height - 4)
+    font.setBold(True)
+    painter.setFont(font)
+    painter.setPen(QColor.fromRgb(text_rgb))
+    painter.drawText(pixmap.rect(), Qt.AlignmentFlag.AlignCenter, "Aa")
+    painter.end()
+    return pixmap
+
+
+# --- Contrast Window ---
+class ContrastWindow(QWidget):
+    """Sums up the palette's WCAG contrast and lists the pairs that meet the chosen level."""
+    COLUMNS = ("Sample", "Color A", "Color B", "Ratio", "Level", "APCA A on B", "APCA B on A")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Palette Contrast")
+        self.resize(640, 440)
+        self.colors = None # Distinct colors of the analyzed snapshot
+        self._analyze_task = None
+        self._export_task = None
+
+        self.main_layout = QVBoxLayout(self)
+        self.main_layout.setContentsMargins(5, 5, 5, 5)
+        self.main_layout.setSpacing(5)
+
+        self.level_layout = QHBoxLayout()
+        self.level_layout.addWidget(QLabel("Pairs meeting:"))
+        self.level_box = QComboBox()
+        for level, minimum in LEVELS.items():
+            self.level_box.addItem(f"{level} ({minimum:g}:1)", level)
+        self.level_box.setCurrentIndex(self.level_box.findData(DEFAULT_LEVEL))
+        self.level_box.setToolTip("WCAG 2.x minimum contrast ratio; large text is 18pt, or 14pt bold")
+        self.level_box.currentIndexChanged.connect(self.analyze)
+        self.level_layout.addWidget(self.level_box)
+        self.level_layout.addStretch(1)
+        self.main_layout.addLayout(self.level_layout)
+
+        self.summary_label = QLabel()
+        self.summary_label.setWordWrap(True)
+        self.main_layout.addWidget(self.summary_label)
+
+        self.pairs = QTreeWidget()
+        self.pairs.setHeaderLabels(self.COLUMNS)
+        self.pairs.setRootIsDecorated(False)
+        self.pairs.setUniformRowHeights(True)
+        self.pairs.setIconSize(_sample(0, 0).size())
+        self.pairs.headerItem().setToolTip(5, "APCA lightness contrast of color A as text on color B")
+        self.pairs.headerItem().setToolTip(6, "APCA lightness contrast of color B as text on color A")
+        self.main_layout.addWidget(self.pairs, 1)
+
+        self.button_panel = QHBoxLayout()
+        self.export_button = QPushButton("Export Pairs...")
+        self.export_button.setToolTip("Write every pair meeting the level, with its ratio and APCA contrast")
+        self.export_button.clicked.connect(self.export_pairs)
+        self.button_panel.addWidget(self.export_button)
+        self.button_panel.addStretch(1)
+        self.main_layout.addLayout(self.button_panel)
+
+        self.status_label = QLabel()
+        self.main_layout.addWidget(self.status_label)
+
+    @property
+    def level(self):
+        return self.level_box.currentData()
+
+    def show_contrast(self, colors):
+        """Shows the window and analyzes colors, a palette snapshot."""
+        self.colors = unique_colors(colors)
+        self.setWindowTitle(f"Palette Contrast ({len(self.colors):,} colors)")
+        self.analyze()
+        self.show()
+        self.raise_()
+        self.activateWindow()
+
+    def analyze(self):
+        """Re-runs the analysis for the current level on a worker thread."""
+        if self.colors is None:
+            return
+        signals = AnalyzeSignals(self)
+        signals.finished.connect(self._on_analyzed, Qt.ConnectionType.QueuedConnection)
+        signals.failed.connect(self._on_analyze_failed, Qt.ConnectionType.QueuedConnection)
+        self._analyze_task = AnalyzeTask(self.colors, self.level, signals) # Supersedes a running one
+        self.status_label.setText(f"Checking {len(self.colors):,} colors...")
+        QThreadPool.globalInstance().start(self._analyze_task)
+
+    def _on_analyzed(self, task, summary, rows):
+        if task is not self._analyze_task:
+            return
+        self._analyze_task = None
+        self.summary_label.setText(describe(summary, task.level))
+        self.pairs.clear()
+        for a, b, ratio, level, lc_ab, lc_ba in rows:
+            item = QTreeWidgetItem(self.pairs)
+            item.setIcon(0, QIcon(_sample(a, b)))
+            item.setText(1, f"#{a:06X}")
+            item.setText(2, f"#{b:06X}")
+            item.setText(3, f"{ratio:.2f}:1")
+            item.setText(4, level)
+            item.setText(5, f"{lc_ab:.1f}")
+            item.setText(6, f"{lc_ba:.1f}")
+        passing = summary.passing[task.level]
+        shown = f"first {len(rows):,} of {passing:,}" if passing > len(rows) else f"{passing:,}"
+        self.status_label.setText(f"Showing the {shown} {'pair' if passing == 1 else 'pairs'} in palette order")
+
+    def _on_analyze_failed(self, task, message):
+        if task is not self._analyze_task:
+            return
+        self._analyze_task = None
+        self.status_label.setText(f"Contrast check failed: {message}")
+
+    # --- Export ---
+    def export_pairs(self):
+        """Asks for a CSV or JSON file and writes every pair meeting the level to it in the background."""
+        if self.colors is None or self._export_task is not None:
+            return
+        filename, selected = QFileDialog.getSaveFileName(self, "Export Contrast Pairs",
+                                                         f"contrast-{self.level}.csv", "CSV (*.csv);;JSON (*.json)")
+        if not filename:
+            return
+        fmt = "json" if selected.startswith("JSON") or filename.lower().endswith(".json") else "csv"
+        if not os.path.splitext(filename)[1]:
+            filename += f".{fmt}"
+        self.export_to(filename, fmt)
+
+    def export_to(self, filename, fmt="csv"):
+        signals = ExportPairsSignals(self)
+        signals.progress.connect(self._on_export_progress, Qt.ConnectionType.QueuedConnection)
+        signals.finished.connect(self._on_export_finished, Qt.ConnectionType.QueuedConnection)
+        signals.failed.connect(self._on_export_failed, Qt.ConnectionType.QueuedConnection)
+        self._export_task = ExportPairsTask(self.colors, filename, self.level, fmt, signals)
+        self.export_button.setEnabled(False)
+        self.status_label.setText(f"Exporting {self.level} pairs...")
+        QThreadPool.globalInstance().start(self._export_task)
+
+    def _on_export_progress(self, done, total):
+        if self._export_task is not None:
+            self.status_label.setText(f"Exporting {self._export_task.level} pairs... {done * 100 // max(total, 1)}%")
+
+    def _on_export_finished(self, task):
+        if task is not self._export_task:
+            return
+        self._export_task = None
+        self.export_button.setEnabled(True)
+        self.status_label.setText(f"Exported the {task.level} pairs to {task.filename}")
+
+    def _on_export_failed(self, task, message):
+        if task is not self._export_task:
+            return
+        self._export_task = None
+        self.export_button.setEnabled(True)
+        self.status_label.clear()
+        QMessageBox.critical(self, "Export Error", f"Failed to export the pairs: {message}")
+
+    def closeEvent(self, event):
+        if self._export_task is not None: # Its partial file is removed
+            self._export_task.cancelled = True
+            self._export_task = None
+            self.export_button.setEnabled(True)
+            self.status_label.clear()
+        super().closeEvent(event)
+
+
+# --- Background work ---
+class AnalyzeSignals(QObject):
+    """Signals emitted by AnalyzeTask; delivered to the GUI thread as queued calls."""
+    finished = pyqtSignal(object, object, object) # task, contrast.ContrastSummary, first pair rows
+    failed = pyqtSignal(object, str) # task, error message
+
+
+class AnalyzeTask(QRunnable):
+    """Counts the pairs meeting each level and collects the first ones meeting level."""
+    def __init__(self, colors, level, signals):
+        super().__init__()
+        self.colors = colors
+        self.level = level
+        self.signals = signals
+
+    def run(self):
+        try:
+            with tracing.span("contrast.analyze", colors=len(self.colors), level=self.level):
+                summary = summarize(self.colors)
+                rows = list(itertools.islice(itertools.chain.from_iterable(pair_rows(self.colors, self.level)),
+                                             DISPLAY_LIMIT))
+        except (MemoryError, ValueError) as e:
+            self.signals.failed.emit(self, str(e) or type(e).__name__)
+            return
+        self.signals.finished.emit(self, summary, rows)
+
+
+class ExportPairsSignals(QObject):
+    """Signals emitted by ExportPairsTask; delivered to the GUI thread as queued calls."""
+    progress = pyqtSignal(int, int) # rows done, rows
+    finished = pyqtSignal(object) # task
+    failed = pyqtSignal(object, str) # task, error message
+
+
+class ExportPairsTask(QRunnable):
+    """Streams the pairs meeting a level to disk on a worker thread."""
+    def __init__(self, colors, filename, level, fmt, signals):
+        super().__init__()
+        self.colors = colors
+        self.filename = filename
+        self.level = level
+        self.fmt = fmt
+        self.signals = signals
+        self.cancelled = False
+
+    def run(self):
+        try:
+            with tracing.span("contrast.export", colors=len(self.colors), level=self.level, format=self.fmt):
+                export_pairs(self.colors, self.filename, self.level, self.fmt,
+                             progress=self.signals.progress.emit, is_cancelled=lambda: self.cancelled)
+        except ExportCancelled:
+            return
+        except (OSError, MemoryError, ValueError) as e:
+            self.signals.failed.emit(self, str(e) or type(e).__name__)
+            return
+        self.signals.finished.emit(self)
@@ -0,0 +1,262 @@
+"""Single-instance command server run by the GUI (see daemon_client.py for the protocol).
+
+CommandServer listens on a QLocalServer at daemon_client.socket_path() and
+answers line-delimited JSON requests on the GUI thread. Slow work (exports)
+runs on QThreadPool, and grabs reply once the user has finished selecting,
+so one client never blocks another. Created by MainWindow after its first
+paint, so QtNetwork stays out of startup.
+"""
+import io
+import json
+import os
+
+from PyQt6.QtCore import QObject, QRunnable, Qt, QThreadPool, pyqtSignal
+from PyQt6.QtGui import QColor
+from PyQt6.QtNetwork import QLocalServer, QLocalSocket
+
+import tracing
+from daemon_client import (
+    MAX_REQUEST_BYTES,
+    PROTOCOL_VERSION,
+    DaemonError,
+    encode,
+    private_directory,
+    socket_directory,
+    socket_path,
+)
+
+
+class CommandError(Exception):
+    """A request that can't be carried out; its message is sent back to the client."""
+
+
+class CommandServer(QObject):
+    """Serves the commands in HANDLERS for a MainWindow."""
+    def __init__(self, window, path=None):
+        super().__init__(window)
+        self.window = window
+        self.path = path or socket_path()
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.SocketOption.UserAccessOption)
+        self.server.newConnection.connect(self._on_new_connection)
+        self._buffers = {} # QLocalSocket -> bytes received after the last complete line
+        self._grab_request = None # (socket, request id, add, previous sample mode) of a client's grab in progress
+        self._grab_color = None
+        self._signals = TaskSignals(self)
+        self._signals.finished.connect(self._on_task_finished, Qt.ConnectionType.QueuedConnection)
+        self._signals.failed.connect(self._on_task_failed, Qt.ConnectionType.QueuedConnection)
+
+    def listen(self):
+        """Starts listening; returns False if another instance already serves the socket."""
+        from daemon_client import Connection
+
+        directory = os.path.dirname(self.path)
+        try:
+            if directory == socket_directory():
+                private_directory(directory)
+            else: # Chosen with CMILKER_SOCKET
+                os.makedirs(directory, mode=0o700, exist_ok=True)
+        except (DaemonError, OSError) as e:
+            tracing.warning(f"Command server: {e}")
+            return False
+        if self.server.listen(self.path):
+            return True
+        # A socket file is left behind if an instance crashed; take it over if nobody answers
+        try:
+            Connection(self.path, timeout=0.5).close()
+            tracing.warning(f"Command server: another instance is listening on {self.path}")
+            return False
+        except DaemonError:
+            pass
+        QLocalServer.removeServer(self.path)
+        if not self.server.listen(self.path):
+            tracing.warning(f"Command server: cannot listen on {self.path}: {self.server.errorString()}")
+            return False
+        return True
+
+    def close(self):
+        self.server.close() # Also removes the socket file
+
+    # --- Connections ---
+    def _on_new_connection(self):
+        while self.server.hasPendingConnections():
+            connection = self.server.nextPendingConnection()
+            self._buffers[connection] = b""
+            connection.readyRead.connect(lambda connection=connection: self._on_ready_read(connection))
+            connection.disconnected.connect(lambda connection=connection: self._on_disconnected(connection))
+
+    def _on_disconnected(self, connection):
+        self._buffers.pop(connection, None) # Replies still pending for it are dropped
+        connection.deleteLater()
+
+    def _on_ready_read(self, connection):
+        data = self._buffers.get(connection, b"") + bytes(connection.readAll())
+        *lines, rest = data.split(b"\n")
+        if len(rest) > MAX_REQUEST_BYTES:
+            self._reply(connection, None, error="Request too long")
+            connection.disconnectFromServer()
+            return
+        self._buffers[connection] = rest
+        for line in lines:
+            if line.strip():
+                self._handle_line(connection, line)
+
+    def _handle_line(self, connection, line):
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            command = request["command"]
+            args = request.get("args") or {}
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self._reply(connection, None, error="Malformed request")
+            return
+        handler = HANDLERS.get(command)
+        if handler is None:
+            self._reply(connection, request_id, error=f"Unknown command: {command!r}")
+            return
+        with tracing.span("daemon.command", command=command):
+            try:
+                result = handler(self, connection, request_id, **args)
+            except TypeError: # Missing or unexpected arguments
+                self._reply(connection, request_id, error=f"Invalid arguments for {command!r}: {sorted(args)}")
+                return
+            except (CommandError, ValueError) as e:
+                self._reply(connection, request_id, error=str(e))
+                return
+        if result is not _PENDING:
+            self._reply(connection, request_id, result)
+
+    def _reply(self, connection, request_id, result=None, error=None):
+        if connection not in self._buffers or connection.state() != QLocalSocket.LocalSocketState.ConnectedState:
+            return # The client went away while its request ran
+        if error is None:
+            message = {"id": request_id, "ok": True, "result": result}
+        else:
+            message = {"id": request_id, "ok": False, "error": error}
+        connection.write(encode(message))
+        connection.flush()
+
+    # --- Commands ---
+    def ping(self, connection, request_id):
+        return {"version": PROTOCOL_VERSION, "pid": os.getpid(), "colors": len(self.window.palette_model)}
+
+    def show(self, connection, request_id):
+        self.window.showNormal()
+        self.window.raise_()
+        self.window.activateWindow()
+        return {}
+
+    def add(self, connection, request_id, colors):
+        import numpy as np
+
+        if not isinstance(colors, list) or not colors:
+            raise CommandError("add needs a list of colors")
+        parsed = [QColor(name) if isinstance(name, str) else QColor() for name in colors]
+        invalid = [str(name) for name, color in zip(colors, parsed) if not color.isValid()]
+        if invalid:
+            raise CommandError(f"Invalid color: {', '.join(invalid)}")
+        packed = np.array([color.rgb() & 0xFFFFFF for color in parsed], dtype=np.uint32)
+        added = self.window.add_colors(packed)
+        self.window.update_color_display(parsed[-1])
+        return {"added": added, "total": len(self.window.palette_model)}
+
+    def grab(self, connection, request_id, mode=None, add=False):
+        from sampling import SampleMode
+
+        grabber = self.window.color_grabber
+        if grabber.is_grabbing:
+            raise CommandError("A grab is already in progress")
+        previous = grabber.sample_mode
+        if mode is not None: # For this grab only; the app's setting is restored afterwards
+            try:
+                grabber.sample_mode = SampleMode(mode)
+            except ValueError:
+                raise CommandError(f"Unknown sample mode: {mode!r}") from None
+        grabber.color_grabbed.connect(self._on_color_grabbed)
+        grabber.grabbing_finished.connect(self._on_grabbing_finished)
+        self._grab_request = (connection, request_id, bool(add), previous)
+        self._grab_color = None
+        self.window.start_color_grab()
+        return _PENDING
+
+    def _on_color_grabbed(self, color):
+        self._grab_color = color
+
+    def _on_grabbing_finished(self):
+        grabber = self.window.color_grabber
+        grabber.color_grabbed.disconnect(self._on_color_grabbed)
+        grabber.grabbing_finished.disconnect(self._on_grabbing_finished)
+        (connection, request_id, add, previous), self._grab_request = self._grab_request, None
+        grabber.sample_mode = previous
+        color = self._grab_color
+        if color is not None and add:
+            self.window.add_current_color_to_palette()
+        self._reply(connection, request_id, {"color": color.name().upper() if color is not None else None})
+
+    def export(self, connection, request_id, format="csv", path=None):
+        from exporters import FORMATS, export_palette
+
+        export_format = FORMATS.get(format)
+        if export_format is None:
+            raise CommandError(f"Unknown format {format!r}; choose from {', '.join(FORMATS)}")
+        colors = self.window.palette_model.store[:] # Snapshot; the export runs on the pool
+        if path is not None:
+            if not os.path.isabs(path):
+                raise CommandError("The export path must be absolute")
+
+            def work():
+                export_palette(colors, path, format)
+                return {"colors": len(colors), "path": path}
+        elif export_format.binary:
+            raise CommandError(f"The {export_format.label} format is binary; give an output file")
+        else:
+            def work():
+                stream = io.StringIO(newline="")
+                export_format.writer(stream, colors, "Color Milker Palette", lambda done: None)
+                return {"colors": len(colors), "data": stream.getvalue()}
+
+        QThreadPool.globalInstance().start(Task(connection, request_id, work, self._signals))
+        return _PENDING
+
+    def _on_task_finished(self, connection, request_id, result):
+        self._reply(connection, request_id, result)
+
+    def _on_task_failed(self, connection, request_id, message):
+        self._reply(connection, request_id, error=message)
+
+
+_PENDING = object() # Returned by handlers that reply later
+
+HANDLERS = {
+    "ping": CommandServer.ping,
+    "show": CommandServer.show,
+    "add": CommandServer.add,
+    "grab": CommandServer.grab,
+    "export": CommandServer.export,
+}
+
+
+# --- Background work ---
+class TaskSignals(QObject):
+    """Signals emitted by Task; delivered to the GUI thread as queued calls."""
+    finished = pyqtSignal(object, object, object) # socket, request id, result
+    failed = pyqtSignal(object, object, str) # socket, request id, error message
+
+
+class Task(QRunnable):
+    """Runs a command's slow part on a worker thread."""
+    def __init__(self, connection, request_id, work, signals):
+        super().__init__()
+        self.connection = connection
+        self.request_id = request_id
+        self.work = work
+        self.signals = signals
+
+    def run(self):
+        try:
+            with tracing.span("daemon.task"):
+                result = self.work()
+        except Exception as e: # Escaping the worker thread would abort the app; the client gets the error
+            self.signals.failed.emit(self.connection, self.request_id, str(e) or type(e).__name__)
+            return
+        self.signals.finished.emit(self.connection, self.request_id, result)
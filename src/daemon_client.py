@@ -0,0 +1,246 @@
+"""Client side of the single-instance daemon, behind `cmilker grab/add/export`.
+
+The running app (see daemon.py) listens on a local socket. Each request is
+one JSON object on one line, and so is its reply:
+
+    {"id": 1, "command": "add", "args": {"colors": ["#FF8800"]}}
+    {"id": 1, "ok": true, "result": {"added": 1, "total": 1}}
+    {"id": 2, "ok": false, "error": "Unknown command: 'frobnicate'"}
+
+This module imports only the standard library, so a command costs an
+interpreter start plus one round trip instead of a PyQt6 import and a new
+QApplication. If no instance is running, one is started in the background
+first (unless --no-start is given).
+"""
+import argparse
+import json
+import os
+import socket
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+
+SOCKET_NAME = "cmilker.sock"
+PROTOCOL_VERSION = 1
+MAX_REQUEST_BYTES = 1 << 20 # Longer request lines are rejected by the server
+CONNECT_TIMEOUT = 2.0 # Seconds
+REPLY_TIMEOUT = 30.0 # Seconds, except for grabs, which wait for the user
+START_TIMEOUT = 20.0 # Seconds to wait for a freshly started app to listen
+
+
+class DaemonError(Exception):
+    """No instance could be reached, or it rejected the request."""
+
+
+def _is_private(directory):
+    """True if directory is a real directory (not a symlink) owned by this user, closed to everyone else."""
+    try:
+        info = os.lstat(directory)
+    except OSError:
+        return False
+    if not stat.S_ISDIR(info.st_mode):
+        return False
+    if hasattr(os, "getuid") and (info.st_uid != os.getuid() or info.st_mode & 0o077):
+        return False
+    return True
+
+
+def socket_directory():
+    """The per-user directory holding the default socket.
+
+    $XDG_RUNTIME_DIR if set, else cmilker-<uid> in the temp directory. If
+    that exists but is not this user's private directory (another user may
+    have created it first), ~/.cmilker is used instead.
+    """
+    runtime = os.environ.get("XDG_RUNTIME_DIR") # Already private to the user
+    if runtime:
+        return runtime
+    uid = os.getuid() if hasattr(os, "getuid") else os.environ.get("USERNAME", "user")
+    directory = os.path.join(tempfile.gettempdir(), f"cmilker-{uid}")
+    if os.path.lexists(directory) and not _is_private(directory):
+        directory = os.path.join(os.path.expanduser("~"), ".cmilker")
+    return directory
+
+
+def private_directory(directory):
+    """Creates directory (0700) if needed; raises DaemonError unless it is private to this user."""
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    except OSError as e:
+        raise DaemonError(f"Cannot create {directory} ({e.strerror or e})") from e
+    if not _is_private(directory):
+        raise DaemonError(f"{directory} is not a directory private to this user; refusing to use it")
+    return directory
+
+
+def socket_path():
+    """The socket the app listens on; CMILKER_SOCKET overrides it.
+
+    By default it lives in socket_directory(), which the server only
+    listens in, and clients only connect through, once it checks out as
+    private to the user, so other users can't send or intercept commands.
+    """
+    override = os.environ.get("CMILKER_SOCKET")
+    if override:
+        return override
+    return os.path.join(socket_directory(), SOCKET_NAME)
+
+
+def encode(message):
+    return (json.dumps(message, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+# --- Client ---
+class Connection:
+    """A blocking connection to a running instance."""
+    def __init__(self, path=None, timeout=CONNECT_TIMEOUT):
+        path = path or socket_path()
+        directory = os.path.dirname(path)
+        if directory == socket_directory() and not _is_private(directory):
+            raise DaemonError(f"Color Milker is not running ({directory} is not private to this user)")
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        try:
+            self._sock.connect(path)
+        except OSError as e:
+            self._sock.close()
+            raise DaemonError(f"Color Milker is not running ({e.strerror or e})") from e
+        self._buffer = b""
+        self._next_id = 1
+
+    def close(self):
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def request(self, command, timeout=REPLY_TIMEOUT, **args):
+        """Sends one command and returns its result; raises DaemonError if it failed."""
+        request_id = self._next_id
+        self._next_id += 1
+        self._sock.settimeout(timeout)
+        try:
+            self._sock.sendall(encode({"id": request_id, "command": command, "args": args}))
+            while b"\n" not in self._buffer:
+                data = self._sock.recv(65536)
+                if not data:
+                    raise DaemonError("Color Milker closed the connection")
+                self._buffer += data
+        except socket.timeout as e:
+            raise DaemonError(f"No reply to {command!r} within {timeout:g} s") from e
+        except OSError as e:
+            raise DaemonError(f"Lost the connection to Color Milker ({e.strerror or e})") from e
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        reply = json.loads(line)
+        if not reply.get("ok"):
+            raise DaemonError(reply.get("error") or "Request failed")
+        return reply.get("result")
+
+
+def start_instance(timeout=START_TIMEOUT):
+    """Starts the app in the background and waits until it accepts connections."""
+    subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "cli.py")],
+                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                     start_new_session=True) # Outlives this command
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return Connection()
+        except DaemonError:
+            if time.monotonic() > deadline:
+                raise DaemonError(f"Color Milker did not start within {timeout:g} s") from None
+            time.sleep(0.05)
+
+
+def connect(start=True):
+    """Connects to the running instance, starting one first if needed and allowed."""
+    try:
+        return Connection()
+    except DaemonError:
+        if not start:
+            raise
+    return start_instance()
+
+
+# --- Commands ---
+def _run(prog, argv, configure, handle):
+    """Shared scaffolding: parse argv, connect, run handle(connection, args), report errors."""
+    parser = argparse.ArgumentParser(prog=f"cmilker {prog}")
+    configure(parser)
+    parser.add_argument("--no-start", action="store_true",
+                        help="fail instead of starting Color Milker when it is not running")
+    args = parser.parse_args(argv)
+    try:
+        with connect(start=not args.no_start) as connection:
+            return handle(connection, args, parser)
+    except DaemonError as e:
+        print(f"cmilker {prog}: {e}", file=sys.stderr)
+        return 1
+
+
+def grab_command(argv):
+    def configure(parser):
+        parser.description = "Grab a color from the screen with the running app and print its hex code."
+        parser.add_argument("--mode", choices=("center", "mean", "median", "mode", "dominant"),
+                            help="statistic for the selected area (default: the app's current setting)")
+        parser.add_argument("--add", action="store_true", help="also add the color to the palette")
+
+    def handle(connection, args, parser):
+        result = connection.request("grab", timeout=None, mode=args.mode, add=args.add) # Waits for the user
+        if result["color"] is None:
+            print("cmilker grab: cancelled", file=sys.stderr)
+            return 1
+        print(result["color"])
+        return 0
+
+    return _run("grab", argv, configure, handle)
+
+
+def add_command(argv):
+    def configure(parser):
+        parser.description = "Add colors to the running app's palette."
+        parser.add_argument("colors", nargs="+", metavar="COLOR", help="#RRGGBB, #RGB or a CSS color name")
+
+    def handle(connection, args, parser):
+        result = connection.request("add", colors=args.colors)
+        skipped = len(args.colors) - result["added"]
+        print(f"Added {result['added']} of {len(args.colors)} colors ({result['total']:,} in palette)"
+              + (f", {skipped} already present" if skipped else ""))
+        return 0
+
+    return _run("add", argv, configure, handle)
+
+
+def export_command(argv):
+    def configure(parser):
+        parser.description = "Export the running app's palette to a file, or print it."
+        parser.add_argument("--format", default="csv", help="an export format key, e.g. csv, json, gpl, css (default csv)")
+        parser.add_argument("-o", "--output", help="write to this file instead of stdout")
+
+    def handle(connection, args, parser):
+        path = os.path.abspath(args.output) if args.output else None # The app has its own working directory
+        result = connection.request("export", format=args.format, path=path)
+        if path is None:
+            sys.stdout.write(result["data"])
+        else:
+            print(f"Exported {result['colors']:,} colors to {path}", file=sys.stderr)
+        return 0
+
+    return _run("export", argv, configure, handle)
+
+
+def show_running_instance():
+    """Raises the window of an instance that is already running; returns False if there is none."""
+    try:
+        with Connection(timeout=0.5) as connection:
+            connection.request("show", timeout=CONNECT_TIMEOUT)
+    except DaemonError:
+        return False
+    return True
@@ -0,0 +1,254 @@
+"""Streaming palette exporters.
+
+Every writer takes packed 0xAARRGGBB colors (a uint32 NumPy array, usually a
+PaletteStore snapshot at 4 bytes per color) and writes them chunk by chunk,
+so no per-color Python objects or whole-file strings are built. Output goes
+to a temporary file next to the destination, which is renamed into place
+only after a successful write. This module has no Qt dependency.
+"""
+import contextlib
+import os
+import secrets
+import struct
+import tempfile
+
+import numpy as np
+
+from colorspace import convert
+
+CHUNK_SIZE = 65536
+BINARY_MAGIC = b"CMPAL\0"
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct("<6sHQ") # magic, version, color count
+
+# Flags for a new temporary file, as tempfile.mkstemp uses them
+_TEMP_FLAGS = (os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_NOFOLLOW", 0)
+               | getattr(os, "O_BINARY", 0) | getattr(os, "O_CLOEXEC", 0))
+
+
+class ExportCancelled(Exception):
+    """Raised inside a writer when the caller asked to stop."""
+
+
+class ExportFormat:
+    """A named output format and the function that writes it."""
+    __slots__ = ("key", "label", "extension", "writer", "binary")
+
+    def __init__(self, key, label, extension, writer, binary=False):
+        self.key = key
+        self.label = label
+        self.extension = extension
+        self.writer = writer
+        self.binary = binary
+
+    @property
+    def file_filter(self):
+        return f"{self.label} (*{self.extension})"
+
+
+def _chunks(colors):
+    for start in range(0, len(colors), CHUNK_SIZE):
+        yield start, colors[start:start + CHUNK_SIZE]
+
+
+def _channels(chunk):
+    return (chunk >> 16) & 0xFF, (chunk >> 8) & 0xFF, chunk & 0xFF
+
+
+# --- Text formats ---
+def write_csv(f, colors, name, report):
+    """HEX,R,G,B rows, as written by the original export_as_csv."""
+    f.write("HEX,R,G,B\r\n") # csv.writer's default line terminator
+    for start, chunk in _chunks(colors):
+        f.write("".join(f"#{v & 0xFFFFFF:06X},{v >> 16 & 0xFF},{v >> 8 & 0xFF},{v & 0xFF}\r\n"
+                        for v in chunk.tolist()))
+        report(start + len(chunk))
+
+
+def write_json(f, colors, name, report):
+    """{"colors": [{"hex", "rgb"}]}, byte-identical to json.dump(..., indent=2)."""
+    if not len(colors):
+        f.write('{\n  "colors": []\n}')
+        return
+    f.write('{\n  "colors": [\n')
+    for start, chunk in _chunks(colors):
+        separators = [",\n"] * len(chunk)
+        if not start:
+            separators[0] = ""
+        f.write("".join(
+            f'{separator}    {{\n      "hex": "#{v & 0xFFFFFF:06X}",\n      "rgb": [\n'
+            f'        {v >> 16 & 0xFF},\n        {v >> 8 & 0xFF},\n        {v & 0xFF}\n      ]\n    }}'
+            for separator, v in zip(separators, chunk.tolist())))
+        report(start + len(chunk))
+    f.write('\n  ]\n}')
+
+
+def write_gpl(f, colors, name, report):
+    """GIMP palette."""
+    f.write(f"GIMP Palette\nName: {name}\nColumns: 0\n#\n")
+    for start, chunk in _chunks(colors):
+        f.write("".join(f"{v >> 16 & 0xFF:3d} {v >> 8 & 0xFF:3d} {v & 0xFF:3d}\t#{v & 0xFFFFFF:06X}\n"
+                        for v in chunk.tolist()))
+        report(start + len(chunk))
+
+
+def write_css(f, colors, name, report):
+    """CSS custom properties on :root, numbered from 1."""
+    f.write(f"/* {name} */\n:root {{\n")
+    for start, chunk in _chunks(colors):
+        f.write("".join(f"  --color-{start + i + 1}: #{v & 0xFFFFFF:06X};\n"
+                        for i, v in enumerate(chunk.tolist())))
+        report(start + len(chunk))
+    f.write("}\n")
+
+
+# Color table columns: (space, header names, decimals)
+TABLE_SPACES = (
+    ("hsl", ("HSL_H", "HSL_S", "HSL_L"), 1),
+    ("hsv", ("HSV_H", "HSV_S", "HSV_V"), 1),
+    ("lab", ("LAB_L", "LAB_A", "LAB_B"), 2),
+    ("lch", ("LCH_L", "LCH_C", "LCH_H"), 2),
+    ("oklab", ("OKLAB_L", "OKLAB_A", "OKLAB_B"), 4),
+    ("oklch", ("OKLCH_L", "OKLCH_C", "OKLCH_H"), 4),
+    ("cmyk", ("C", "M", "Y", "K"), 1),
+)
+
+
+def write_color_table(f, colors, name, report):
+    """CSV of every color in HEX/RGB plus each of TABLE_SPACES, one column per channel."""
+    headers = ["HEX", "R", "G", "B"]
+    row_format = "#{:06X},{},{},{}"
+    for _, columns, decimals in TABLE_SPACES:
+        headers.extend(columns)
+        row_format += f",{{:.{decimals}f}}" * len(columns)
+    row_format += "\r\n"
+    f.write(",".join(headers) + "\r\n")
+    for start, chunk in _chunks(colors):
+        rgb = chunk & 0xFFFFFF
+        # One vectorized conversion per space, then one format call per row
+        values = np.column_stack([rgb, *_channels(chunk)] + [convert(chunk, "packed", space)
+                                                            for space, _, _ in TABLE_SPACES])
+        rows = values.tolist()
+        f.write("".join(row_format.format(int(row[0]), int(row[1]), int(row[2]), int(row[3]), *row[4:])
+                        for row in rows))
+        report(start + len(chunk))
+
+
+# --- Binary formats ---
+# Adobe Swatch Exchange color block named "#RRGGBB": big-endian block type and
+# length, UTF-16 name with terminator, "RGB " model, three floats, color type.
+_ASE_BLOCK = np.dtype([
+    ("type", ">u2"), ("length", ">u4"), ("name_length", ">u2"), ("name", ">u2", 8),
+    ("model", "S4"), ("rgb", ">f4", 3), ("color_type", ">u2"),
+])
+_ASE_HEX = np.frombuffer(b"0123456789ABCDEF", dtype=np.uint8).astype(np.uint16)
+
+
+def write_ase(f, colors, name, report):
+    """Adobe Swatch Exchange (.ase), one global RGB swatch per color."""
+    f.write(b"ASEF" + struct.pack(">HHI", 1, 0, len(colors)))
+    for start, chunk in _chunks(colors):
+        blocks = np.zeros(len(chunk), dtype=_ASE_BLOCK)
+        blocks["type"] = 0x0001
+        blocks["length"] = _ASE_BLOCK.itemsize - 6
+        blocks["name_length"] = 8
+        blocks["name"][:, 0] = ord("#")
+        for digit in range(6): # Hex digits, most significant first
+            blocks["name"][:, digit + 1] = _ASE_HEX[(chunk >> (20 - 4 * digit)) & 0xF]
+        blocks["model"] = b"RGB "
+        blocks["rgb"] = np.stack(_channels(chunk), axis=1) / np.float32(255)
+        blocks["color_type"] = 2 # Normal
+        f.write(blocks.tobytes())
+        report(start + len(chunk))
+
+
+def write_binary(f, colors, name, report):
+    """Compact Color Milker palette: header plus little-endian uint32 colors."""
+    f.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, len(colors)))
+    for start, chunk in _chunks(colors):
+        f.write(chunk.astype("<u4", copy=False).tobytes())
+        report(start + len(chunk))
+
+
+def read_binary(path):
+    """Returns the colors stored in a binary palette as a uint32 array."""
+    with open(path, "rb") as f:
+        header = f.read(BINARY_HEADER.size)
+        if len(header) < BINARY_HEADER.size:
+            raise ValueError(f"{path}: truncated palette header")
+        magic, version, count = BINARY_HEADER.unpack(header)
+        if magic != BINARY_MAGIC or version != BINARY_VERSION:
+            raise ValueError(f"{path}: not a Color Milker palette")
+        colors = np.fromfile(f, dtype="<u4", count=count)
+    if len(colors) != count:
+        raise ValueError(f"{path}: truncated palette data")
+    return colors.astype(np.uint32, copy=False)
+
+
+FORMATS = {fmt.key: fmt for fmt in (
+    ExportFormat("json", "JSON", ".json", write_json),
+    ExportFormat("csv", "CSV", ".csv", write_csv),
+    ExportFormat("gpl", "GIMP Palette", ".gpl", write_gpl),
+    ExportFormat("ase", "Adobe Swatch Exchange", ".ase", write_ase, binary=True),
+    ExportFormat("css", "CSS Custom Properties", ".css", write_css),
+    ExportFormat("table", "Color Table CSV (HSL/HSV/Lab/LCh/OKLab/OKLCh/CMYK)", ".csv", write_color_table),
+    ExportFormat("cmpal", "Color Milker Binary", ".cmpal", write_binary, binary=True),
+)}
+
+
+def export_palette(colors, path, fmt, name="Color Milker Palette", progress=None, is_cancelled=None):
+    """Writes colors to path in format fmt (a FORMATS key), atomically.
+
+    progress(done, total) is called after each chunk; if is_cancelled()
+    returns True the write stops, the temporary file is removed and
+    ExportCancelled is raised.
+    """
+    export_format = FORMATS[fmt]
+    colors = np.asarray(colors, dtype=np.uint32)
+    total = len(colors)
+
+    def report(done):
+        if is_cancelled is not None and is_cancelled():
+            raise ExportCancelled()
+        if progress is not None:
+            progress(done, total)
+
+    with atomic_output(path, export_format.extension, export_format.binary) as f:
+        export_format.writer(f, colors, name, report)
+
+
+def _create_temp(directory, suffix):
+    """Creates a uniquely named file in directory; returns (fd, path).
+
+    Unlike mkstemp (always 0600) it asks for 0666 and lets the kernel apply
+    the umask, so exports get the same mode as any other new file.
+    """
+    for _ in range(tempfile.TMP_MAX):
+        temp_path = os.path.join(directory, f".cmilker-{secrets.token_hex(6)}{suffix}")
+        try:
+            return os.open(temp_path, _TEMP_FLAGS, 0o666), temp_path
+        except FileExistsError:
+            continue
+    raise FileExistsError(f"No usable temporary file name in {directory}")
+
+
+@contextlib.contextmanager
+def atomic_output(path, suffix="", binary=False):
+    """Yields a file that replaces path once the block finishes, or is removed if it raises."""
+    fd, temp_path = _create_temp(os.path.dirname(os.path.abspath(path)), suffix)
+    try:
+        if binary:
+            f = os.fdopen(fd, "wb")
+        else:
+            f = os.fdopen(fd, "w", encoding="utf-8", newline="")
+        with f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,196 @@
+"""Fixed-point sampling across image sequences, behind `cmilker sample`.
+
+Given frames (image files, directories of them, or animated GIF/WebP
+files) and targets (single pixels, or rectangles reduced with a
+SampleMode), writes the color at every target in every frame as CSV:
+FRAME,FILE,TARGET,HEX,R,G,B, the export's HEX,R,G,B with the frame's
+place in the sequence, its file and the target in front.
+
+Each frame is decoded through a QImageReader clip rect around the
+targets, so JPEG decodes no further than the targets' last row and skips
+the columns outside them; PNG has no native clip and is cropped right
+after decoding. Frames go to worker processes in batches, with at most a
+few batches per worker in flight, so memory stays flat however long the
+sequence. Only QtGui is imported, so it runs without a display.
+"""
+import re
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+BATCH_SIZE = 16 # Frames per worker task
+BATCHES_IN_FLIGHT = 4 # Per worker; bounds the results waiting to be written in order
+
+Target = namedtuple("Target", "label x y width height")
+
+
+def parse_target(text, region):
+    """[NAME=]X,Y for a point or [NAME=]X,Y,W,H for a region; returns a Target."""
+    name, _, spec = text.rpartition("=")
+    try:
+        values = [int(value) for value in spec.split(",")]
+    except ValueError:
+        values = []
+    if len(values) != (4 if region else 2) or min(values) < 0 or (region and min(values[2:]) < 1):
+        raise ValueError(f"expected [NAME=]{'X,Y,W,H' if region else 'X,Y'} in pixels, got {text!r}")
+    x, y, width, height = values if region else values + [1, 1]
+    return Target(name or spec, x, y, width, height)
+
+
+def natural_key(name):
+    """Sorts frame_2.png before frame_10.png."""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", name)]
+
+
+def _bounds(targets):
+    left = min(target.x for target in targets)
+    top = min(target.y for target in targets)
+    right = max(target.x + target.width for target in targets)
+    bottom = max(target.y + target.height for target in targets)
+    return left, top, right - left, bottom - top
+
+
+def sample_file(path, targets, mode):
+    """Returns one list of packed 0xRRGGBB colors (one per target) per frame of the image file at path."""
+    import numpy as np
+    from PyQt6.QtCore import QRect
+    from PyQt6.QtGui import QImageReader
+    from sampling import SampleMode, image_to_rgb_view, reduce_region, sample_points
+
+    reader = QImageReader(path)
+    size = reader.size()
+    if not size.isValid():
+        raise ValueError(reader.errorString() or "not a readable image")
+    for target in targets:
+        if target.x + target.width > size.width() or target.y + target.height > size.height():
+            raise ValueError(f"{target.label} is outside the {size.width()}x{size.height()} frame")
+    left, top, width, height = _bounds(targets)
+    clip = QRect(left, top, width, height)
+    points = [index for index, target in enumerate(targets) if target.width == target.height == 1]
+    ys = np.array([targets[index].y - top for index in points], dtype=np.intp)
+    xs = np.array([targets[index].x - left for index in points], dtype=np.intp)
+    regions = [index for index, target in enumerate(targets) if index not in points]
+    mode = SampleMode(mode)
+
+    frames = []
+    for _ in range(max(reader.imageCount(), 1)):
+        reader.setClipRect(clip) # Applies to each read of an animation
+        image = reader.read()
+        if image.isNull():
+            if frames:
+                break # Fewer frames than announced
+            raise ValueError(reader.errorString() or "not a readable image")
+        pixels, image = image_to_rgb_view(image)
+        colors = [0] * len(targets)
+        for index, rgb in zip(points, sample_points(pixels, ys, xs).tolist()): # One gather for all points
+            colors[index] = rgb
+        for index in regions:
+            target = targets[index]
+            y, x = target.y - top, target.x - left
+            r, g, b = reduce_region(pixels[y:y + target.height, x:x + target.width], mode)
+            colors[index] = r << 16 | g << 8 | b
+        frames.append(colors)
+    return frames
+
+
+def _sample_job(job):
+    """Process-pool worker: (paths, targets, mode) -> [(path, frames or None, error or None)]."""
+    paths, targets, mode = job
+    results = []
+    for path in paths:
+        try:
+            results.append((path, sample_file(path, targets, mode), None))
+        except Exception as e: # Report and carry on with the other frames
+            results.append((path, None, str(e) or type(e).__name__))
+    return results
+
+
+def _ordered(executor, function, jobs, in_flight):
+    """executor.map that submits at most in_flight jobs ahead of the one being consumed."""
+    pending = deque()
+    for job in jobs:
+        if len(pending) >= in_flight:
+            yield pending.popleft().result()
+        pending.append(executor.submit(function, job))
+    while pending:
+        yield pending.popleft().result()
+
+
+def _batches(paths, size):
+    paths = iter(paths)
+    while batch := list(islice(paths, size)):
+        yield batch
+
+
+def iter_samples(paths, targets, mode="median", jobs=1):
+    """Yields (path, frames or None, error or None) per file, in order; frames as from sample_file."""
+    work = ((batch, targets, mode) for batch in _batches(paths, BATCH_SIZE))
+    if jobs <= 1:
+        for batch in map(_sample_job, work):
+            yield from batch
+        return
+    executor = ProcessPoolExecutor(max_workers=jobs)
+    try:
+        for batch in _ordered(executor, _sample_job, work, jobs * BATCHES_IN_FLIGHT):
+            yield from batch
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+# --- Command line ---
+def sample_command(argv):
+    """`cmilker sample`: the colors at fixed points and regions across a sequence of frames."""
+    import argparse
+    import csv
+    import os
+    import sys
+
+    from cli import iter_image_paths
+
+    modes = ("center", "mean", "median", "mode", "dominant")
+    parser = argparse.ArgumentParser(
+        prog="cmilker sample",
+        description="Sample fixed points and regions in every frame of an image sequence; writes "
+                    "FRAME,FILE,TARGET,HEX,R,G,B rows.")
+    parser.add_argument("paths", nargs="+", metavar="PATH",
+                        help="frame files (animated GIF/WebP give one row per frame) or directories of them, "
+                             "in natural order")
+    parser.add_argument("-p", "--point", action="append", default=[], metavar="[NAME=]X,Y",
+                        help="a pixel to sample (repeatable)")
+    parser.add_argument("-r", "--region", action="append", default=[], metavar="[NAME=]X,Y,W,H",
+                        help="a rectangle to reduce to one color (repeatable)")
+    parser.add_argument("--mode", choices=modes, default="median", help="statistic for regions (default median)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("-o", "--output", help="write to this file instead of stdout")
+    args = parser.parse_args(argv)
+    try:
+        targets = ([parse_target(text, region=False) for text in args.point]
+                   + [parse_target(text, region=True) for text in args.region])
+    except ValueError as e:
+        parser.error(str(e))
+    if not targets:
+        parser.error("give at least one --point or --region")
+
+    stream = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    frame, failures = 0, 0
+    try:
+        writer = csv.writer(stream)
+        writer.writerow(["FRAME", "FILE", "TARGET", "HEX", "R", "G", "B"])
+        for path, frames, error in iter_samples(iter_image_paths(args.paths, key=natural_key), targets,
+                                                args.mode, args.jobs):
+            if error is not None:
+                failures += 1
+                frame += 1 # Keeps later frame numbers at their place in the sequence
+                print(f"cmilker sample: {path}: {error}", file=sys.stderr)
+                continue
+            for colors in frames:
+                writer.writerows([frame, path, target.label, f"#{rgb:06X}", rgb >> 16 & 0xFF, rgb >> 8 & 0xFF, rgb & 0xFF]
+                                 for target, rgb in zip(targets, colors))
+                frame += 1
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+    print(f"Sampled {frame - failures:,} frames at {len(targets)} {'target' if len(targets) == 1 else 'targets'}"
+          + (f"; {failures} {'file' if failures == 1 else 'files'} skipped" if failures else ""), file=sys.stderr)
+    return 1 if failures else 0
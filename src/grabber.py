@@ -0,0 +1,329 @@
+"""The grab pipeline: capture through a backend, then reduce off the GUI thread.
+
+LiveSampler is the live eyedropper: it re-samples the pixel under the cursor
+at a fixed rate for as long as it runs.
+
+Imported by MainWindow on the first grab (or right after startup), so the
+capture backends and NumPy are not loaded before the window is painted.
+"""
+import functools
+import time
+
+from PyQt6.QtCore import QObject, QRunnable, Qt, QThreadPool, QTimer, pyqtSignal
+from PyQt6.QtGui import QColor, QCursor, QGuiApplication, QImage
+
+import tracing
+from capture import CaptureBackend, CaptureError, default_backend, fallback_backend
+from sampling import MultiSample, SampleMode, image_to_rgb_view, reduce_multi, reduce_region
+
+
+# --- Grab Pipeline ---
+class GrabSignals(QObject):
+    """Signals emitted by GrabTask; delivered to the GUI thread as queued calls."""
+    finished = pyqtSignal(int, object, object) # grab id, QColor / uint32 colors or None, timings
+    failed = pyqtSignal(int, str) # grab id, error message
+
+
+class GrabTask(QRunnable):
+    """Runs capture (if thread-safe), decode and pixel reduction on a worker thread."""
+    def __init__(self, grab_id, work, sample_mode, signals, multi=None):
+        super().__init__()
+        self.grab_id = grab_id
+        self.work = work # Callable returning a CaptureResult or None
+        self.sample_mode = sample_mode
+        self.signals = signals
+        self.multi = multi # MultiSample, or None for a single color
+
+    def run(self):
+        try:
+            result = self.work()
+            if result is None:
+                self.signals.finished.emit(self.grab_id, None, {})
+                return
+            if self.multi is not None:
+                color = ScreenColorGrabber._get_colors_from_screenshot(result, self.multi)
+            else:
+                color = ScreenColorGrabber._get_color_from_screenshot(result.image, self.sample_mode, result.timings)
+        except Exception as e: # Anything escaping here would leave the grab waiting forever
+            self.signals.failed.emit(self.grab_id, str(e) or type(e).__name__)
+            return
+        tracing.info(f"Grab latency: {result.format_timings()}")
+        with tracing.span("grab.emit"):
+            self.signals.finished.emit(self.grab_id, color, result.timings)
+
+
+# --- Color Grabber Logic ---
+class ScreenColorGrabber(QObject):
+    """Handles the screen grabbing process through a pluggable capture backend.
+
+    Capture, decode and reduction run off the GUI thread; results arrive back
+    through queued signals so the event loop keeps running during a grab.
+    """
+    color_grabbed = pyqtSignal(QColor) # Signal emitted when color is selected
+    colors_grabbed = pyqtSignal(object) # uint32 array of packed 0xRRGGBB colors from a multi-sample grab
+    grab_failed = pyqtSignal(str) # Why a grab gave up; emitted just before grabbing_finished
+    grabbing_finished = pyqtSignal() # Signal emitted when grabbing stops
+
+    def __init__(self, parent=None, backend: CaptureBackend | None = None):
+        super().__init__(parent)
+        self._is_grabbing = False
+        self._grab_id = 0 # Results from earlier (cancelled) grabs are ignored
+        self._grab_started = 0 # perf_counter_ns() at start_grabbing, for the "grab" trace span
+        self._tried_fallback = False
+        self.backend = backend or default_backend()
+        self._active_backend = self.backend # Differs from backend while retrying with the fallback
+        self.sample_mode = SampleMode.MEDIAN # Statistic used to reduce the selection
+        self.multi = None # MultiSample of the grab in progress, if any
+        self.last_timings = {} # Per-stage latency of the most recent grab
+        self.thread_pool = QThreadPool.globalInstance()
+
+        self._signals = GrabSignals(self)
+        self._signals.finished.connect(self._on_grab_finished, Qt.ConnectionType.QueuedConnection)
+        self._signals.failed.connect(self._on_grab_failed, Qt.ConnectionType.QueuedConnection)
+
+    @property
+    def is_grabbing(self):
+        return self._is_grabbing
+
+    def start_grabbing(self, multi: MultiSample | None = None):
+        """Starts an asynchronous grab with the current backend; returns immediately.
+
+        With multi, the one capture is reduced to many colors, which arrive
+        through colors_grabbed instead of color_grabbed.
+        """
+        if self._is_grabbing:
+            return
+        self._is_grabbing = True
+        self.multi = multi
+        self._tried_fallback = False
+        self._grab_id += 1
+        self._grab_started = time.perf_counter_ns()
+        self._start_capture(self.backend, self._grab_id)
+
+    def _start_capture(self, backend, grab_id):
+        self._active_backend = backend
+        backend.pick_points = self.multi is not None and self.multi.kind == "points"
+        if backend.pick_points and not backend.can_pick_points:
+            # It would fall back to a plain selection and sample nothing
+            self._fail_grabbing(f"The {backend.name} capture backend cannot pick points; "
+                                "use Grid or Dominant Colors instead")
+            return
+        # Single-color grabs need only the pixels the statistic reads decoded
+        backend.sample_mode = self.sample_mode if self.multi is None else None
+        if backend.thread_safe:
+            self._submit(grab_id, backend.capture)
+        else:
+            # Capture on the GUI thread (cheap), then reduce in the pool
+            backend.begin_capture(functools.partial(self._on_captured, grab_id))
+
+    def _submit(self, grab_id, work):
+        self.thread_pool.start(GrabTask(grab_id, work, self.sample_mode, self._signals, self.multi))
+
+    def _on_captured(self, grab_id, result, error):
+        if grab_id != self._grab_id:
+            return
+        if error is not None:
+            self._on_grab_failed(grab_id, str(error))
+        elif result is None:
+            self._cancel_grabbing("Screenshot cancelled")
+        else:
+            self._submit(grab_id, lambda: result)
+
+    def _on_grab_finished(self, grab_id, color, timings):
+        if grab_id != self._grab_id or not self._is_grabbing:
+            return # Stale result of a cancelled grab
+        if color is None:
+            self._cancel_grabbing("Screenshot cancelled")
+            return
+        self.last_timings = timings
+        if self.multi is not None:
+            if not len(color):
+                self._cancel_grabbing("No colors sampled")
+                return
+            tracing.info(f"Grabbed {len(color)} colors ({self.multi.kind})")
+            with tracing.span("grab.ui_update", colors=len(color)): # The connected slots run here
+                self.colors_grabbed.emit(color)
+        else:
+            tracing.info(f"Grabbed color ({self.sample_mode.value}): {color.name().upper()}")
+            with tracing.span("grab.ui_update"):
+                self.color_grabbed.emit(color)
+        self.stop_grabbing()
+
+    def _on_grab_failed(self, grab_id, message):
+        if grab_id != self._grab_id or not self._is_grabbing:
+            return
+        # Retry once with the fallback backend if the primary one failed
+        fallback = fallback_backend()
+        if not self._tried_fallback and fallback is not None and type(fallback) is not type(self.backend):
+            self._tried_fallback = True
+            tracing.warning(f"{self.backend.name} capture failed ({message}), falling back to {fallback.name}")
+            self._start_capture(fallback, grab_id)
+            return
+        self._fail_grabbing(message)
+
+    @staticmethod
+    def _get_color_from_screenshot(image: QImage, sample_mode: SampleMode, timings=None):
+        """Reduce the captured image to one color; safe to call from a worker thread."""
+        if image.isNull() or image.width() <= 0 or image.height() <= 0:
+            tracing.warning("Invalid image dimensions")
+            return None
+
+        start = time.perf_counter()
+        with tracing.span("grab.reduce", mode=sample_mode.value, pixels=image.width() * image.height()):
+            # View the decoded pixels in place; `image` must outlive `pixels`
+            pixels, image = image_to_rgb_view(image)
+            rgb = reduce_region(pixels, sample_mode)
+        if timings is not None:
+            timings["reduce"] = time.perf_counter() - start
+        if rgb is None:
+            tracing.warning("Invalid color grabbed")
+            return None
+        return QColor(*rgb)
+
+    @staticmethod
+    def _get_colors_from_screenshot(result, multi: MultiSample):
+        """Reduce the captured image to many packed colors in one pass; safe to call from a worker thread."""
+        start = time.perf_counter()
+        with tracing.span("grab.reduce", mode=multi.kind):
+            pixels, image = image_to_rgb_view(result.image)
+            colors = reduce_multi(pixels, multi, result.points)
+        result.timings["reduce"] = time.perf_counter() - start
+        return colors
+
+    def cancel_grabbing(self):
+        """Aborts the current grab; any late result from the worker is discarded."""
+        if self._is_grabbing:
+            self._cancel_grabbing("Grab cancelled")
+
+    def stop_grabbing(self):
+        """Stops the color grabbing mode."""
+        if not self._is_grabbing:
+            return
+            
+        self._is_grabbing = False
+        # The whole grab, from the request to the UI having been updated
+        tracing.add_span("grab", self._grab_started, time.perf_counter_ns(), backend=self._active_backend.name)
+        self.grabbing_finished.emit()
+        tracing.info("Grabbing mode finished.")
+
+    def _fail_grabbing(self, message):
+        self.grab_failed.emit(message)
+        self._cancel_grabbing(message)
+
+    def _cancel_grabbing(self, message):
+        tracing.info(message)
+        self._grab_id += 1 # Invalidate the in-flight task
+        self._active_backend.cancel()
+        self.stop_grabbing()
+
+
+# --- Live Eyedropper ---
+LIVE_RATE = 60 # Default samples per second
+LIVE_RATES = (15, 30, 60, 120)
+LIVE_SIZE = 15 # Device pixels captured around the cursor; odd, so the cursor pixel is the centre
+IDLE_FRAMES = 30 # Identical frames before a still cursor is only sampled every IDLE_STRIDE ticks
+IDLE_STRIDE = 4
+
+
+class LiveSampler(QObject):
+    """Continuously samples the pixel under the cursor for the live eyedropper.
+
+    QScreen can only be used from the GUI thread, so frames run there from a
+    single-shot timer re-armed against fixed frame deadlines: a frame that
+    runs late makes the sampler skip the deadlines it missed (counted in
+    dropped) instead of queueing them.
+
+    Frames are drawn into two preallocated QImages: each one goes into the
+    back buffer, which is swapped with image (the latest frame) only if its
+    pixels differ. frame_changed and color_sampled are only emitted on a
+    change. Readers such as LoupeWidget use image directly; holding a copy
+    would make the next draw into that buffer detach (allocate) it.
+    """
+    color_sampled = pyqtSignal(QColor)
+    frame_changed = pyqtSignal() # image holds a new neighbourhood
+    failed = pyqtSignal(str) # Sampling stopped because the backend can't sample live
+
+    def __init__(self, parent=None, backend: CaptureBackend | None = None, rate=LIVE_RATE, size=LIVE_SIZE):
+        super().__init__(parent)
+        self.backend = backend or default_backend()
+        self.image = QImage(size, size, QImage.Format.Format_RGB32) # Latest frame
+        self.image.fill(Qt.GlobalColor.black)
+        self._back = QImage(size, size, QImage.Format.Format_RGB32) # Next frame is drawn here
+        self.skip_own_windows = True # Hold the last color while the cursor is over our windows
+        self.frames = 0 # Frames sampled since start()
+        self.dropped = 0 # Frame deadlines skipped because a frame ran late
+        self._interval = 1 / LIVE_RATE
+        self.rate = rate
+        self._deadline = 0.0
+        self._last_rgb = None
+        self._last_pos = None
+        self._unchanged = 0
+        self._ticks = 0
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self._tick)
+
+    @property
+    def rate(self):
+        return 1 / self._interval
+
+    @rate.setter
+    def rate(self, hertz):
+        self._interval = 1 / max(1, min(240, hertz))
+
+    @property
+    def is_running(self):
+        return self._timer.isActive()
+
+    def start(self):
+        if self.is_running:
+            return
+        self.frames = self.dropped = self._ticks = self._unchanged = 0
+        self._last_rgb = self._last_pos = None
+        self._deadline = time.perf_counter()
+        self._timer.start(0)
+
+    def stop(self):
+        self._timer.stop()
+
+    def _tick(self):
+        now = time.perf_counter()
+        late = now - self._deadline
+        if late >= self._interval: # Coalesce: drop the frames we missed rather than catch up
+            missed = int(late / self._interval)
+            self.dropped += missed
+            self._deadline += missed * self._interval
+            tracing.instant("live.dropped", frames=missed)
+        self._deadline += self._interval
+        try:
+            with tracing.span("live.sample"):
+                self._sample()
+        except CaptureError as e:
+            self.failed.emit(str(e))
+            return
+        delay = self._deadline - time.perf_counter()
+        self._timer.start(max(0, round(delay * 1000)))
+
+    def _sample(self):
+        self._ticks += 1
+        pos = QCursor.pos()
+        still = pos == self._last_pos
+        if still and self._unchanged >= IDLE_FRAMES and self._ticks % IDLE_STRIDE:
+            return # Nothing has changed for a while; sample a still cursor less often
+        self._last_pos = pos
+        if self.skip_own_windows and QGuiApplication.topLevelAt(pos) is not None:
+            return
+        if not self.backend.grab_into(self._back, pos):
+            return
+        self.frames += 1
+        if self._back == self.image and self._last_rgb is not None: # (the first frame always counts)
+            self._unchanged += 1
+            return
+        self._unchanged = 0
+        self.image, self._back = self._back, self.image
+        self.frame_changed.emit()
+        rgb = self.image.pixel(self.image.width() // 2, self.image.height() // 2) & 0xFFFFFF
+        if rgb != self._last_rgb:
+            self._last_rgb = rgb
+            self.color_sampled.emit(QColor(rgb))
@@ -0,0 +1,383 @@
+"""Crash-safe autosave for the palette.
+
+The saved palette is a snapshot in the exporters' binary .cmpal format plus
+an append-only journal of the edits made since (insert, remove, move and
+clear records, each checksummed). Edits are queued by the GUI thread and
+written in batches by a background thread, with one fsync per batch. Once
+the journal grows past a threshold the caller hands over the current colors
+and the writer compacts them into a new snapshot and starts an empty
+journal. At startup the snapshot is memory-mapped and the journal tail is
+replayed on top of it; a torn final record from a crash is dropped.
+
+Snapshots are named after a generation number stored in the journal header,
+so a crash halfway through a compaction leaves the previous, still matching
+snapshot/journal pair in place. If the journal or its snapshot cannot be
+read, the journal and every snapshot are moved into an unrestored-<time>
+directory untouched and an empty palette is started, so nothing that
+might still be recovered is truncated, compacted over or deleted as stale.
+This module has no Qt dependency.
+"""
+import mmap
+import os
+import queue
+import re
+import struct
+import tempfile
+import threading
+import time
+import zlib
+
+import numpy as np
+
+import tracing
+from exporters import BINARY_HEADER, BINARY_MAGIC, BINARY_VERSION, export_palette
+
+JOURNAL_NAME = "palette.journal"
+JOURNAL_MAGIC = b"CMJRN\0"
+JOURNAL_VERSION = 1
+JOURNAL_HEADER = struct.Struct("<6sHQ") # magic, version, snapshot generation
+RECORD_HEADER = struct.Struct("<BII") # op, payload length, crc32 of payload
+
+# Record types
+OP_INSERT = 1 # <I row, then little-endian uint32 colors
+OP_REMOVE = 2 # <II first row, count
+OP_CLEAR = 3 # no payload
+OP_MOVE = 4 # <III first row, count, destination row (as in QAbstractItemModel.moveRows)
+
+_ROW = struct.Struct("<I")
+_RANGE = struct.Struct("<II")
+_MOVE = struct.Struct("<III")
+
+COMPACT_BYTES = 4 << 20 # Journal size that triggers a snapshot
+FLUSH_INTERVAL = 0.2 # Seconds the writer waits to batch records before an fsync
+
+_SNAPSHOT_NAME = re.compile(r"palette\.(\d+)\.cmpal$")
+_STOP = object()
+
+
+def _snapshot_name(generation):
+    return f"palette.{generation}.cmpal"
+
+
+def read_snapshot(path):
+    """Memory-maps a .cmpal snapshot and returns its colors as a uint32 array.
+
+    The array is a read-only view of the mapping, which stays open for as
+    long as the array is referenced.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < BINARY_HEADER.size:
+            raise ValueError(f"{path}: truncated palette header")
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, count = BINARY_HEADER.unpack_from(mapping)
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError(f"{path}: not a Color Milker palette")
+    if size < BINARY_HEADER.size + 4 * count:
+        raise ValueError(f"{path}: truncated palette data")
+    colors = np.frombuffer(mapping, dtype="<u4", count=count, offset=BINARY_HEADER.size)
+    return colors.astype(np.uint32, copy=False) # Copies only on big-endian hosts
+
+
+def _fsync_directory(directory):
+    """Makes renames in directory durable; skipped where directories can't be synced (Windows)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _parse_records(data, offset):
+    """Yields (op, payload, end offset) for each intact record after offset."""
+    while offset + RECORD_HEADER.size <= len(data):
+        op, length, crc = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return # Torn or corrupt tail
+        offset = start + length
+        yield op, payload, offset
+
+
+def replay(base, records):
+    """Applies journal records to base; returns (colors, end offset of the last applied record).
+
+    Appends are gathered and joined once; other edits flatten the pending
+    pieces first. Replay stops at the first record that does not fit the
+    palette, as only a damaged journal can produce one.
+    """
+    pieces = [base]
+    size = len(base)
+    end = None
+
+    def flat():
+        if len(pieces) > 1:
+            pieces[:] = [np.concatenate(pieces)]
+        return pieces[0]
+
+    for op, payload, offset in records:
+        if op == OP_INSERT and len(payload) >= _ROW.size and (len(payload) - _ROW.size) % 4 == 0:
+            row, = _ROW.unpack_from(payload)
+            if row > size:
+                break
+            colors = np.frombuffer(payload, dtype="<u4", offset=_ROW.size).astype(np.uint32)
+            if row == size:
+                pieces.append(colors)
+            else:
+                pieces[:] = [np.insert(flat(), row, colors)]
+            size += len(colors)
+        elif op == OP_REMOVE and len(payload) == _RANGE.size:
+            first, count = _RANGE.unpack(payload)
+            if first + count > size:
+                break
+            pieces[:] = [np.delete(flat(), np.s_[first:first + count])]
+            size -= count
+        elif op == OP_CLEAR:
+            pieces[:] = [np.empty(0, dtype=np.uint32)]
+            size = 0
+        elif op == OP_MOVE and len(payload) == _MOVE.size:
+            first, count, destination = _MOVE.unpack(payload)
+            if first + count > size or destination > size:
+                break
+            colors = flat()
+            block = colors[first:first + count]
+            rest = np.delete(colors, np.s_[first:first + count])
+            if destination > first:
+                destination -= count
+            pieces[:] = [np.insert(rest, destination, block)]
+        else:
+            break
+        end = offset
+    return flat().astype(np.uint32, copy=False), end
+
+
+class PaletteJournal:
+    """Snapshot plus append-only edit journal for one palette, kept in directory.
+
+    Call load() once at startup; afterwards every edit is recorded with
+    insert/remove/move/clear, and compact() whenever needs_compaction is
+    set. close() flushes outstanding records and stops the writer thread.
+    """
+    def __init__(self, directory, compact_bytes=COMPACT_BYTES, flush_interval=FLUSH_INTERVAL):
+        self.directory = os.fspath(directory)
+        self.compact_bytes = compact_bytes
+        self.flush_interval = flush_interval
+        self.last_error = None # Last write failure, as text
+        self.set_aside_path = None # Where load() moved a palette it could not restore
+        self._generation = 0
+        self._journal_bytes = 0 # Record bytes queued since the last snapshot
+        self._queue = queue.Queue()
+        self._thread = None
+        self._file = None
+
+    @property
+    def journal_path(self):
+        return os.path.join(self.directory, JOURNAL_NAME)
+
+    def _snapshot_path(self, generation):
+        return os.path.join(self.directory, _snapshot_name(generation))
+
+    # --- Loading ---
+    def load(self):
+        """Returns the saved colors (uint32 array) and starts the writer thread."""
+        if self._thread is not None:
+            raise RuntimeError("journal is already loaded")
+        os.makedirs(self.directory, exist_ok=True)
+
+        generation, data = 0, b""
+        try:
+            with open(self.journal_path, "rb") as f:
+                data = f.read()
+            magic, version, generation = JOURNAL_HEADER.unpack_from(data)
+            if magic != JOURNAL_MAGIC or version != JOURNAL_VERSION:
+                raise ValueError("not a Color Milker journal")
+        except FileNotFoundError:
+            data = b""
+            if any(_SNAPSHOT_NAME.match(name) for name in os.listdir(self.directory)):
+                # Lost in a crash; without it there is no telling which snapshot is current
+                self._give_up("journal missing")
+        except (struct.error, ValueError) as e:
+            # A torn header after a crash; the snapshot it named may well be intact
+            self._give_up(f"journal unreadable ({e})")
+            generation, data = 0, b""
+
+        base = np.empty(0, dtype=np.uint32)
+        if generation:
+            try:
+                base = read_snapshot(self._snapshot_path(generation))
+            except (OSError, ValueError) as e:
+                # Without its base the journal tail means nothing; keep both for recovery
+                self._give_up(f"snapshot {generation} unreadable ({e})")
+                generation, data = 0, b""
+
+        colors, end = replay(base, _parse_records(data, JOURNAL_HEADER.size) if data else ())
+        self._generation = generation
+        if not data:
+            self._start_journal(generation)
+        else:
+            end = JOURNAL_HEADER.size if end is None else end
+            if end < len(data):
+                tracing.warning(f"Autosave: dropped {len(data) - end} bytes of incomplete journal")
+                with open(self.journal_path, "r+b") as f:
+                    f.truncate(end)
+            self._file = open(self.journal_path, "ab")
+            self._journal_bytes = end - JOURNAL_HEADER.size
+        if self.set_aside_path is None:
+            self._remove_stale_files()
+
+        self._thread = threading.Thread(target=self._run, name="PaletteJournal", daemon=True)
+        self._thread.start()
+        return colors
+
+    def _give_up(self, reason):
+        """Sets the saved palette aside for recovery instead of loading it."""
+        self.set_aside_path = self._set_aside()
+        tracing.warning(f"Autosave: {reason}; moved the saved palette to {self.set_aside_path} "
+                        "and started an empty one")
+
+    def _set_aside(self):
+        """Moves the journal and all snapshots into a new unrestored-<time> directory; returns its path."""
+        path = tempfile.mkdtemp(prefix=time.strftime("unrestored-%Y%m%d-%H%M%S-"), dir=self.directory)
+        for name in os.listdir(self.directory):
+            if name == JOURNAL_NAME or _SNAPSHOT_NAME.match(name):
+                os.replace(os.path.join(self.directory, name), os.path.join(path, name))
+        _fsync_directory(self.directory)
+        return path
+
+    def _start_journal(self, generation):
+        """Atomically replaces the journal with an empty one for generation."""
+        fd, temp_path = tempfile.mkstemp(prefix=".journal-", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(JOURNAL_HEADER.pack(JOURNAL_MAGIC, JOURNAL_VERSION, generation))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.journal_path)
+            _fsync_directory(self.directory) # Also makes a new snapshot's rename durable
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.journal_path, "ab")
+
+    def _remove_stale_files(self):
+        """Deletes snapshots of other generations and leftover temporary files."""
+        for name in os.listdir(self.directory):
+            match = _SNAPSHOT_NAME.match(name)
+            stale = match is not None and int(match.group(1)) != self._generation
+            if stale or name.startswith((".journal-", ".cmilker-")):
+                try:
+                    os.unlink(os.path.join(self.directory, name))
+                except OSError:
+                    pass # e.g. still mapped on Windows; retried next start
+
+    # --- Recording (GUI thread) ---
+    def _record(self, op, payload=b""):
+        if self._thread is None:
+            raise RuntimeError("journal must be loaded before recording")
+        data = RECORD_HEADER.pack(op, len(payload), zlib.crc32(payload)) + payload
+        self._journal_bytes += len(data)
+        self._queue.put(data)
+
+    def insert(self, row, colors):
+        """Records colors (packed uint32) inserted at row."""
+        self._record(OP_INSERT, _ROW.pack(row) + np.asarray(colors, dtype="<u4").tobytes())
+
+    def remove(self, first, count=1):
+        self._record(OP_REMOVE, _RANGE.pack(first, count))
+
+    def move(self, first, count, destination):
+        self._record(OP_MOVE, _MOVE.pack(first, count, destination))
+
+    def clear(self):
+        self._record(OP_CLEAR)
+
+    @property
+    def needs_compaction(self):
+        return self._journal_bytes >= self.compact_bytes
+
+    def compact(self, colors):
+        """Queues a snapshot of colors (the whole palette) to replace the journal."""
+        if self._thread is None:
+            raise RuntimeError("journal must be loaded before recording")
+        self._journal_bytes = 0
+        self._queue.put(np.array(colors, dtype=np.uint32))
+
+    def flush(self, timeout=None):
+        """Blocks until everything queued so far is on disk; returns False on timeout."""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, colors=None):
+        """Writes a final snapshot of colors if given, then stops the writer."""
+        if self._thread is None:
+            return
+        if colors is not None:
+            self.compact(colors)
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+    # --- Writer thread ---
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Gather whatever arrives within the flush interval into one fsync,
+            # unless someone is waiting on it
+            deadline = time.monotonic() + self.flush_interval
+            while batch[-1] is not _STOP and not isinstance(batch[-1], threading.Event):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write_batch(batch)
+            if batch[-1] is _STOP:
+                self._file.close()
+                return
+
+    def _write_batch(self, batch):
+        pending = []
+        try:
+            for item in batch:
+                if isinstance(item, bytes):
+                    pending.append(item)
+                elif isinstance(item, np.ndarray):
+                    pending.clear() # Superseded by the snapshot
+                    self._write_snapshot(item)
+            if pending:
+                self._file.write(b"".join(pending))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+        except OSError as e:
+            self.last_error = str(e)
+            tracing.warning(f"Autosave failed: {e}")
+        for item in batch:
+            if isinstance(item, threading.Event):
+                item.set()
+
+    def _write_snapshot(self, colors):
+        generation = self._generation + 1
+        export_palette(colors, self._snapshot_path(generation), "cmpal")
+        # The new journal header is what makes the new snapshot current
+        self._start_journal(generation)
+        previous, self._generation = self._generation, generation
+        try:
+            os.unlink(self._snapshot_path(previous))
+        except OSError:
+            pass
@@ -0,0 +1,314 @@
+"""Local palette library: saved palettes in SQLite, searchable by color.
+
+Each palette row keeps its name, source (a file path, or "Color Milker" for
+palettes saved from the app), creation time and its colors in order as one
+little-endian uint32 blob, so loading a palette back is a single read.
+tags holds any number of labels per palette. entries has one row per
+distinct color of each palette with its CIELAB coordinates (in hundredths)
+and quantized Lab bucket: CIELAB cut into cubes BUCKET_SIZE ΔE on a side,
+packed into one integer. The index on (bucket, l, a, b) of the WITHOUT
+ROWID entries table also carries (palette_id, rgb), so it covers proximity
+queries. search() reads only the index entries of the cubes a search
+sphere touches, and SQLite filters them by distance and keeps each
+palette's closest color, so Python only sees one row per matching palette.
+add_palettes() stores any number of palettes in one transaction.
+
+This module has no Qt dependency apart from default_path().
+"""
+import os
+import sqlite3
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from colorspace import as_packed, rgb_to_lab
+
+LIBRARY_NAME = "library.sqlite3"
+SCHEMA_VERSION = 1
+BUCKET_SIZE = 4.0 # Side of a Lab bucket in ΔE76
+DEFAULT_RADIUS = 5.0 # ΔE76 within which a color counts as "near"
+APP_SOURCE = "Color Milker" # Source of palettes saved from the palette window
+
+_BUCKET_OFFSET = 128 # Keeps bucket coordinates positive; a and b stay well within ±128 cells
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS palettes (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    source TEXT,
+    created REAL NOT NULL,
+    color_count INTEGER NOT NULL,
+    colors BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tags (
+    palette_id INTEGER NOT NULL REFERENCES palettes(id) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (palette_id, tag)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tags_by_tag ON tags(tag);
+CREATE TABLE IF NOT EXISTS entries (
+    palette_id INTEGER NOT NULL REFERENCES palettes(id) ON DELETE CASCADE,
+    rgb INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    l INTEGER NOT NULL, -- CIELAB in hundredths
+    a INTEGER NOT NULL,
+    b INTEGER NOT NULL,
+    PRIMARY KEY (palette_id, rgb)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_by_bucket ON entries(bucket, l, a, b);
+"""
+
+PaletteInfo = namedtuple("PaletteInfo", "id name source created colors tags")
+# created: seconds since the epoch; colors: color count; tags: tuple of str
+
+SearchResult = namedtuple("SearchResult", "palette distance rgb matches")
+# palette: PaletteInfo; distance: ΔE76 of its closest color, rgb (packed 0xRRGGBB);
+# matches: how many of its distinct colors lie within the radius
+
+
+def default_path():
+    """The library file in the app's data directory (CMILKER_DATA_DIR, if set)."""
+    override = os.environ.get("CMILKER_DATA_DIR")
+    if override:
+        return os.path.join(override, LIBRARY_NAME)
+    from PyQt6.QtCore import QCoreApplication, QStandardPaths
+    QCoreApplication.setApplicationName("Color Milker") # As main.run does, so the CLI finds the same file
+    location = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppDataLocation)
+    return os.path.join(location or os.path.expanduser("~/.color_milker"), LIBRARY_NAME)
+
+
+def _cells(lab):
+    return np.floor(np.asarray(lab) / BUCKET_SIZE).astype(np.int64) + _BUCKET_OFFSET
+
+
+def _pack_cells(cells):
+    return (cells[..., 0] << 16) | (cells[..., 1] << 8) | cells[..., 2]
+
+
+def lab_buckets(lab):
+    """The bucket key of each CIELAB color."""
+    return _pack_cells(_cells(lab))
+
+
+def sphere_buckets(lab, radius):
+    """Keys of the buckets that intersect the ΔE76 sphere of radius around lab."""
+    lab = np.asarray(lab, dtype=float)
+    low, high = np.clip(_cells(lab - radius), 0, 255), np.clip(_cells(lab + radius), 0, 255)
+    axes = [np.arange(low[axis], high[axis] + 1) for axis in range(3)]
+    cells = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, 3)
+    # Skip corner cubes whose nearest point is outside the sphere
+    lower = (cells - _BUCKET_OFFSET) * BUCKET_SIZE
+    nearest = np.clip(lab, lower, lower + BUCKET_SIZE)
+    inside = ((nearest - lab) ** 2).sum(axis=1) <= radius * radius
+    return _pack_cells(cells[inside])
+
+
+def read_palette_file(path, tags=(), name=None):
+    """Reads a CSV or JSON palette export as an add_palettes() tuple, named after the file."""
+    from palette_io import iter_palette_colors
+
+    colors = np.fromiter(iter_palette_colors(path), dtype=np.uint32)
+    return name or os.path.splitext(os.path.basename(path))[0], colors, tags, os.path.abspath(path)
+
+
+class PaletteLibrary:
+    """A connection to the palette library at path (created on first use).
+
+    Connections are per thread: background tasks open their own.
+    """
+    def __init__(self, path=None):
+        self.path = path or default_path()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.execute("PRAGMA journal_mode = WAL") # Searches don't wait for a save in progress
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version > SCHEMA_VERSION:
+            self.connection.close()
+            raise sqlite3.DatabaseError(f"{self.path} was written by a newer Color Milker (schema {version})")
+        with self.connection:
+            self.connection.executescript(_SCHEMA)
+            self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # --- Palettes ---
+    def add_palette(self, name, colors, tags=(), source=APP_SOURCE):
+        """Stores colors (packed 0xRRGGBB, any alpha is dropped) as a new palette; returns its id."""
+        return self.add_palettes([(name, colors, tags, source)])[0]
+
+    def add_palettes(self, palettes):
+        """Stores (name, colors, tags, source) tuples in one transaction; returns their ids.
+
+        A commit rewrites every index page its rows touch, and a palette's
+        colors are spread all over the bucket index, so batching many
+        palettes per transaction is much faster than adding them one by one.
+        """
+        ids = []
+        with self.connection: # One transaction: the palettes are stored whole or not at all
+            for name, colors, tags, source in palettes:
+                packed = as_packed(colors) & np.uint32(0xFFFFFF)
+                unique = np.unique(packed)
+                lab = rgb_to_lab(unique) if len(unique) else np.empty((0, 3))
+                scaled = np.rint(lab * 100).astype(np.int64)
+                cursor = self.connection.execute(
+                    "INSERT INTO palettes (name, source, created, color_count, colors) VALUES (?, ?, ?, ?, ?)",
+                    (name, source, time.time(), len(packed), packed.astype("<u4").tobytes()))
+                palette_id = cursor.lastrowid
+                self.connection.executemany("INSERT INTO tags (palette_id, tag) VALUES (?, ?)",
+                                            [(palette_id, tag) for tag in sorted(set(tags))])
+                self.connection.executemany(
+                    "INSERT INTO entries (palette_id, rgb, bucket, l, a, b) VALUES (?, ?, ?, ?, ?, ?)",
+                    zip([palette_id] * len(unique), unique.tolist(), lab_buckets(lab).tolist(), *scaled.T.tolist()))
+                ids.append(palette_id)
+        return ids
+
+    def add_file(self, path, tags=(), name=None):
+        """Stores a CSV or JSON palette export, named after the file; returns its id."""
+        return self.add_palettes([read_palette_file(path, tags, name)])[0]
+
+    def remove(self, palette_id):
+        with self.connection:
+            self.connection.execute("DELETE FROM palettes WHERE id = ?", (palette_id,))
+
+    def load(self, palette_id):
+        """The colors of a palette, in their saved order, as a uint32 array."""
+        row = self.connection.execute("SELECT colors FROM palettes WHERE id = ?", (palette_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"No palette with id {palette_id}")
+        return np.frombuffer(row[0], dtype="<u4").astype(np.uint32)
+
+    def _infos(self, ids=None, tag=None):
+        query = "SELECT id, name, source, created, color_count FROM palettes"
+        params = []
+        if ids is not None:
+            query += f" WHERE id IN ({','.join('?' * len(ids))})"
+            params.extend(ids)
+        elif tag is not None:
+            query += " WHERE id IN (SELECT palette_id FROM tags WHERE tag = ?)"
+            params.append(tag)
+        rows = self.connection.execute(query + " ORDER BY created DESC, id DESC", params).fetchall()
+        tags = {}
+        tag_query = "SELECT palette_id, tag FROM tags"
+        if ids is not None:
+            tag_query += f" WHERE palette_id IN ({','.join('?' * len(ids))})"
+        for palette_id, label in self.connection.execute(tag_query + " ORDER BY tag",
+                                                          list(ids) if ids is not None else []):
+            tags.setdefault(palette_id, []).append(label)
+        return [PaletteInfo(*row, tuple(tags.get(row[0], ()))) for row in rows]
+
+    def palettes(self, tag=None):
+        """Every stored palette (newest first), or only those tagged tag, as PaletteInfo."""
+        return self._infos(tag=tag)
+
+    def tags(self):
+        """Every tag in use, sorted."""
+        return [row[0] for row in self.connection.execute("SELECT DISTINCT tag FROM tags ORDER BY tag")]
+
+    def count_colors(self):
+        """Total colors over all palettes."""
+        return self.connection.execute("SELECT COALESCE(SUM(color_count), 0) FROM palettes").fetchone()[0]
+
+    # --- Search ---
+    def search(self, rgb, radius=DEFAULT_RADIUS, limit=50, tag=None):
+        """Palettes holding a color within radius ΔE76 of packed rgb, closest first, as SearchResult."""
+        lab = rgb_to_lab(np.array([rgb & 0xFFFFFF], dtype=np.uint32))[0]
+        buckets = sphere_buckets(lab, radius).tolist()
+        l, a, b = np.rint(lab * 100).astype(np.int64).tolist()
+        # Squared distances in hundredths; SQLite returns the bare rgb of each group's MIN row
+        distance = f"(l - {l}) * (l - {l}) + (a - {a}) * (a - {a}) + (b - {b}) * (b - {b})"
+        query = (f"SELECT palette_id, rgb, MIN({distance}) AS d, COUNT(*) FROM entries "
+                 f"WHERE bucket IN ({','.join('?' * len(buckets))}) AND {distance} <= ?")
+        params = buckets + [int((radius * 100) ** 2)]
+        query += " GROUP BY palette_id"
+        if tag is not None: # Checked per palette rather than per scanned row
+            query += " HAVING palette_id IN (SELECT palette_id FROM tags WHERE tag = ?)"
+            params.append(tag)
+        query += " ORDER BY d, palette_id LIMIT ?"
+        rows = self.connection.execute(query, params + [limit]).fetchall()
+        infos = {info.id: info for info in self._infos(ids=[row[0] for row in rows])}
+        return [SearchResult(infos[palette_id], d ** 0.5 / 100, rgb, matches) for palette_id, rgb, d, matches in rows]
+
+
+# --- Command line ---
+def library_command(argv):
+    """`cmilker library`: add exported palette files, list them, and search them by color."""
+    import argparse
+    import sys
+
+    from palette_io import PaletteFormatError, parse_hex
+
+    parser = argparse.ArgumentParser(prog="cmilker library", description="Manage and search the local palette library.")
+    parser.add_argument("--library", metavar="FILE", help="library database (default: the app's library)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="store CSV or JSON palette files")
+    add.add_argument("files", nargs="+", metavar="FILE")
+    add.add_argument("-t", "--tag", action="append", default=[], help="tag every added palette (repeatable)")
+    listing = commands.add_parser("list", help="list the stored palettes")
+    listing.add_argument("-t", "--tag", help="only palettes with this tag")
+    search = commands.add_parser("search", help="find palettes with a color near COLOR")
+    search.add_argument("color", metavar="COLOR", help="#RRGGBB")
+    search.add_argument("-r", "--radius", type=float, default=DEFAULT_RADIUS,
+                        help=f"ΔE76 that counts as near (default {DEFAULT_RADIUS:g})")
+    search.add_argument("-n", "--limit", type=int, default=20, help="palettes to show (default 20)")
+    search.add_argument("-t", "--tag", help="only palettes with this tag")
+    remove = commands.add_parser("remove", help="delete palettes by id")
+    remove.add_argument("ids", nargs="+", type=int, metavar="ID")
+    args = parser.parse_args(argv)
+
+    try:
+        library = PaletteLibrary(args.library)
+    except (OSError, sqlite3.Error) as e:
+        print(f"cmilker library: {e}", file=sys.stderr)
+        return 1
+    with library:
+        if args.command == "add":
+            added, failures = [], 0
+
+            def readable():
+                nonlocal failures
+                for path in args.files:
+                    try:
+                        palette = read_palette_file(path, args.tag)
+                    except (OSError, UnicodeDecodeError, PaletteFormatError) as e:
+                        print(f"cmilker library: {path}: {e}", file=sys.stderr)
+                        failures += 1
+                        continue
+                    added.append(path)
+                    yield palette
+
+            for palette_id, path in zip(library.add_palettes(readable()), added): # All in one transaction
+                print(f"{palette_id}\t{path}")
+            return 1 if failures else 0
+        if args.command == "list":
+            for info in library.palettes(args.tag):
+                created = time.strftime("%Y-%m-%d %H:%M", time.localtime(info.created))
+                print(f"{info.id}\t{info.name}\t{info.colors:,} colors\t{created}\t{','.join(info.tags)}")
+            return 0
+        if args.command == "remove":
+            for palette_id in args.ids:
+                library.remove(palette_id)
+            return 0
+        try:
+            rgb = parse_hex(args.color)
+        except PaletteFormatError as e:
+            parser.error(str(e))
+        start = time.perf_counter()
+        results = library.search(rgb, args.radius, args.limit, args.tag)
+        elapsed = (time.perf_counter() - start) * 1000
+        for result in results:
+            print(f"{result.palette.id}\t{result.palette.name}\t#{result.rgb:06X}\tΔE {result.distance:.2f}\t"
+                  f"{result.matches} near")
+        print(f"{len(results)} palettes in {elapsed:.1f} ms", file=sys.stderr)
+        return 0
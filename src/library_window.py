@@ -0,0 +1,279 @@
+"""The palette library window, and saving palettes into the library.
+
+Built by PaletteWindow the first time the library is opened or saved to.
+Searches run on the GUI thread, since library.PaletteLibrary answers them
+from its bucket index in milliseconds. Saves run on QThreadPool, each with
+its own SQLite connection.
+"""
+import sqlite3
+import time
+
+from PyQt6.QtCore import QObject, QRunnable, Qt, QTimer, pyqtSignal
+from PyQt6.QtGui import QColor, QIcon, QPixmap
+from PyQt6.QtWidgets import (
+    QComboBox,
+    QDialog,
+    QDialogButtonBox,
+    QDoubleSpinBox,
+    QFormLayout,
+    QHBoxLayout,
+    QLabel,
+    QLineEdit,
+    QMessageBox,
+    QPushButton,
+    QTreeWidget,
+    QTreeWidgetItem,
+    QVBoxLayout,
+    QWidget,
+)
+
+import tracing
+from library import DEFAULT_RADIUS, PaletteLibrary
+
+SEARCH_LIMIT = 200 # Palettes listed per search
+SEARCH_DELAY_MS = 120 # Typing pause before the search runs
+
+
+def _swatch(rgb, size=16):
+    pixmap = QPixmap(size, size)
+    pixmap.fill(QColor.fromRgb(rgb))
+    return pixmap
+
+
+# --- Library Window ---
+class LibraryWindow(QWidget):
+    """Lists the library's palettes, or only those holding a color near the one entered."""
+    palette_opened = pyqtSignal(object, str, bool) # uint32 packed colors, palette name, append
+
+    COLUMNS = ("Palette", "Closest", "ΔE", "Near", "Colors", "Tags")
+
+    def __init__(self, path=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Palette Library")
+        self.resize(620, 420)
+        self.path = path # None: library.default_path()
+        self._library = None
+
+        self.main_layout = QVBoxLayout(self)
+        self.main_layout.setContentsMargins(5, 5, 5, 5)
+        self.main_layout.setSpacing(5)
+
+        # Search inputs; any change re-runs the search after a short pause
+        self.search_layout = QHBoxLayout()
+        self.swatch = QLabel()
+        self.swatch.setFixedSize(22, 22)
+        self.search_layout.addWidget(self.swatch)
+        self.color_edit = QLineEdit()
+        self.color_edit.setPlaceholderText("#RRGGBB or a color name; empty lists every palette")
+        self.color_edit.setClearButtonEnabled(True)
+        self.search_layout.addWidget(self.color_edit, 1)
+        self.radius_box = QDoubleSpinBox()
+        self.radius_box.setRange(0.5, 50.0)
+        self.radius_box.setSingleStep(0.5)
+        self.radius_box.setValue(DEFAULT_RADIUS)
+        self.radius_box.setPrefix("ΔE ≤ ")
+        self.radius_box.setToolTip("CIE76 color difference that counts as near; about 2.3 is just noticeable")
+        self.search_layout.addWidget(self.radius_box)
+        self.tag_box = QComboBox()
+        self.tag_box.setToolTip("Only search palettes with this tag")
+        self.search_layout.addWidget(self.tag_box)
+        self.main_layout.addLayout(self.search_layout)
+
+        self.results = QTreeWidget()
+        self.results.setHeaderLabels(self.COLUMNS)
+        self.results.setRootIsDecorated(False)
+        self.results.setUniformRowHeights(True)
+        self.results.setColumnWidth(0, 200)
+        self.results.itemDoubleClicked.connect(lambda item, column: self.open_selected())
+        self.main_layout.addWidget(self.results, 1)
+
+        self.button_panel = QHBoxLayout()
+        self.open_button = QPushButton("Open")
+        self.open_button.setToolTip("Replace the palette with the selected library palette (Undo restores it)")
+        self.open_button.clicked.connect(lambda: self.open_selected())
+        self.button_panel.addWidget(self.open_button)
+        self.append_button = QPushButton("Append")
+        self.append_button.setToolTip("Add the selected library palette's colors to the palette")
+        self.append_button.clicked.connect(lambda: self.open_selected(append=True))
+        self.button_panel.addWidget(self.append_button)
+        self.delete_button = QPushButton("Delete")
+        self.delete_button.clicked.connect(self.delete_selected)
+        self.button_panel.addWidget(self.delete_button)
+        self.button_panel.addStretch(1)
+        self.main_layout.addLayout(self.button_panel)
+
+        self.status_label = QLabel()
+        self.main_layout.addWidget(self.status_label)
+
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(SEARCH_DELAY_MS)
+        self._search_timer.timeout.connect(self.refresh)
+        self.color_edit.textChanged.connect(self._search_timer.start)
+        self.radius_box.valueChanged.connect(self._search_timer.start)
+        self.tag_box.currentIndexChanged.connect(self._search_timer.start)
+
+    @property
+    def library(self):
+        """The open PaletteLibrary, or None if it can't be opened (the reason is shown below the list)."""
+        if self._library is None:
+            try:
+                self._library = PaletteLibrary(self.path)
+            except (OSError, sqlite3.Error) as e:
+                self.status_label.setText(f"Cannot open the palette library: {e}")
+        return self._library
+
+    def show_library(self, color: QColor | None = None):
+        """Shows the window, searching for color if one is given."""
+        if color is not None and color.isValid():
+            self.color_edit.setText(color.name().upper())
+        self.reload_tags()
+        self.refresh()
+        self.show()
+        self.raise_()
+        self.activateWindow()
+
+    def reload_tags(self):
+        library = self.library
+        if library is None:
+            return
+        current = self.tag_box.currentData()
+        self.tag_box.blockSignals(True)
+        self.tag_box.clear()
+        self.tag_box.addItem("All tags", None)
+        for tag in library.tags():
+            self.tag_box.addItem(tag, tag)
+        self.tag_box.setCurrentIndex(max(self.tag_box.findData(current), 0))
+        self.tag_box.blockSignals(False)
+
+    def refresh(self):
+        """Re-runs the search for the current inputs, or lists every palette if no color is given."""
+        self._search_timer.stop()
+        library = self.library
+        if library is None:
+            return
+        text = self.color_edit.text().strip()
+        tag = self.tag_box.currentData()
+        color = QColor(text) if text else None
+        if color is not None and not color.isValid():
+            self.swatch.clear()
+            self.results.clear()
+            self.status_label.setText(f"Not a color: {text}")
+            return
+        self.results.clear()
+        start = time.perf_counter()
+        if color is None:
+            self.swatch.clear()
+            palettes = library.palettes(tag)
+            for info in palettes:
+                self._add_item(info)
+            found = f"{len(palettes):,} {'palette' if len(palettes) == 1 else 'palettes'}"
+        else:
+            self.swatch.setPixmap(_swatch(color.rgb(), 22))
+            with tracing.span("library.search", radius=self.radius_box.value()) as span:
+                results = library.search(color.rgb() & 0xFFFFFF, self.radius_box.value(), SEARCH_LIMIT, tag)
+                span.set(palettes=len(results))
+            for result in results:
+                self._add_item(result.palette, result)
+            found = f"{len(results):,} {'palette' if len(results) == 1 else 'palettes'} near {color.name().upper()}"
+        elapsed = (time.perf_counter() - start) * 1000
+        self.status_label.setText(f"{found} in {elapsed:.1f} ms ({library.count_colors():,} colors in the library)")
+
+    def _add_item(self, info, result=None):
+        item = QTreeWidgetItem(self.results)
+        item.setText(0, info.name)
+        item.setData(0, Qt.ItemDataRole.UserRole, info.id)
+        created = time.strftime("%Y-%m-%d %H:%M", time.localtime(info.created))
+        item.setToolTip(0, f"{info.source or 'Unknown source'}\nSaved {created}")
+        if result is not None:
+            item.setText(1, f"#{result.rgb:06X}")
+            item.setIcon(1, QIcon(_swatch(result.rgb)))
+            item.setText(2, f"{result.distance:.2f}")
+            item.setText(3, f"{result.matches:,}")
+        item.setText(4, f"{info.colors:,}")
+        item.setText(5, ", ".join(info.tags))
+
+    def _selected(self):
+        item = self.results.currentItem()
+        if item is None:
+            return None, None
+        return item.data(0, Qt.ItemDataRole.UserRole), item.text(0)
+
+    def open_selected(self, append=False):
+        """Hands the selected palette's colors to the palette window via palette_opened."""
+        palette_id, name = self._selected()
+        if palette_id is None or self.library is None:
+            return
+        self.palette_opened.emit(self.library.load(palette_id), name, append)
+
+    def delete_selected(self):
+        palette_id, name = self._selected()
+        if palette_id is None or self.library is None:
+            return
+        reply = QMessageBox.question(self, "Delete Palette", f"Delete \"{name}\" from the library?",
+                                     QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                                     QMessageBox.StandardButton.No)
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+        self.library.remove(palette_id)
+        self.reload_tags()
+        self.refresh()
+
+    def closeEvent(self, event):
+        if self._library is not None:
+            self._library.close()
+            self._library = None
+        super().closeEvent(event)
+
+
+# --- Saving ---
+class SaveToLibraryDialog(QDialog):
+    """Asks for the name and tags a palette is saved to the library under."""
+    def __init__(self, name, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Save to Library")
+        layout = QFormLayout(self)
+        self.name_edit = QLineEdit(name)
+        self.name_edit.selectAll()
+        layout.addRow("Name:", self.name_edit)
+        self.tags_edit = QLineEdit()
+        self.tags_edit.setPlaceholderText("e.g. brand, dark mode")
+        layout.addRow("Tags:", self.tags_edit)
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Save | QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+
+    def name(self):
+        return self.name_edit.text().strip()
+
+    def tags(self):
+        """The comma-separated tags, stripped, without empty ones."""
+        return [tag.strip() for tag in self.tags_edit.text().split(",") if tag.strip()]
+
+
+class SaveSignals(QObject):
+    """Signals emitted by SaveTask; delivered to the GUI thread as queued calls."""
+    finished = pyqtSignal(object, int) # task, palette id
+    failed = pyqtSignal(object, str) # task, error message
+
+
+class SaveTask(QRunnable):
+    """Stores a palette snapshot in the library on a worker thread."""
+    def __init__(self, colors, name, tags, path, signals):
+        super().__init__()
+        self.colors = colors
+        self.name = name
+        self.tags = tags
+        self.path = path
+        self.signals = signals
+
+    def run(self):
+        try:
+            with tracing.span("library.save", colors=len(self.colors)):
+                with PaletteLibrary(self.path) as library:
+                    palette_id = library.add_palette(self.name, self.colors, self.tags)
+        except (OSError, sqlite3.Error) as e:
+            self.signals.failed.emit(self, str(e))
+            return
+        self.signals.finished.emit(self, palette_id)
@@ -0,0 +1,83 @@
+"""Magnifier loupe for the live eyedropper.
+
+LoupeWidget shows the pixels LiveSampler captured around the cursor at an
+integer zoom, with a pixel grid and a box around the sampled pixel. The
+frame is scaled with nearest-neighbour QPainter.drawImage straight from the
+sampler's buffer, so no scaled copy or QPixmap is made, and the widget only
+repaints when the sampler reports a changed frame.
+"""
+from PyQt6.QtCore import QLine, QRect, QSize, Qt
+from PyQt6.QtGui import QColor, QPainter, QPen
+from PyQt6.QtWidgets import QWidget
+
+LOUPE_ZOOM = 7 # Default screen pixels per captured pixel
+MIN_GRID_ZOOM = 4 # Below this the grid would hide the pixels
+
+
+class LoupeWidget(QWidget):
+    """Zoomed view of a LiveSampler's latest frame."""
+    def __init__(self, sampler, zoom=LOUPE_ZOOM, parent=None):
+        super().__init__(parent)
+        self.sampler = sampler
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent) # Every pixel is painted
+        side = sampler.image.width() * zoom
+        self.setMinimumSize(QSize(side, side))
+        self.setToolTip("Pixels around the cursor; the box marks the sampled pixel")
+        self._grid_key = None # (pixels, zoom, origin) the cached grid was built for
+        self._grid = []
+        sampler.frame_changed.connect(self.update)
+
+    def sizeHint(self):
+        return self.minimumSize()
+
+    def _layout(self, pixels):
+        """Returns (zoom, target rect) fitting pixels × pixels at the largest integer zoom."""
+        zoom = max(1, min(self.width(), self.height()) // pixels)
+        side = pixels * zoom
+        return zoom, QRect((self.width() - side) // 2, (self.height() - side) // 2, side, side)
+
+    def _grid_lines(self, pixels, zoom, target):
+        key = (pixels, zoom, target.x(), target.y())
+        if key != self._grid_key: # Only rebuilt when the geometry changes
+            left, top, right, bottom = target.left(), target.top(), target.right(), target.bottom()
+            self._grid = ([QLine(left + i * zoom, top, left + i * zoom, bottom) for i in range(1, pixels)]
+                          + [QLine(left, top + i * zoom, right, top + i * zoom) for i in range(1, pixels)])
+            self._grid_key = key
+        return self._grid
+
+    def paintEvent(self, event):
+        image = self.sampler.image # Borrowed, never copied; see LiveSampler
+        pixels = image.width()
+        zoom, target = self._layout(pixels)
+
+        painter = QPainter(self)
+        if target != self.rect():
+            painter.fillRect(self.rect(), self.palette().window())
+        # No SmoothPixmapTransform hint, so scaling is nearest-neighbour
+        painter.drawImage(target, image, image.rect())
+
+        if zoom >= MIN_GRID_ZOOM:
+            painter.setPen(QPen(QColor(0, 0, 0, 48), 1))
+            painter.drawLines(self._grid_lines(pixels, zoom, target))
+
+        # Crosshair: arms up to a box around the sampled pixel, in black or
+        # white, whichever contrasts more with it
+        center = pixels // 2
+        color = QColor(image.pixel(center, center))
+        dark = color.red() * 299 + color.green() * 587 + color.blue() * 114 < 128000
+        pen_color = QColor(Qt.GlobalColor.white if dark else Qt.GlobalColor.black)
+        box = QRect(target.x() + center * zoom, target.y() + center * zoom, zoom, zoom)
+        middle = box.center()
+        pen_color.setAlpha(128)
+        painter.setPen(QPen(pen_color, 1))
+        painter.drawLines([QLine(target.left(), middle.y(), box.left() - 1, middle.y()),
+                           QLine(box.right() + 2, middle.y(), target.right(), middle.y()),
+                           QLine(middle.x(), target.top(), middle.x(), box.top() - 1),
+                           QLine(middle.x(), box.bottom() + 2, middle.x(), target.bottom())])
+        pen_color.setAlpha(255)
+        painter.setPen(QPen(pen_color, 1))
+        painter.setBrush(Qt.BrushStyle.NoBrush)
+        painter.drawRect(box)
+        painter.setPen(QPen(self.palette().mid().color(), 1))
+        painter.drawRect(target.adjusted(0, 0, -1, -1))
+        painter.end()
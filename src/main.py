@@ -1,380 +1,64 @@
-import csv
+"""Color Milker's main window and GUI entry point.
+
+Startup is kept lean: this module imports only Qt (and the standard-library
+tracing module), and the palette model,
+PaletteWindow, screen grabber, color math (NumPy) and the autosave restore
+are created on first use or just after the window's first paint.
+"""
 import functools
-import json
 import os
-import subprocess
 import sys
-import tempfile
-from datetime import datetime
+import time
 
-from PyQt6.QtCore import QObject, QSize, Qt, pyqtSignal
-from PyQt6.QtGui import QAction, QColor, QGuiApplication, QIcon, QImage, QMouseEvent
+from PyQt6.QtCore import QSize, QStandardPaths, Qt, QTimer
+from PyQt6.QtGui import QAction, QActionGroup, QColor, QIcon, QKeySequence
 from PyQt6.QtWidgets import (
     QApplication,
-    QFileDialog,
     QFrame,
     QHBoxLayout,
     QLabel,
     QMainWindow,
     QMenu,
-    QMessageBox,
     QPushButton,
-    QScrollArea,
     QStyle,
     QToolButton,
     QVBoxLayout,
     QWidget,
 )
 
+import tracing
 
-# --- Palette Window ---
-class PaletteWindow(QWidget):
-    """A separate window to display saved colors."""
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setWindowTitle("Color Palette")
-        self.setMinimumWidth(200)
-        self.setMinimumHeight(300) # Start with a decent size
-        self.colors = [] # Store QColor objects
-
-        self.main_layout = QVBoxLayout(self)
-        self.main_layout.setContentsMargins(5, 5, 5, 5)
-        self.main_layout.setSpacing(5)
-
-        # Scroll Area for colors
-        self.scroll_area = QScrollArea()
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
-
-        self.scroll_content_widget = QWidget()
-        self.scroll_layout = QVBoxLayout(self.scroll_content_widget)
-        self.scroll_layout.setAlignment(Qt.AlignmentFlag.AlignTop) # Colors stack from top
-        self.scroll_layout.setSpacing(4)
-
-        self.scroll_area.setWidget(self.scroll_content_widget)
-        self.main_layout.addWidget(self.scroll_area)
-
-        # Add button panel for various operations
-        self.button_panel = QHBoxLayout()
-        
-        # Clear button
-        self.clear_button = QPushButton("Clear")
-        self.clear_button.clicked.connect(self.clear_palette)
-        self.button_panel.addWidget(self.clear_button)
-        
-        # Export button
-        self.export_button = QPushButton("Export")
-        self.export_button.clicked.connect(self.show_export_menu)
-        self.export_button.setToolTip("Export palette to file")
-        self.button_panel.addWidget(self.export_button)
-        
-        # Add button panel to main layout
-        self.main_layout.addLayout(self.button_panel)
-        
-        # Create export menu
-        self.export_menu = QMenu(self)
-        self.export_json_action = QAction("Export as JSON", self)
-        self.export_json_action.triggered.connect(self.export_as_json)
-        self.export_csv_action = QAction("Export as CSV", self)
-        self.export_csv_action.triggered.connect(self.export_as_csv)
-        self.export_menu.addAction(self.export_json_action)
-        self.export_menu.addAction(self.export_csv_action)
-
-    def show_export_menu(self):
-        """Shows the export menu dropdown."""
-        if not self.colors:
-            QMessageBox.warning(self, "Empty Palette", "Cannot export an empty palette.")
-            return
-            
-        # Position the menu under the export button
-        self.export_menu.exec(self.export_button.mapToGlobal(self.export_button.rect().bottomLeft()))
-
-    def export_as_json(self):
-        """Export palette as JSON file."""
-        if not self.colors:
-            return
-            
-        # Create default filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        default_filename = f"color_palette_{timestamp}.json"
-        
-        filename, _ = QFileDialog.getSaveFileName(
-            self, "Export Palette as JSON", default_filename, "JSON Files (*.json)"
-        )
-        
-        if not filename:
-            return  # User cancelled
-            
-        # Convert colors to hex values
-        color_data = [{"hex": color.name().upper(), "rgb": [color.red(), color.green(), color.blue()]} 
-                      for color in self.colors]
-        
-        try:
-            with open(filename, 'w') as f:
-                json.dump({"colors": color_data}, f, indent=2)
-            
-            self._show_export_success_message(filename)
-        except Exception as e:
-            QMessageBox.critical(self, "Export Error", f"Failed to export palette: {str(e)}")
-    
-    def export_as_csv(self):
-        """Export palette as CSV file."""
-        if not self.colors:
-            return
-            
-        # Create default filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        default_filename = f"color_palette_{timestamp}.csv"
-        
-        filename, _ = QFileDialog.getSaveFileName(
-            self, "Export Palette as CSV", default_filename, "CSV Files (*.csv)"
-        )
-        
-        if not filename:
-            return  # User cancelled
-            
-        try:
-            with open(filename, 'w', newline='') as f:
-                writer = csv.writer(f)
-                # Write header
-                writer.writerow(["HEX", "R", "G", "B"])
-                # Write color data
-                for color in self.colors:
-                    writer.writerow([
-                        color.name().upper(),
-                        color.red(),
-                        color.green(),
-                        color.blue()
-                    ])
-            
-            self._show_export_success_message(filename)
-        except Exception as e:
-            QMessageBox.critical(self, "Export Error", f"Failed to export palette: {str(e)}")
-    
-    def _show_export_success_message(self, filepath):
-        """Show success message after export."""
-        msg = QMessageBox(self)
-        msg.setIcon(QMessageBox.Icon.Information)
-        msg.setWindowTitle("Export Successful")
-        msg.setText("Palette exported successfully!")
-        msg.setInformativeText(f"File saved to:\n{filepath}")
-        msg.exec()
-
-    def add_color(self, color: QColor):
-        """Adds a color swatch and hex label to the palette."""
-        if not isinstance(color, QColor) or not color.isValid():
-            print("Invalid color passed to palette")
-            return
-
-        hex_code = color.name().upper() # Get #RRGGBB format
-
-        # Avoid adding duplicates immediately after each other (optional)
-        # if self.colors and self.colors[-1] == color:
-        #     return 
-
-        self.colors.append(color)
-
-        # Create display widget for this color
-        color_widget = QWidget()
-        color_widget.setMinimumHeight(25) # Make swatches decent height
-        color_widget.setAutoFillBackground(True)
-        palette = color_widget.palette()
-        palette.setColor(color_widget.backgroundRole(), color)
-        color_widget.setPalette(palette)
-        # Add tooltip for the color name
-        color_widget.setToolTip(f"Click to copy {hex_code}")
-        
-        # --- Make the color widget clickable to copy hex ---
-        # Define a nested function taking hex_code first
-        def on_color_widget_click(h: str, event: QMouseEvent | None) -> None:
-            # Check if event is not None and is a left click
-            if event and event.button() == Qt.MouseButton.LeftButton:
-                self.copy_to_clipboard(h)
-        
-        # Use functools.partial to create the event handler
-        color_widget.mousePressEvent = functools.partial(on_color_widget_click, hex_code) #type: ignore
-        # --- End clickable widget section ---
-
-
-        hex_label = QLabel(hex_code)
-        hex_label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
-        hex_label.setToolTip(f"Click color swatch to copy {hex_code}")
-
-        entry_layout = QHBoxLayout()
-        entry_layout.addWidget(color_widget, 1) # Color takes more space
-        entry_layout.addWidget(hex_label, 1) # Label takes space too
-        entry_layout.setSpacing(10)
-        
-        # Add the HBox layout to the main VBox layout inside scroll area
-        self.scroll_layout.addLayout(entry_layout)
-        
-        # Scroll to bottom (optional, shows newest color)
-        QApplication.processEvents() # Ensure layout is updated before scrolling
-        scrollbar = self.scroll_area.verticalScrollBar()
-        if scrollbar:
-            scrollbar.setValue(scrollbar.maximum())
-
-
-    def copy_to_clipboard(self, text):
-        """Copies the provided text to the system clipboard."""
-        clipboard = QGuiApplication.clipboard()
-        if clipboard:
-            clipboard.setText(text)
-            print(f"Copied to clipboard: {text}")
-            # Optional: Show temporary status message
-            parent_widget = self.parent()
-            # Check type first, then get and check status bar
-            if isinstance(parent_widget, QMainWindow):
-                 status_bar = parent_widget.statusBar()
-                 if status_bar: # Check if statusBar() returned a valid object
-                     status_bar.showMessage(f"Copied: {text}", 2000) # Show for 2 seconds
-        else:
-            print("Error: Could not access clipboard.")
-
-
-    def clear_palette(self):
-        """Removes all colors from the palette display."""
-        if not self.colors:
-            return
-            
-        # Ask for confirmation only if there are colors
-        if self.colors:
-            reply = QMessageBox.question(
-                self, "Clear Palette", 
-                "Are you sure you want to clear the entire palette?",
-                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
-                QMessageBox.StandardButton.No
-            )
-            if reply != QMessageBox.StandardButton.Yes:
-                return
-                
-        self.colors = []
-        # Remove widgets from layout safely
-        while self.scroll_layout.count():
-            layout_item = self.scroll_layout.takeAt(0)
-            if layout_item is not None:
-                widget = layout_item.widget()
-                if widget is not None:
-                    widget.deleteLater()
-                else:
-                    # Check if it's a layout
-                    sub_layout = layout_item.layout()
-                    if sub_layout is not None:
-                        # Clear widgets within the sub-layout (QHBoxLayout)
-                        while sub_layout.count():
-                            sub_item = sub_layout.takeAt(0)
-                            if sub_item is not None:
-                                sub_widget = sub_item.widget()
-                                if sub_widget is not None:
-                                    sub_widget.deleteLater()
-                        # After clearing items, we might want to delete the layout itself,
-                        # but taking it from the parent layout usually handles this.
-
-# --- Color Grabber Logic ---
-class ScreenColorGrabber(QObject):
-    """Handles the screen grabbing process using macOS's screenshot capability."""
-    color_grabbed = pyqtSignal(QColor) # Signal emitted when color is selected
-    grabbing_finished = pyqtSignal() # Signal emitted when grabbing stops
-
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self._is_grabbing = False
-        self._temp_file = None
-
-    def start_grabbing(self):
-        """Initiates the color grabbing process using screencapture."""
-        if self._is_grabbing:
-            return
-        self._is_grabbing = True
-        
-        # Create a temporary file for the screenshot
-        fd, self._temp_file = tempfile.mkstemp(suffix='.png')
-        os.close(fd)
-        
-        try:
-            # Use macOS screencapture tool with interactive mode
-            # This lets the user select a portion of the screen
-            print(f"Taking screenshot to {self._temp_file}")
-            subprocess.run(['screencapture', '-i', '-o', '-t', 'png', self._temp_file], check=True)
-            
-            # Check if the file exists and has content (user didn't cancel)
-            if os.path.exists(self._temp_file) and os.path.getsize(self._temp_file) > 0:
-                # Load the image and grab the center pixel
-                self._get_color_from_screenshot()
-            else:
-                print("Screenshot was cancelled")
-                self._cancel_grabbing("Screenshot cancelled")
-        except subprocess.SubprocessError as e:
-            self._cancel_grabbing(f"Error capturing screenshot: {e}")
-        
-        # Clean up
-        self.stop_grabbing()
-
-    def _get_color_from_screenshot(self):
-        """Extract the color from the center of the screenshot."""
-        if not self._temp_file or not os.path.exists(self._temp_file):
-            return
-            
-        # Load the image using QImage
-        image = QImage(self._temp_file)
-        
-        if image.isNull():
-            print("Failed to load screenshot image")
-            return
-            
-        # Get color from center pixel
-        width = image.width()
-        height = image.height()
-        
-        if width <= 0 or height <= 0:
-            print("Invalid image dimensions")
-            return
-            
-        # Get the center pixel
-        center_x = width // 2
-        center_y = height // 2
-        center_color = QColor(image.pixel(center_x, center_y))
-        
-        if center_color.isValid():
-            print(f"Grabbed color: {center_color.name().upper()}")
-            self.color_grabbed.emit(center_color)
-        else:
-            print("Invalid color grabbed")
 
-    def stop_grabbing(self):
-        """Stops the color grabbing mode."""
-        if not self._is_grabbing:
-            return
-            
-        self._is_grabbing = False
-        
-        # Clean up temp file
-        if self._temp_file and os.path.exists(self._temp_file):
-            try:
-                os.unlink(self._temp_file)
-            except OSError as e:
-                print(f"Error removing temp file: {e}")
-            self._temp_file = None
-            
-        self.grabbing_finished.emit()
-        print("Grabbing mode finished.")
+# --- Main Window ---
+def autosave_directory():
+    """Where the palette journal lives; CMILKER_DATA_DIR overrides the platform default."""
+    override = os.environ.get("CMILKER_DATA_DIR")
+    if override:
+        return override
+    location = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppDataLocation)
+    return os.path.join(location or os.path.expanduser("~/.color_milker"), "autosave")
 
-    def _cancel_grabbing(self, message):
-        print(message)
-        self.stop_grabbing()
 
-# --- Main Window ---
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, autosave=True, serve=True):
         super().__init__()
         self.setWindowTitle("Color Grabber")
         self.current_color = QColor(Qt.GlobalColor.white) # Default color
         self.details_visible = True # Start expanded
+        self.autosave = autosave
+        self.serve = serve # Answer `cmilker grab/add/export` through a CommandServer
+
+        # --- Lazily created parts (see the properties below) ---
+        self._palette_model = None
+        self._palette_window = None
+        self._color_grabber = None
+        self._named_colors = None
+        self._live_sampler = None
+        self._loupe = None
+        self._grab_summary = None # Status message for the grab that just finished
+        self._displayed_rgba = None # Color the labels were last computed for
+        self._startup_finished = False
 
-        # --- Palette Window (create it early as a separate window) ---
-        self.palette_window = PaletteWindow()  # No parent! Make it a separate window
-        self.palette_window.setWindowTitle("Color Palette")
-        
         # Get style object for icons, checking for None
         style = QApplication.style()
         default_icon = QIcon() # Empty icon as fallback
@@ -418,8 +102,51 @@ class MainWindow(QMainWindow):
         self.show_palette_action.triggered.connect(self.toggle_palette_visibility)
         self.add_action = QAction("Add Current to Palette", self)
         self.add_action.triggered.connect(self.add_current_color_to_palette)
+        self.live_action = QAction("Live Eyedropper", self, checkable=True)
+        self.live_action.setShortcut("Ctrl+L")
+        self.live_action.setToolTip("Continuously show the color under the cursor")
+        self.live_action.toggled.connect(self.set_live_sampling)
+        self.addAction(self.live_action) # Keep the shortcut working while the menu is closed
+        # Undo/redo of palette edits; they follow the history once the palette model exists
+        self.undo_action = QAction("Undo", self)
+        self.undo_action.setShortcut(QKeySequence.StandardKey.Undo)
+        self.undo_action.setEnabled(False)
+        self.undo_action.triggered.connect(self.undo_palette_edit)
+        self.redo_action = QAction("Redo", self)
+        self.redo_action.setEnabled(False)
+        self.redo_action.setShortcut(QKeySequence.StandardKey.Redo)
+        self.redo_action.triggered.connect(self.redo_palette_edit)
+        self.addActions([self.undo_action, self.redo_action])
         self.palette_menu.addAction(self.show_palette_action)
         self.palette_menu.addAction(self.add_action)
+        self.library_action = QAction("Search Palette Library...", self)
+        self.library_action.setToolTip("Find saved palettes with a color near the current one")
+        self.library_action.triggered.connect(self.show_library)
+        self.palette_menu.addAction(self.library_action)
+        self.palette_menu.addAction(self.undo_action)
+        self.palette_menu.addAction(self.redo_action)
+        self.palette_menu.addAction(self.live_action)
+
+        # Grab Many submenu: one capture, many palette colors
+        self.multi_menu = self.palette_menu.addMenu("Grab Many")
+        for label, kind in (("Points...", "points"), ("Grid...", "grid"), ("Dominant Colors...", "dominant")):
+            multi_action = self.multi_menu.addAction(label)
+            multi_action.triggered.connect(functools.partial(self.start_multi_grab, kind))
+
+        # Sampling submenu: which statistic reduces the selection to a color
+        # Value format submenu: the color space shown next to the hex code
+        # Live rate submenu: live eyedropper samples per second
+        # (all filled in the first time the menu opens, see populate_palette_menu)
+        self.value_space = "hsl"
+        self.sample_menu = self.palette_menu.addMenu("Sampling")
+        self.sample_mode_group = QActionGroup(self)
+        self.sample_mode_group.triggered.connect(self.set_sample_mode)
+        self.value_menu = self.palette_menu.addMenu("Show Value As")
+        self.value_space_group = QActionGroup(self)
+        self.value_space_group.triggered.connect(self.set_value_space)
+        self.live_rate_menu = self.palette_menu.addMenu("Live Rate")
+        self.live_rate_group = QActionGroup(self)
+        self.live_rate_group.triggered.connect(self.set_live_rate)
         self.palette_menu.aboutToShow.connect(self.update_palette_menu) # Update state before showing
         self.palette_button.setMenu(self.palette_menu)
 
@@ -446,20 +173,36 @@ class MainWindow(QMainWindow):
         self.hex_label = QLabel("Hex: #FFFFFF")
         self.hex_label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
         self.hex_label.setToolTip("Hexadecimal value of the selected color")
+        self.hex_label.setToolTipDuration(10000)
+
+        # Closest named color and palette entry, in ΔE2000
+        self.match_label = QLabel()
+        self.match_label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+        self.match_label.setToolTip("Nearest CSS named color and palette color (CIEDE2000 difference)")
+
+        self.text_layout = QVBoxLayout()
+        self.text_layout.setSpacing(2)
+        self.text_layout.addWidget(self.hex_label)
+        self.text_layout.addWidget(self.match_label)
 
         self.details_layout.addWidget(self.color_display)
-        self.details_layout.addWidget(self.hex_label, 1)
+        self.details_layout.addLayout(self.text_layout, 1)
 
         self.main_layout.addWidget(self.details_container)
 
         # --- Adjust Size --- (Set explicit minimum sizes)
-        self.update_color_display(self.current_color)
+        # Only the swatch and hex code for the first paint; the color space
+        # values and nearest matches follow in finish_startup
+        self.show_color(self.current_color)
+        self.match_label.setText("≈ …")
         self.central_widget.adjustSize()
         self.resize(self.central_widget.sizeHint()) # Resize to hint
         self.setMinimumWidth(350)  # Larger minimum width to fit all buttons properly
 
-        # --- Color Grabber Instance ---
-        self.color_grabber = ScreenColorGrabber(self)
+        # Autosave journal, opened by restore_palette in finish_startup
+        self.journal = None
+        # Command server for `cmilker grab/add/export`, also started in finish_startup
+        self.command_server = None
 
         # --- Status Bar ---
         status_bar = self.statusBar()
@@ -469,51 +212,217 @@ class MainWindow(QMainWindow):
         # --- Connect Signals ---
         self.grab_button.clicked.connect(self.start_color_grab)
         self.toggle_button.clicked.connect(self.toggle_details_visibility)
-        self.color_grabber.color_grabbed.connect(self.update_color_display)
-        self.color_grabber.grabbing_finished.connect(self.on_grabbing_finished)
 
         # Initialize toggle state (sets icon)
         self.update_toggle_button_icon() # Renamed call
 
+    # --- Lazy Startup ---
+
+    @property
+    def palette_model(self):
+        """The palette's model, shared with PaletteWindow; created on first use."""
+        if self._palette_model is None:
+            from palette_model import PaletteModel
+            from palette_history import PaletteHistory
+            from palette_store import PaletteStore
+            self._palette_model = PaletteModel(PaletteStore(), self)
+            history = PaletteHistory(self._palette_model)
+            history.canUndoChanged.connect(self.undo_action.setEnabled)
+            history.canRedoChanged.connect(self.redo_action.setEnabled)
+            history.undoTextChanged.connect(self._on_undo_text_changed)
+            history.redoTextChanged.connect(self._on_redo_text_changed)
+            self._palette_model.history = history
+        return self._palette_model
+
+    @property
+    def palette_window(self):
+        """The palette window (a separate top-level window); built the first time it's needed."""
+        if self._palette_window is None:
+            from palette_window import PaletteWindow
+            self._palette_window = PaletteWindow(self.palette_model)  # No parent! Make it a separate window
+            self._palette_window.setWindowTitle("Color Palette")
+        return self._palette_window
+
+    @property
+    def color_grabber(self):
+        """The screen grabber; capture backends and sampling are loaded on first use."""
+        if self._color_grabber is None:
+            from grabber import ScreenColorGrabber
+            self._color_grabber = ScreenColorGrabber(self)
+            self._color_grabber.color_grabbed.connect(self.update_color_display)
+            self._color_grabber.colors_grabbed.connect(self.add_grabbed_colors)
+            self._color_grabber.grab_failed.connect(self.on_grab_failed)
+            self._color_grabber.grabbing_finished.connect(self.on_grabbing_finished)
+        return self._color_grabber
+
+    @property
+    def live_sampler(self):
+        """Samples the color under the cursor while the live eyedropper is on."""
+        if self._live_sampler is None:
+            from grabber import LiveSampler
+            self._live_sampler = LiveSampler(self)
+            self._live_sampler.color_sampled.connect(self.update_color_display)
+            self._live_sampler.failed.connect(self.on_live_sampling_failed)
+        return self._live_sampler
+
+    @property
+    def loupe(self):
+        """Magnified view of the live eyedropper's pixels, shown beside the color preview."""
+        if self._loupe is None:
+            from loupe import LoupeWidget
+            self._loupe = LoupeWidget(self.live_sampler)
+            self._loupe.hide()
+            self.details_layout.insertWidget(1, self._loupe)
+        return self._loupe
+
+    @property
+    def named_colors(self):
+        if self._named_colors is None:
+            from color_index import named_color_index
+            self._named_colors = named_color_index()
+        return self._named_colors
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self._startup_finished:
+            self._startup_finished = True
+            QTimer.singleShot(0, self.finish_startup) # The first frame is on screen; do the rest
+
+    def finish_startup(self):
+        """Deferred startup work: color values, nearest matches and the autosave restore."""
+        with tracing.span("startup.finish"):
+            self.update_color_display(self.current_color)
+            # --- Autosave: restore the last session's palette, then journal every edit ---
+            # (after the first display update, so startup doesn't index the palette)
+            if self.autosave:
+                self.restore_palette(autosave_directory())
+            if self.serve:
+                self.start_command_server()
+
+    def populate_palette_menu(self):
+        """Fills the Sampling, Show Value As and Live Rate submenus the first time the menu opens."""
+        if self.sample_mode_group.actions():
+            return
+        from colorspace import FORMAT_SPACES
+        from grabber import LIVE_RATES
+        from sampling import SampleMode
+
+        for mode in SampleMode:
+            mode_action = QAction(mode.label, self, checkable=True)
+            mode_action.setData(mode)
+            mode_action.setChecked(mode == self.color_grabber.sample_mode)
+            self.sample_mode_group.addAction(mode_action)
+            self.sample_menu.addAction(mode_action)
+
+        for space in (None,) + FORMAT_SPACES:
+            space_action = QAction(space.upper() if space else "Hex Only", self, checkable=True)
+            space_action.setData(space)
+            space_action.setChecked(space == self.value_space)
+            self.value_space_group.addAction(space_action)
+            self.value_menu.addAction(space_action)
+
+        for rate in LIVE_RATES:
+            rate_action = QAction(f"{rate} Hz", self, checkable=True)
+            rate_action.setData(rate)
+            rate_action.setChecked(rate == round(self.live_sampler.rate))
+            self.live_rate_group.addAction(rate_action)
+            self.live_rate_menu.addAction(rate_action)
+
     # --- Methods ---
 
     def start_color_grab(self):
-        """Initiates the screen grabbing process."""
-        print("Starting color grab from main window...")
-        self.grab_button.setEnabled(False)
-        
+        """Initiates the screen grabbing process, or cancels one in progress."""
+        if self.color_grabber.is_grabbing:
+            self.color_grabber.cancel_grabbing()
+            return
+        self.live_action.setChecked(False) # The selection overlay would hide the live color
+
+        tracing.info("Starting color grab from main window...")
         status_bar = self.statusBar()
         if status_bar is not None:
-            status_bar.showMessage("Select an area on screen to grab the color from its center...", 0)
+            status_bar.showMessage(
+                f"Select an area on screen to grab its {self.color_grabber.sample_mode.value} color...", 0)
         
-        # Make the button show we're in grabbing mode
-        self.grab_button.setText("Grabbing...")
+        # The button stays enabled so a slow grab can be cancelled
+        self.grab_button.setText(" Cancel Grab")
         
-        # Start grabbing
+        # Start grabbing; the result arrives later through color_grabbed
         self.color_grabber.start_grabbing()
 
+    def start_multi_grab(self, kind: str):
+        """Grabs many colors from one capture: clicked points, a grid, or the dominant colors."""
+        from PyQt6.QtWidgets import QInputDialog
+        from sampling import MultiSample
+
+        if self.color_grabber.is_grabbing:
+            return
+        if kind == "grid":
+            text, ok = QInputDialog.getText(self, "Grid Sampling", "Rows × columns of swatches (e.g. 8x8):", text="8x8")
+            try:
+                rows, columns = (int(part) for part in text.lower().replace("×", "x").split("x"))
+            except ValueError:
+                ok = False
+            if not ok or rows < 1 or columns < 1:
+                return
+            spec = MultiSample(kind, rows=rows, columns=columns)
+            message = f"Select an area to sample as a {rows}×{columns} grid..."
+        elif kind == "dominant":
+            count, ok = QInputDialog.getInt(self, "Dominant Colors", "Number of colors:", 8, 1, 256)
+            if not ok:
+                return
+            spec = MultiSample(kind, count=count)
+            message = f"Select an area to extract its {count} dominant colors..."
+        else:
+            spec = MultiSample(kind)
+            message = "Click the points to sample; Enter or right-click to finish, Backspace to undo..."
+        self.live_action.setChecked(False)
+
+        status_bar = self.statusBar()
+        if status_bar is not None:
+            status_bar.showMessage(message, 0)
+        self.grab_button.setText(" Cancel Grab")
+        self.color_grabber.start_grabbing(spec)
+
+    def add_colors(self, colors):
+        """Adds a uint32 array of packed 0xRRGGBB colors as one bulk insert; returns how many were added."""
+        if self._palette_window is not None:
+            return self._palette_window.add_colors(colors)
+        import numpy as np
+        from palette_store import OPAQUE
+        return self.palette_model.extend(colors | np.uint32(OPAQUE))
+
+    def add_grabbed_colors(self, colors):
+        """Adds the packed colors of a multi-sample grab to the palette as one bulk insert."""
+        added = self.add_colors(colors)
+        self.update_color_display(QColor(int(colors[0])))
+        skipped = len(colors) - added
+        self._grab_summary = f"Added {added} of {len(colors)} sampled colors to palette" + (
+            f" ({skipped} already present)" if skipped else "")
+        self.update_match_label()
+
+    def on_grab_failed(self, message):
+        """Shows why a grab failed once it has finished."""
+        self._grab_summary = f"Grab failed: {message}"
+
     def on_grabbing_finished(self):
         """Called when grabbing is done or cancelled."""
-        print("Grabbing finished...")
-        self.grab_button.setEnabled(True)
-        
+        tracing.info("Grabbing finished...")
         # Reset button text
         self.grab_button.setText(" Grab Color")
         
         status_bar = self.statusBar()
         if status_bar is not None:
             status_bar.clearMessage()
-            if self.current_color.isValid():
+            if self._grab_summary:
+                status_bar.showMessage(self._grab_summary, 4000)
+                self._grab_summary = None
+            elif self.current_color.isValid():
                  status_bar.showMessage(f"Grabbed: {self.current_color.name().upper()}", 3000)
             else:
                  status_bar.showMessage("Grabbing cancelled or failed.", 3000)
 
-    def update_color_display(self, color: QColor):
-        """Updates the color preview and hex label."""
-        if not isinstance(color, QColor) or not color.isValid():
-            print(f"Attempted to update display with invalid color: {color}")
-            return
-
+    def show_color(self, color: QColor):
+        """Updates the color preview swatch and the plain hex label."""
         self.current_color = color
         hex_code = color.name().upper()
 
@@ -521,9 +430,82 @@ class MainWindow(QMainWindow):
         palette.setColor(self.color_display.backgroundRole(), color)
         self.color_display.setPalette(palette)
         self.color_display.setToolTip(f"Current color: {hex_code}\nUse palette button to add.") # Updated tooltip
-
         self.hex_label.setText(f"Hex: {hex_code}")
 
+    def update_color_display(self, color: QColor):
+        """Updates the color preview, hex label and nearest matches; a no-op if the color is unchanged."""
+        if not isinstance(color, QColor) or not color.isValid():
+            tracing.warning(f"Attempted to update display with invalid color: {color}")
+            return
+        if color.rgba() == self._displayed_rgba:
+            return # Nothing to repaint (e.g. the live eyedropper over a flat area)
+        from colorspace import FORMAT_SPACES, format_colors
+
+        self._displayed_rgba = color.rgba()
+        self.show_color(color)
+        hex_code = color.name().upper()
+
+        # Every supported space in the tooltip; the chosen one on the label
+        values = {space: format_colors(color.rgb(), space)[0] for space in FORMAT_SPACES}
+        self.hex_label.setToolTip("\n".join([hex_code] + list(values.values())))
+        if self.value_space:
+            self.hex_label.setText(f"Hex: {hex_code}  {values[self.value_space]}")
+        self.update_match_label()
+
+    def update_match_label(self):
+        """Shows the named color and palette entry closest to the current color."""
+        rgb = self.current_color.rgb()
+        named = self.named_colors.nearest(rgb)[0]
+        lines = [f"≈ {named.name} ({self.named_colors.label} {named.distance:.1f})"]
+        match = self.palette_model.nearest_color(rgb)
+        if match is not None:
+            lines.append(f"Palette: #{match.rgb:06X} ({self.named_colors.label} {match.distance:.1f})")
+        self.match_label.setText("\n".join(lines))
+
+    def set_value_space(self, action: QAction):
+        """Chooses the color space shown next to the hex code (None for hex only)."""
+        self.value_space = action.data()
+        self._displayed_rgba = None # Force the labels to be rebuilt
+        self.update_color_display(self.current_color)
+
+    def set_live_sampling(self, enabled: bool):
+        """Starts or stops the live eyedropper (Ctrl+L)."""
+        status_bar = self.statusBar()
+        if enabled:
+            if self.color_grabber.is_grabbing:
+                self.color_grabber.cancel_grabbing()
+            self.live_sampler.start()
+            self.loupe.show()
+            if status_bar:
+                status_bar.showMessage(f"Live eyedropper at {self.live_sampler.rate:.0f} Hz "
+                                       "(paused over this window; Ctrl+L to stop)", 0)
+        elif self._live_sampler is not None and self._live_sampler.is_running:
+            self._live_sampler.stop()
+            self.loupe.hide()
+            self.resize(self.width(), self.central_widget.sizeHint().height())
+            if status_bar:
+                status_bar.showMessage(f"Live eyedropper stopped at {self.current_color.name().upper()}", 3000)
+
+    def set_live_rate(self, action: QAction):
+        """Sets the live eyedropper's samples per second."""
+        self.live_sampler.rate = action.data()
+        if self.live_sampler.is_running:
+            self.set_live_sampling(True) # Refresh the status message
+
+    def on_live_sampling_failed(self, message: str):
+        tracing.warning(f"Live eyedropper stopped: {message}")
+        self.live_action.setChecked(False)
+        status_bar = self.statusBar()
+        if status_bar:
+            status_bar.showMessage(message, 5000)
+
+    def set_sample_mode(self, action: QAction):
+        """Selects the statistic used to reduce grabbed regions."""
+        self.color_grabber.sample_mode = action.data()
+        status_bar = self.statusBar()
+        if status_bar:
+            status_bar.showMessage(f"Sampling: {self.color_grabber.sample_mode.label}", 2000)
+
     def toggle_details_visibility(self):
         """Shows or hides the color preview and hex label section."""
         self.details_visible = not self.details_visible
@@ -572,46 +554,159 @@ class MainWindow(QMainWindow):
             self.palette_window.raise_()
             self.palette_window.activateWindow()
 
+    def show_library(self):
+        """Opens the palette library searching for the current color."""
+        self.palette_window.show_library(self.current_color)
+
     # New method to update menu items just before showing
     def update_palette_menu(self):
-        if self.palette_window.isVisible():
+        self.populate_palette_menu()
+        if self._palette_window is not None and self._palette_window.isVisible():
             self.show_palette_action.setText("Hide Palette")
         else:
             self.show_palette_action.setText("Show Palette")
         # Disable add action if no valid color is selected
         self.add_action.setEnabled(self.current_color.isValid())
 
+    def undo_palette_edit(self):
+        """Undoes the last palette edit, showing what was undone in the status bar."""
+        history = self.palette_model.history
+        if history.canUndo():
+            text = history.undoText()
+            history.undo()
+            status_bar = self.statusBar()
+            if status_bar:
+                status_bar.showMessage(f"Undid {text}", 2000)
+            self.update_match_label()
+
+    def _on_undo_text_changed(self, text):
+        self.undo_action.setText(f"Undo {text}" if text else "Undo")
+
+    def _on_redo_text_changed(self, text):
+        self.redo_action.setText(f"Redo {text}" if text else "Redo")
+
+    def redo_palette_edit(self):
+        """Redoes the last undone palette edit."""
+        history = self.palette_model.history
+        if history.canRedo():
+            text = history.redoText()
+            history.redo()
+            status_bar = self.statusBar()
+            if status_bar:
+                status_bar.showMessage(f"Redid {text}", 2000)
+            self.update_match_label()
+
     def add_current_color_to_palette(self):
         """Adds the currently displayed color to the palette window."""
         if self.current_color and self.current_color.isValid():
-            self.palette_window.add_color(self.current_color)
+            if self._palette_window is not None:
+                added = self._palette_window.add_color(self.current_color)
+            else:
+                added = self.palette_model.append(self.current_color.rgba()) # No need to build the window
+            if not added:
+                status_bar = self.statusBar()
+                if status_bar:
+                    status_bar.showMessage(f"{self.current_color.name().upper()} is already in the palette", 2000)
+                return
             # Show palette if hidden when adding first color? (Optional)
             # if self.palette_window.isHidden() and len(self.palette_window.colors) == 1:
             #    self.show_palette() # Maybe too intrusive, let user open manually
             status_bar = self.statusBar()
             if status_bar:
                 status_bar.showMessage(f"Added {self.current_color.name().upper()} to palette", 2000)
+            self.update_match_label()
         else:
              status_bar = self.statusBar()
              if status_bar:
                  status_bar.showMessage("No valid color selected to add.", 2000)
 
+    def restore_palette(self, directory):
+        """Loads the autosaved palette from directory and starts journaling edits."""
+        from journal import PaletteJournal
+
+        start = time.perf_counter()
+        journal = PaletteJournal(directory)
+        try:
+            colors = journal.load()
+        except OSError as e:
+            tracing.warning(f"Autosave disabled: {e}")
+            return
+        self.palette_model.reset_colors(colors)
+        self.palette_model.history.clear() # History starts at the restored palette
+        self.palette_model.attach_journal(journal)
+        self.journal = journal
+        if journal.set_aside_path is not None:
+            status_bar = self.statusBar()
+            if status_bar:
+                status_bar.showMessage(f"Could not restore the saved palette; it was moved to {journal.set_aside_path}", 15000)
+        if len(colors):
+            tracing.info(f"Restored {len(colors):,} palette colors in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    def start_command_server(self):
+        """Listens for commands from `cmilker grab/add/export` unless another instance already does."""
+        from daemon import CommandServer
+
+        server = CommandServer(self)
+        if server.listen():
+            self.command_server = server
+        else:
+            server.deleteLater()
+
     def closeEvent(self, event):
         """Ensure palette window also closes when main window closes."""
-        if self.palette_window and self.palette_window.isVisible():
-            self.palette_window.close()
+        self.live_action.setChecked(False)
+        if self._palette_window is not None and self._palette_window.isVisible():
+            self._palette_window.close()
+        if self.journal is not None:
+            # Leave a compact snapshot behind so the next start replays nothing
+            self.journal.close(self.palette_model.store[:])
+            self.journal = None
+        if self.command_server is not None:
+            self.command_server.close()
+            self.command_server = None
         super().closeEvent(event)
 
 
 # --- Application Entry Point ---
-if __name__ == "__main__":
-    # Use QGuiApplication for screen/clipboard access if QApplication not needed for widgets?
-    # No, QApplication is needed for widgets.
-    app = QApplication(sys.argv)
+def parse_options(argv):
+    """Splits Color Milker's own options from argv; the rest is left for Qt."""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="cmilker", add_help=False, allow_abbrev=False)
+    parser.add_argument("--trace", metavar="FILE")
+    parser.add_argument("--trace-format", choices=tracing.FORMATS, default="chrome")
+    parser.add_argument("--trace-buffer", type=int, default=tracing.DEFAULT_CAPACITY)
+    parser.add_argument("-v", "--verbose", action="store_true")
+    return parser.parse_known_args(argv)
+
+
+def run(argv=None):
+    """Starts the GUI; argv (without the program name) is passed on to Qt.
+
+    --trace FILE records trace spans while the app runs and writes them to
+    FILE on exit (--trace-format chrome or json); --verbose prints the
+    diagnostic messages.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    options, argv = parse_options(list(argv))
+    tracing.verbose = options.verbose
+    if options.trace:
+        tracing.enable(options.trace_buffer)
+    app = QApplication([sys.argv[0]] + list(argv))
+    app.setApplicationName("Color Milker") # Names the autosave data directory
     # You can set an application icon here if you have one
     # app.setWindowIcon(QIcon('path/to/your/icon.png'))
 
     main_win = MainWindow()
     main_win.show()
 
-    sys.exit(app.exec())
\ No newline at end of file
+    status = app.exec()
+    if options.trace:
+        count = tracing.dump(options.trace, options.trace_format)
+        print(f"Wrote {count:,} trace events to {options.trace}", file=sys.stderr)
+        print("\n".join(tracing.summary()), file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,189 @@
+"""Undo/redo history for palette edits.
+
+PaletteHistory watches a PaletteModel's signals, as the autosave journal
+does, and pushes one delta record per edit onto a QUndoStack: the colors
+an insert added or a removal took out, a move's rows, or the buffer a
+wholesale reset (clear, merge) replaced. History therefore costs memory in
+proportion to what changed rather than a copy of the palette per step.
+PaletteStore.clear() and assign() always swap in a new buffer, so a reset
+keeps the old one without copying it; undoing a clear hands it back with a
+single model reset, and the delegate-painted view has no widgets to rebuild.
+
+Undo and redo replay edits through the model, so the journal, the
+nearest-color index and the views follow them like any other edit.
+"""
+import contextlib
+
+import numpy as np
+from PyQt6.QtGui import QUndoCommand, QUndoStack
+
+from palette_model import hex_code
+
+UNDO_LIMIT = 500 # Steps kept; the oldest are dropped first
+_INSERT_ID = 1 # QUndoCommand id of inserts that may merge (see PaletteHistory.edit)
+
+
+class _Edit(QUndoCommand):
+    """An edit that has already happened when it is pushed."""
+    def __init__(self, history, text):
+        super().__init__(text)
+        self.history = history
+        self._recorded = True
+
+    def redo(self):
+        if self._recorded: # QUndoStack.push() redoes what was just done
+            self._recorded = False
+            return
+        with self.history.replaying():
+            self.apply()
+
+    def undo(self):
+        with self.history.replaying():
+            self.revert()
+
+
+class _InsertEdit(_Edit):
+    def __init__(self, history, text, first, colors, merge_key=None):
+        super().__init__(history, text)
+        self.first = first
+        self.chunks = [colors]
+        self.count = len(colors)
+        self.merge_key = merge_key
+
+    def id(self):
+        return _INSERT_ID if self.merge_key is not None else -1
+
+    def mergeWith(self, other):
+        if other.merge_key != self.merge_key or other.first != self.first + self.count:
+            return False
+        self.chunks.append(other.chunks[0]) # Concatenated only if this step is redone
+        self.count += other.count
+        return True
+
+    def apply(self):
+        if len(self.chunks) > 1:
+            self.chunks = [np.concatenate([np.asarray(chunk, dtype=np.uint32) for chunk in self.chunks])]
+        self.history.model.insert_colors(self.first, self.chunks[0])
+
+    def revert(self):
+        self.history.model.remove_rows(self.first, self.count)
+
+
+class _RemoveEdit(_Edit):
+    def __init__(self, history, text, first, colors):
+        super().__init__(history, text)
+        self.first = first
+        self.colors = colors
+
+    def apply(self):
+        self.history.model.remove_rows(self.first, len(self.colors))
+
+    def revert(self):
+        self.history.model.insert_colors(self.first, self.colors)
+
+
+class _MoveEdit(_Edit):
+    def __init__(self, history, text, first, count, destination):
+        super().__init__(history, text)
+        self.first, self.count, self.destination = first, count, destination
+
+    def apply(self):
+        self.history.model.move_rows(self.first, self.count, self.destination)
+
+    def revert(self):
+        if self.destination > self.first: # The rows now end just before destination
+            self.history.model.move_rows(self.destination - self.count, self.count, self.first)
+        else:
+            self.history.model.move_rows(self.destination, self.count, self.first + self.count)
+
+
+class _ResetEdit(_Edit):
+    """Holds the palette on the other side of a reset; undo and redo swap it in."""
+    def __init__(self, history, text, colors):
+        super().__init__(history, text)
+        self.colors = colors
+
+    def _swap(self):
+        model = self.history.model
+        current = model.store.array() # Stays valid: assign() allocates a new buffer
+        model.reset_colors(self.colors)
+        self.colors = current
+
+    apply = revert = _swap
+
+
+class PaletteHistory(QUndoStack):
+    """Undo stack recording every edit of a PaletteModel as a delta."""
+    def __init__(self, model, parent=None):
+        super().__init__(parent if parent is not None else model)
+        self.model = model
+        self.setUndoLimit(UNDO_LIMIT)
+        self._replaying = False
+        self._text = None
+        self._merge_key = None
+        self._reset_colors = None # The buffer a reset in progress is replacing
+        model.rowsInserted.connect(self._on_rows_inserted)
+        model.rowsAboutToBeRemoved.connect(self._on_rows_about_to_be_removed)
+        model.rowsMoved.connect(self._on_rows_moved)
+        model.modelAboutToBeReset.connect(self._on_model_about_to_be_reset)
+        model.modelReset.connect(self._on_model_reset)
+
+    @contextlib.contextmanager
+    def edit(self, text, merge_key=None):
+        """Names the edits made in the block (e.g. "Merge Similar Colors") for the Undo/Redo actions.
+
+        Consecutive inserts sharing a merge_key, such as the chunks of one
+        import, become a single step.
+        """
+        saved = self._text, self._merge_key
+        self._text, self._merge_key = text, merge_key
+        try:
+            yield
+        finally:
+            self._text, self._merge_key = saved
+
+    @contextlib.contextmanager
+    def replaying(self):
+        """Edits made in the block are not recorded (undo and redo themselves)."""
+        self._replaying = True
+        try:
+            yield
+        finally:
+            self._replaying = False
+
+    # --- Recording ---
+    def _on_rows_inserted(self, parent, first, last):
+        if self._replaying:
+            return
+        if first == last: # A single grab: skip the slice copy
+            rgba = self.model.store[first]
+            colors, text = (rgba,), f"Add {hex_code(rgba)}"
+        else:
+            colors, text = self.model.store[first:last + 1], f"Add {last - first + 1:,} Colors"
+        self.push(_InsertEdit(self, self._text or text, first, colors, self._merge_key))
+
+    def _on_rows_about_to_be_removed(self, parent, first, last):
+        if self._replaying:
+            return
+        colors = self.model.store[first:last + 1]
+        text = self._text or (f"Remove {hex_code(int(colors[0]))}" if len(colors) == 1
+                              else f"Remove {len(colors):,} Colors")
+        self.push(_RemoveEdit(self, text, first, colors))
+
+    def _on_rows_moved(self, parent, first, last, destination, row):
+        if not self._replaying:
+            count = last - first + 1
+            self.push(_MoveEdit(self, self._text or ("Move Color" if count == 1 else "Move Colors"), first, count, row))
+
+    def _on_model_about_to_be_reset(self):
+        if not self._replaying:
+            self._reset_colors = self.model.store.array() # No copy, see PaletteStore.clear
+
+    def _on_model_reset(self):
+        if self._replaying or self._reset_colors is None:
+            return
+        before, self._reset_colors = self._reset_colors, None
+        if not len(before) and not len(self.model.store):
+            return
+        text = self._text or ("Clear Palette" if not len(self.model.store) else "Replace Palette")
+        self.push(_ResetEdit(self, text, before))
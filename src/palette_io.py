@@ -0,0 +1,162 @@
+"""Streaming readers for palette files written by PaletteWindow's exporters.
+
+Readers yield packed 0xRRGGBB integers one at a time and never hold the whole
+file in memory, so multi-hundred-thousand entry dumps can be imported
+incrementally. This module has no Qt dependency.
+"""
+import csv
+import json
+import os
+from array import array
+
+CHUNK_SIZE = 20000 # Colors per chunk handed to the palette
+_READ_SIZE = 1 << 16
+
+
+class PaletteFormatError(ValueError):
+    """Raised when a palette file cannot be parsed."""
+
+
+def parse_hex(text: str) -> int:
+    """Parses '#RRGGBB' (or 'RRGGBB') into a packed integer."""
+    digits = text.strip().lstrip('#')
+    if len(digits) != 6:
+        raise PaletteFormatError(f"Invalid hex color: {text!r}")
+    try:
+        return int(digits, 16)
+    except ValueError:
+        raise PaletteFormatError(f"Invalid hex color: {text!r}") from None
+
+
+def _pack_rgb(r, g, b) -> int:
+    r, g, b = int(r), int(g), int(b)
+    if not all(0 <= c <= 255 for c in (r, g, b)):
+        raise PaletteFormatError(f"RGB component out of range: {(r, g, b)}")
+    return (r << 16) | (g << 8) | b
+
+
+def iter_csv_colors(path):
+    """Yields colors from a HEX,R,G,B CSV file; HEX wins if both are present."""
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        columns = [name.strip().upper() for name in header]
+        if "HEX" in columns:
+            hex_column = columns.index("HEX")
+            for line_number, row in enumerate(reader, start=2):
+                if row:
+                    try:
+                        yield parse_hex(row[hex_column])
+                    except (IndexError, PaletteFormatError) as e:
+                        raise PaletteFormatError(f"{path}:{line_number}: {e}") from None
+        elif {"R", "G", "B"} <= set(columns):
+            indices = [columns.index(c) for c in ("R", "G", "B")]
+            for line_number, row in enumerate(reader, start=2):
+                if row:
+                    try:
+                        yield _pack_rgb(*(row[i] for i in indices))
+                    except (IndexError, ValueError) as e:
+                        raise PaletteFormatError(f"{path}:{line_number}: {e}") from None
+        else:
+            raise PaletteFormatError(f"{path}: expected a HEX or R,G,B header")
+
+
+def _entry_to_rgb(entry) -> int:
+    if isinstance(entry, str):
+        return parse_hex(entry)
+    if isinstance(entry, dict):
+        if "hex" in entry:
+            if not isinstance(entry["hex"], str):
+                raise PaletteFormatError(f"Invalid hex color: {entry['hex']!r}")
+            return parse_hex(entry["hex"])
+        if "rgb" in entry:
+            rgb = entry["rgb"]
+            # bool is an int subclass, but true/false are not color components
+            if not (isinstance(rgb, list) and len(rgb) == 3 and all(type(c) is int for c in rgb)):
+                raise PaletteFormatError(f"Invalid RGB color: {rgb!r}")
+            return _pack_rgb(*rgb)
+    raise PaletteFormatError(f"Unrecognized color entry: {entry!r}")
+
+
+def iter_json_colors(path):
+    """Yields colors from the {"colors": [...]} JSON export without json.load.
+
+    The file is read in blocks and each array element is decoded on its own
+    with JSONDecoder.raw_decode, so memory use is bounded by the largest entry.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, encoding='utf-8') as f:
+        buffer = ""
+        eof = False
+
+        def fill():
+            nonlocal buffer, eof
+            block = f.read(_READ_SIZE)
+            if not block:
+                eof = True
+            buffer += block
+
+        # Locate the start of the "colors" array
+        while True:
+            key = buffer.find('"colors"')
+            if key >= 0:
+                bracket = buffer.find('[', key)
+                if bracket >= 0:
+                    buffer = buffer[bracket + 1:]
+                    break
+            if eof:
+                raise PaletteFormatError(f"{path}: no \"colors\" array found")
+            fill()
+
+        position = 0
+        while True:
+            # Skip separators between elements
+            while True:
+                while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                    position += 1
+                if position < len(buffer) or eof:
+                    break
+                buffer, position = "", 0
+                fill()
+            if position >= len(buffer):
+                raise PaletteFormatError(f"{path}: unterminated \"colors\" array")
+            if buffer[position] == ']':
+                return
+            try:
+                entry, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise PaletteFormatError(f"{path}: malformed color entry") from None
+                # Element straddles the block boundary; read more and retry
+                buffer = buffer[position:]
+                position = 0
+                fill()
+                continue
+            yield _entry_to_rgb(entry)
+            position = end
+            if position > _READ_SIZE:
+                buffer, position = buffer[position:], 0
+
+
+def iter_palette_colors(path):
+    """Yields colors from a CSV or JSON palette file, chosen by extension."""
+    extension = os.path.splitext(os.fspath(path))[1].lower()
+    if extension == ".csv":
+        return iter_csv_colors(path)
+    if extension == ".json":
+        return iter_json_colors(path)
+    raise PaletteFormatError(f"Unsupported palette file type: {extension or path}")
+
+
+def iter_chunks(colors, chunk_size=CHUNK_SIZE):
+    """Groups an iterable of packed colors into array('I') chunks."""
+    chunk = array('I')
+    for rgb in colors:
+        chunk.append(rgb)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = array('I')
+    if chunk:
+        yield chunk
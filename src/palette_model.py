@@ -0,0 +1,210 @@
+"""Model/view classes backing PaletteWindow.
+
+Colors are kept as packed integers in a PaletteStore, and rows are painted
+by SwatchDelegate, so a QListView only materializes what is visible no
+matter how many colors the palette holds.
+"""
+from PyQt6.QtCore import QAbstractListModel, QModelIndex, QRect, QSize, Qt
+from PyQt6.QtGui import QColor
+from PyQt6.QtWidgets import QStyle, QStyledItemDelegate
+
+import tracing
+
+# Custom role returning the packed 0xAARRGGBB value of a row
+RgbaRole = Qt.ItemDataRole.UserRole + 1
+
+
+def hex_code(rgba: int) -> str:
+    """Formats a packed color the way QColor.name().upper() does."""
+    return f"#{rgba & 0xFFFFFF:06X}"
+
+
+class PaletteModel(QAbstractListModel):
+    """List model over a PaletteStore of packed 0xAARRGGBB colors.
+
+    The model outlives (and is created before) PaletteWindow, so palette
+    edits can be journaled and matched against without building the window.
+    """
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.journal = None # Autosave journal, see attach_journal
+        self.history = None # Undo stack, a palette_history.PaletteHistory
+        self._nearest_index = None # Built on the first nearest_color lookup
+        self._nearest_stale = False
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.store)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self.store):
+            return None
+        rgba = self.store[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return hex_code(rgba)
+        if role == Qt.ItemDataRole.DecorationRole:
+            return QColor.fromRgba(rgba)
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return f"Click to copy {hex_code(rgba)}"
+        if role == RgbaRole:
+            return rgba
+        return None
+
+    def __len__(self):
+        return len(self.store)
+
+    def append(self, rgba: int) -> bool:
+        """Appends one packed color; returns False if the store skipped it as a duplicate."""
+        if self.store.dedupe and rgba in self.store:
+            return False
+        with tracing.span("palette.add"): # Includes the views' handling of the insert
+            row = len(self.store)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self.store.append(rgba)
+            self.endInsertRows()
+        return True
+
+    def extend(self, colors) -> int:
+        """Appends many packed colors with a single insert notification."""
+        with tracing.span("palette.add_many") as span:
+            values = self.store.insertable(colors)
+            span.set(colors=int(values.size))
+            if not values.size:
+                return 0
+            row = len(self.store)
+            self.beginInsertRows(QModelIndex(), row, row + values.size - 1)
+            self.store.extend(values)
+            self.endInsertRows()
+        return int(values.size)
+
+    def remove(self, row: int) -> int:
+        """Removes and returns the color at row."""
+        self.beginRemoveRows(QModelIndex(), row, row)
+        rgba = self.store.pop(row)
+        self.endRemoveRows()
+        return rgba
+
+    def insert_colors(self, row: int, colors):
+        """Inserts packed colors before row, kept as given (no dedupe)."""
+        if not len(colors):
+            return
+        self.beginInsertRows(QModelIndex(), row, row + len(colors) - 1)
+        self.store.insert(row, colors)
+        self.endInsertRows()
+
+    def remove_rows(self, first: int, count: int):
+        """Removes count rows starting at first; returns their colors as an array."""
+        if count <= 0:
+            return self.store[0:0]
+        self.beginRemoveRows(QModelIndex(), first, first + count - 1)
+        removed = self.store.delete(first, count)
+        self.endRemoveRows()
+        return removed
+
+    def move_rows(self, first: int, count: int, destination: int) -> bool:
+        """Moves count rows starting at first to before row destination; returns False for a no-op move."""
+        if not self.beginMoveRows(QModelIndex(), first, first + count - 1, QModelIndex(), destination):
+            return False
+        self.store.move(first, count, destination)
+        self.endMoveRows()
+        return True
+
+    def clear(self):
+        """Removes all colors with a single model reset."""
+        with tracing.span("palette.clear", colors=len(self.store)):
+            self.beginResetModel()
+            self.store.clear()
+            self.endResetModel()
+
+    def reset_colors(self, colors):
+        """Replaces every color (e.g. a reloaded palette) with a single model reset."""
+        with tracing.span("palette.reset", colors=len(colors)):
+            self.beginResetModel()
+            self.store.assign(colors)
+            self.endResetModel()
+
+    # --- Nearest color ---
+    def nearest_color(self, rgb: int):
+        """Returns the palette's closest Match to packed rgb, or None if the palette is empty.
+
+        The perceptual index is built on first use; later inserts are added
+        to it incrementally, while removals and resets rebuild it lazily.
+        """
+        if self._nearest_index is None:
+            from color_index import NearestColorIndex
+            self._nearest_index = NearestColorIndex()
+            self._nearest_stale = True
+            self.rowsInserted.connect(self._on_rows_inserted_nearest)
+            self.rowsRemoved.connect(self._mark_nearest_stale)
+            self.modelReset.connect(self._mark_nearest_stale)
+        if self._nearest_stale:
+            import numpy as np
+            self._nearest_index.reset(np.unique(self.store.array()))
+            self._nearest_stale = False
+        matches = self._nearest_index.nearest(rgb)
+        return matches[0] if matches else None
+
+    def _on_rows_inserted_nearest(self, parent, first, last):
+        if not self._nearest_stale:
+            self._nearest_index.add(self.store[first:last + 1])
+
+    def _mark_nearest_stale(self, *args):
+        self._nearest_stale = True
+
+    # --- Autosave ---
+    def attach_journal(self, journal):
+        """Records every later edit in journal (a loaded journal.PaletteJournal)."""
+        self.journal = journal
+        self.rowsInserted.connect(self._on_rows_inserted_journal)
+        self.rowsRemoved.connect(self._on_rows_removed_journal)
+        self.rowsMoved.connect(self._on_rows_moved_journal)
+        self.modelReset.connect(self._on_model_reset_journal)
+
+    def _on_rows_inserted_journal(self, parent, first, last):
+        self.journal.insert(first, self.store[first:last + 1])
+        self._compact_journal_if_needed()
+
+    def _on_rows_removed_journal(self, parent, first, last):
+        self.journal.remove(first, last - first + 1)
+        self._compact_journal_if_needed()
+
+    def _on_rows_moved_journal(self, parent, first, last, destination, row):
+        self.journal.move(first, last - first + 1, row)
+        self._compact_journal_if_needed()
+
+    def _on_model_reset_journal(self):
+        if len(self.store):
+            self.journal.compact(self.store[:]) # Wholesale replacement: snapshot it
+        else:
+            self.journal.clear()
+            self._compact_journal_if_needed()
+
+    def _compact_journal_if_needed(self):
+        if self.journal.needs_compaction:
+            self.journal.compact(self.store[:])
+
+
+class SwatchDelegate(QStyledItemDelegate):
+    """Paints a row as a color swatch next to its hex code."""
+    ROW_HEIGHT = 25
+    SPACING = 10
+
+    def paint(self, painter, option, index):
+        painter.save()
+        if option.state & QStyle.StateFlag.State_Selected:
+            painter.fillRect(option.rect, option.palette.highlight())
+
+        rect = option.rect.adjusted(0, 2, 0, -2) # Keep a small gap between rows
+        half = (rect.width() - self.SPACING) // 2
+        swatch = QRect(rect.left(), rect.top(), half, rect.height())
+        painter.fillRect(swatch, index.data(Qt.ItemDataRole.DecorationRole))
+
+        text_rect = QRect(swatch.right() + self.SPACING, rect.top(), rect.width() - half - self.SPACING, rect.height())
+        painter.setPen(option.palette.text().color())
+        painter.drawText(text_rect, Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft,
+                         index.data(Qt.ItemDataRole.DisplayRole))
+        painter.restore()
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), self.ROW_HEIGHT + 4)
+
@@ -0,0 +1,321 @@
+"""Compact storage for palette colors.
+
+Colors are packed 32-bit 0xAARRGGBB values (Qt's QRgb layout) in a growable
+NumPy buffer, with a hash index of per-color counts for O(1) membership
+tests and optional dedupe-on-insert. Both live in flat uint32 arrays, so a
+color costs 4 bytes plus at most 16 bytes of index per distinct value.
+This module has no Qt dependency.
+"""
+import numpy as np
+
+OPAQUE = 0xFF000000
+_MIN_CAPACITY = 64
+_EMPTY = -1 # Index slot that has never held a key
+_GOLDEN = np.uint64(0x9E3779B1) # Multiplicative hashing constant
+
+
+def opaque(rgb: int) -> int:
+    """Converts a packed 0xRRGGBB value to an opaque 0xAARRGGBB value."""
+    return (rgb & 0xFFFFFF) | OPAQUE
+
+
+class _ColorIndex:
+    """Open-addressing hash table mapping packed colors to occurrence counts.
+
+    Slots whose count drops to zero keep their key, so probe chains stay
+    intact; the table is rebuilt from live keys when it fills up.
+    """
+    __slots__ = ("_keys", "_counts", "_bits", "_used")
+
+    def __init__(self, bits=6):
+        self._bits = bits
+        self._keys = np.zeros(1 << bits, dtype=np.uint32)
+        self._counts = np.full(1 << bits, _EMPTY, dtype=np.int32)
+        self._used = 0
+
+    def _slots(self, keys):
+        hashed = (keys.astype(np.uint64) * _GOLDEN) & np.uint64(0xFFFFFFFF)
+        return (hashed >> np.uint64(32 - self._bits)).astype(np.int64)
+
+    def _find(self, key):
+        """Returns the slot holding key, or the empty slot where it would go."""
+        mask = (1 << self._bits) - 1
+        # Same hash as _slots, in plain ints to avoid NumPy scalar overhead
+        slot = ((key * int(_GOLDEN)) & 0xFFFFFFFF) >> (32 - self._bits)
+        keys, counts = self._keys, self._counts
+        while True:
+            if counts[slot] == _EMPTY or keys[slot] == key:
+                return slot
+            slot = (slot + 1) & mask
+
+    def count(self, key):
+        slot = self._find(key)
+        return max(int(self._counts[slot]), 0)
+
+    def add(self, key, amount=1):
+        if (self._used + 1) * 2 > len(self._keys):
+            self._rebuild(self._used + 1)
+        slot = self._find(key)
+        if self._counts[slot] == _EMPTY:
+            self._keys[slot] = key
+            self._counts[slot] = 0
+            self._used += 1
+        self._counts[slot] += amount
+
+    def discard(self, key):
+        slot = self._find(key)
+        if self._counts[slot] > 0:
+            self._counts[slot] -= 1
+
+    def discard_many(self, keys):
+        unique, amounts = np.unique(keys, return_counts=True)
+        slots, found = self._probe(unique)
+        slots = slots[found]
+        self._counts[slots] = np.maximum(self._counts[slots] - amounts[found].astype(np.int32), 0)
+
+    def _probe(self, keys):
+        """Vectorized lookup of unique keys; returns (slots, found) arrays."""
+        mask = (1 << self._bits) - 1
+        slots = self._slots(keys)
+        found = np.zeros(len(keys), dtype=bool)
+        pending = np.arange(len(keys))
+        while pending.size:
+            slot = slots[pending]
+            count = self._counts[slot]
+            hit = (count != _EMPTY) & (self._keys[slot] == keys[pending])
+            found[pending[hit]] = True
+            # Keys stop at a match or at the first empty slot of their chain
+            pending = pending[~hit & (count != _EMPTY)]
+            slots[pending] = (slots[pending] + 1) & mask
+        return slots, found
+
+    def contains_many(self, keys):
+        """Returns a bool array: is each key present with a nonzero count."""
+        unique, inverse = np.unique(keys, return_inverse=True)
+        slots, found = self._probe(unique)
+        present = found & (self._counts[slots] > 0)
+        return present[inverse]
+
+    def add_many(self, keys):
+        unique, amounts = np.unique(keys, return_counts=True)
+        if (self._used + len(unique)) * 2 > len(self._keys):
+            self._rebuild(self._used + len(unique))
+        self._add_unique(unique, amounts.astype(np.int32))
+
+    def _add_unique(self, unique, amounts):
+        mask = (1 << self._bits) - 1
+        slots, found = self._probe(unique)
+        self._counts[slots[found]] += amounts[found]
+
+        # New keys land on empty slots; when several want the same slot the
+        # first claims it and the rest continue probing
+        pending = np.flatnonzero(~found)
+        while pending.size:
+            slot = slots[pending]
+            free = self._counts[slot] == _EMPTY
+            claim_slots, first = np.unique(slot[free], return_index=True)
+            winners = pending[free][first]
+            self._keys[claim_slots] = unique[winners]
+            self._counts[claim_slots] = amounts[winners]
+            self._used += len(winners)
+            done = np.zeros(len(pending), dtype=bool)
+            done[np.flatnonzero(free)[first]] = True
+            pending = pending[~done]
+            slots[pending] = (slots[pending] + 1) & mask
+
+    def _rebuild(self, needed):
+        live = self._counts > 0
+        keys, counts = self._keys[live], self._counts[live]
+        bits = self._bits
+        while (1 << bits) < max(needed, len(keys)) * 2:
+            bits += 1
+        self.__init__(bits)
+        if len(keys):
+            self._add_unique(keys, counts) # Live keys are already unique
+
+    def nbytes(self):
+        return self._keys.nbytes + self._counts.nbytes
+
+
+class PaletteStore:
+    """Ordered sequence of packed RGBA colors with an O(1) membership index."""
+    __slots__ = ("_buffer", "_size", "_index", "dedupe")
+
+    def __init__(self, colors=(), dedupe=False):
+        self._buffer = np.empty(_MIN_CAPACITY, dtype=np.uint32)
+        self._size = 0
+        self._index = None # packed color -> occurrences, built on first use
+        self.dedupe = dedupe # Skip colors that are already present on insert
+        self.extend(colors)
+
+    @property
+    def _counts(self):
+        """The membership index, built lazily so bulk loads skip hashing."""
+        if self._index is None:
+            self._index = _ColorIndex()
+            if self._size:
+                self._index.add_many(self._buffer[:self._size])
+        return self._index
+
+    # --- Sequence protocol ---
+    def __len__(self):
+        return self._size
+
+    def __bool__(self):
+        return self._size > 0
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self._buffer[:self._size][key].copy()
+        if key < 0:
+            key += self._size
+        if not 0 <= key < self._size:
+            raise IndexError("palette index out of range")
+        return int(self._buffer[key])
+
+    def __iter__(self):
+        # Iterate over chunked copies so mutation during iteration is safe
+        for start in range(0, self._size, 65536):
+            yield from self._buffer[start:min(start + 65536, self._size)].tolist()
+
+    def __contains__(self, rgba):
+        return self._counts.count(int(rgba)) > 0
+
+    def count(self, rgba):
+        """Returns how many times rgba occurs in the palette."""
+        return self._counts.count(int(rgba))
+
+    def contains_many(self, colors):
+        """Vectorized membership test; returns a bool array."""
+        return self._counts.contains_many(np.asarray(colors, dtype=np.uint32))
+
+    @property
+    def nbytes(self):
+        """Memory held by the color buffer and index."""
+        return self._buffer.nbytes + (self._index.nbytes() if self._index is not None else 0)
+
+    def array(self):
+        """Returns a read-only view of the packed colors.
+
+        The view is invalidated by later mutation; copy it (or use slicing)
+        to keep a snapshot.
+        """
+        view = self._buffer[:self._size]
+        view.flags.writeable = False
+        return view
+
+    def iter_chunks(self, chunk_size=65536):
+        """Yields copies of consecutive slices of the palette, for exporters."""
+        for start in range(0, self._size, chunk_size):
+            yield self[start:start + chunk_size]
+
+    # --- Mutation ---
+    def _reserve(self, extra):
+        needed = self._size + extra
+        if needed <= len(self._buffer):
+            return
+        capacity = max(needed, len(self._buffer) * 2)
+        grown = np.empty(capacity, dtype=np.uint32)
+        grown[:self._size] = self._buffer[:self._size]
+        self._buffer = grown
+
+    def append(self, rgba: int) -> bool:
+        """Appends one color; returns False if it was skipped as a duplicate."""
+        rgba = int(rgba)
+        if self.dedupe and self._counts.count(rgba):
+            return False
+        self._reserve(1)
+        self._buffer[self._size] = rgba
+        self._size += 1
+        if self._index is not None:
+            self._index.add(rgba)
+        return True
+
+    def insertable(self, colors):
+        """Returns colors as a uint32 array, minus duplicates if dedupe is on."""
+        values = np.asarray(colors if isinstance(colors, np.ndarray) else list(colors), dtype=np.uint32)
+        if self.dedupe and values.size:
+            # Order-preserving unique, minus what is already stored
+            _, first = np.unique(values, return_index=True)
+            values = values[np.sort(first)]
+            values = values[~self._counts.contains_many(values)]
+        return values
+
+    def extend(self, colors) -> int:
+        """Appends many colors; returns how many were added."""
+        values = self.insertable(colors)
+        if not values.size:
+            return 0
+        self._reserve(values.size)
+        self._buffer[self._size:self._size + values.size] = values
+        self._size += values.size
+        if self._index is not None:
+            self._index.add_many(values)
+        return int(values.size)
+
+    def pop(self, index: int) -> int:
+        """Removes and returns the color at index."""
+        rgba = self[index]
+        if index < 0:
+            index += self._size
+        self._buffer[index:self._size - 1] = self._buffer[index + 1:self._size]
+        self._size -= 1
+        if self._index is not None:
+            self._index.discard(rgba)
+        return rgba
+
+    def insert(self, index: int, colors):
+        """Inserts colors before index, kept as given (no dedupe)."""
+        values = np.asarray(colors, dtype=np.uint32)
+        if not 0 <= index <= self._size:
+            raise IndexError("palette index out of range")
+        self._reserve(values.size)
+        self._buffer[index + values.size:self._size + values.size] = self._buffer[index:self._size]
+        self._buffer[index:index + values.size] = values
+        self._size += values.size
+        if self._index is not None:
+            self._index.add_many(values)
+
+    def delete(self, first: int, count: int):
+        """Removes count colors starting at first; returns them as an array."""
+        if first < 0 or count < 0 or first + count > self._size:
+            raise IndexError("palette index out of range")
+        removed = self._buffer[first:first + count].copy()
+        self._buffer[first:self._size - count] = self._buffer[first + count:self._size]
+        self._size -= count
+        if self._index is not None:
+            self._index.discard_many(removed)
+        return removed
+
+    def move(self, first: int, count: int, destination: int):
+        """Moves count colors starting at first to before row destination, as QAbstractItemModel.moveRows does."""
+        if first < 0 or count < 0 or first + count > self._size or not 0 <= destination <= self._size:
+            raise IndexError("palette index out of range")
+        if first <= destination <= first + count:
+            return # Already there
+        block = self._buffer[first:first + count].copy()
+        if destination > first:
+            self._buffer[first:destination - count] = self._buffer[first + count:destination]
+            self._buffer[destination - count:destination] = block
+        else:
+            self._buffer[destination + count:first + count] = self._buffer[destination:first]
+            self._buffer[destination:destination + count] = block
+
+    def clear(self):
+        # clear() and assign() always allocate a new buffer, so earlier array()
+        # views stay valid snapshots (palette_history keeps them for undo)
+        self._buffer = np.empty(_MIN_CAPACITY, dtype=np.uint32)
+        self._size = 0
+        self._index = None
+
+    def assign(self, colors):
+        """Replaces the contents with colors, kept as given (no dedupe).
+
+        The index is rebuilt on the next membership test, so loading a
+        large saved palette costs little more than a copy.
+        """
+        values = np.asarray(colors, dtype=np.uint32)
+        self._buffer = np.empty(max(len(values), _MIN_CAPACITY), dtype=np.uint32)
+        self._buffer[:len(values)] = values
+        self._size = len(values)
+        self._index = None
@@ -0,0 +1,652 @@
+"""The palette window and its background import/export/consolidate tasks.
+
+Imported by MainWindow the first time the palette is shown, so neither the
+window nor the export/import machinery costs anything at startup.
+"""
+import functools
+import os
+from array import array
+from datetime import datetime
+
+import numpy as np
+
+from PyQt6.QtCore import QObject, QRunnable, Qt, QThreadPool, QTimer, pyqtSignal
+from PyQt6.QtGui import QAction, QColor, QGuiApplication, QKeySequence
+from PyQt6.QtWidgets import (
+    QCheckBox,
+    QComboBox,
+    QDialog,
+    QDialogButtonBox,
+    QDoubleSpinBox,
+    QFileDialog,
+    QFormLayout,
+    QHBoxLayout,
+    QLabel,
+    QListView,
+    QMainWindow,
+    QMenu,
+    QMessageBox,
+    QPushButton,
+    QVBoxLayout,
+    QWidget,
+)
+
+import tracing
+from exporters import FORMATS, export_palette
+from palette_io import iter_chunks, iter_palette_colors
+from palette_history import PaletteHistory
+from palette_model import PaletteModel, SwatchDelegate
+from palette_store import OPAQUE, PaletteStore, opaque
+
+
+# --- Palette Window ---
+class PaletteWindow(QWidget):
+    """A separate window to display saved colors."""
+    def __init__(self, model: PaletteModel | None = None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Color Palette")
+        self.setMinimumWidth(200)
+        self.setMinimumHeight(300) # Start with a decent size
+        # Colors live in a packed store; the view paints only visible rows.
+        # MainWindow passes in its model, which exists before this window does
+        self.model = model if model is not None else PaletteModel(PaletteStore(), self)
+        self.store = self.model.store
+        if self.model.history is None:
+            self.model.history = PaletteHistory(self.model)
+        self.history = self.model.history
+
+        self.main_layout = QVBoxLayout(self)
+        self.main_layout.setContentsMargins(5, 5, 5, 5)
+        self.main_layout.setSpacing(5)
+
+        # List view for colors
+        self.list_view = QListView()
+        self.list_view.setModel(self.model)
+        self.list_view.setItemDelegate(SwatchDelegate(self.list_view))
+        self.list_view.setUniformItemSizes(True) # Constant-time scrolling
+        # Lay rows out in slices between events so huge palettes never stall the UI
+        self.list_view.setLayoutMode(QListView.LayoutMode.Batched)
+        self.list_view.setBatchSize(2000)
+        self.list_view.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.list_view.setSelectionMode(QListView.SelectionMode.SingleSelection)
+        self.list_view.clicked.connect(self._on_swatch_clicked)
+        self.main_layout.addWidget(self.list_view)
+
+        # Row actions in the list's context menu; undo/redo work anywhere in the window
+        self.list_view.setContextMenuPolicy(Qt.ContextMenuPolicy.ActionsContextMenu)
+        self.row_actions = []
+        for label, shortcut, slot in (("Remove", QKeySequence.StandardKey.Delete, self.remove_selected),
+                                      ("Move Up", "Ctrl+Up", functools.partial(self.move_selected, -1)),
+                                      ("Move Down", "Ctrl+Down", functools.partial(self.move_selected, 1))):
+            action = QAction(label, self.list_view)
+            action.setShortcut(shortcut)
+            action.setShortcutContext(Qt.ShortcutContext.WidgetShortcut)
+            action.triggered.connect(slot)
+            self.list_view.addAction(action)
+            self.row_actions.append(action)
+        self.undo_action = self.history.createUndoAction(self, "Undo")
+        self.undo_action.setShortcut(QKeySequence.StandardKey.Undo)
+        self.redo_action = self.history.createRedoAction(self, "Redo")
+        self.redo_action.setShortcut(QKeySequence.StandardKey.Redo)
+        self.addActions([self.undo_action, self.redo_action])
+        separator = QAction(self.list_view)
+        separator.setSeparator(True)
+        self.list_view.addActions([separator, self.undo_action, self.redo_action])
+
+        # Keep the newest color in view while batched layout catches up;
+        # scrolling explicitly per row would force a full relayout each time
+        self._follow_newest = False
+        scrollbar = self.list_view.verticalScrollBar()
+        if scrollbar:
+            scrollbar.rangeChanged.connect(self._on_scroll_range_changed)
+            scrollbar.actionTriggered.connect(self._on_user_scroll)
+
+        # Add button panel for various operations
+        self.button_panel = QHBoxLayout()
+        
+        # Clear button
+        self.clear_button = QPushButton("Clear")
+        self.clear_button.clicked.connect(self.clear_palette)
+        self.button_panel.addWidget(self.clear_button)
+
+        # Import button
+        self.import_button = QPushButton("Import")
+        self.import_button.clicked.connect(self.import_palette)
+        self.import_button.setToolTip("Append colors from an exported CSV or JSON palette")
+        self.button_panel.addWidget(self.import_button)
+
+        # Near-duplicate merging
+        self.consolidate_button = QPushButton("Merge Similar...")
+        self.consolidate_button.clicked.connect(self.consolidate_palette)
+        self.consolidate_button.setToolTip("Merge colors that are perceptually almost identical")
+        self.button_panel.addWidget(self.consolidate_button)
+        self._consolidate_task = None
+
+        # WCAG/APCA contrast between every pair of colors
+        self.contrast_button = QPushButton("Contrast...")
+        self.contrast_button.clicked.connect(self.show_contrast)
+        self.contrast_button.setToolTip("Check which color pairs have enough contrast for text")
+        self.button_panel.addWidget(self.contrast_button)
+        self._contrast_window = None
+
+        # Duplicate suppression toggle
+        self.dedupe_checkbox = QCheckBox("No duplicates")
+        self.dedupe_checkbox.setToolTip("Skip colors that are already in the palette")
+        self.dedupe_checkbox.setChecked(self.store.dedupe)
+        self.dedupe_checkbox.toggled.connect(self.set_dedupe)
+        self.button_panel.addWidget(self.dedupe_checkbox)
+        
+        # Export button
+        self.export_button = QPushButton("Export")
+        self.export_button.clicked.connect(self.show_export_menu)
+        self.export_button.setToolTip("Export palette to file")
+        self.button_panel.addWidget(self.export_button)
+        
+        # Library button: save this palette to, or search, the local palette library
+        self.library_button = QPushButton("Library")
+        self.library_button.setToolTip("Save the palette to the palette library, or search it by color")
+        self.library_menu = QMenu(self)
+        self.library_menu.addAction("Save to Library...", self.save_to_library)
+        self.library_menu.addAction("Open Library...", self.show_library)
+        self.library_button.setMenu(self.library_menu)
+        self.button_panel.addWidget(self.library_button)
+        self.library_path = None # library.default_path() unless set
+        self._library_window = None
+        self._save_task = None
+
+        # Add button panel to main layout
+        self.main_layout.addLayout(self.button_panel)
+
+        # Status line for long-running imports/exports, hidden when idle
+        self.status_label = QLabel()
+        self.status_label.hide()
+        self.main_layout.addWidget(self.status_label)
+        self._import_task = None
+        
+        # Create export menu, one action per supported format
+        self.export_menu = QMenu(self)
+        self.export_actions = {}
+        for export_format in FORMATS.values():
+            action = QAction(f"Export as {export_format.label}", self)
+            action.triggered.connect(functools.partial(self.export_palette, export_format.key))
+            self.export_menu.addAction(action)
+            self.export_actions[export_format.key] = action
+        self.export_json_action = self.export_actions["json"]
+        self.export_csv_action = self.export_actions["csv"]
+        self._export_task = None
+
+
+    def show_export_menu(self):
+        """Shows the export menu dropdown."""
+        if not len(self.model):
+            QMessageBox.warning(self, "Empty Palette", "Cannot export an empty palette.")
+            return
+            
+        # Position the menu under the export button
+        self.export_menu.exec(self.export_button.mapToGlobal(self.export_button.rect().bottomLeft()))
+
+    def export_as_json(self):
+        """Export palette as JSON file."""
+        self.export_palette("json")
+    
+    def export_as_csv(self):
+        """Export palette as CSV file."""
+        self.export_palette("csv")
+
+    def export_palette(self, fmt):
+        """Asks for a destination and exports the palette in the background."""
+        if not len(self.store):
+            return
+        if self._export_task is not None:
+            QMessageBox.information(self, "Export in Progress", "A palette export is already running.")
+            return
+        export_format = FORMATS[fmt]
+            
+        # Create default filename with timestamp
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        default_filename = f"color_palette_{timestamp}{export_format.extension}"
+        
+        filename, _ = QFileDialog.getSaveFileName(
+            self, f"Export Palette as {export_format.label}", default_filename, export_format.file_filter
+        )
+        
+        if not filename:
+            return  # User cancelled
+        self.export_file(filename, fmt)
+
+    def export_file(self, filename, fmt):
+        """Writes a snapshot of the palette to filename on a worker thread."""
+        signals = ExportSignals(self)
+        signals.progress.connect(self._on_export_progress, Qt.ConnectionType.QueuedConnection)
+        signals.finished.connect(self._on_export_finished, Qt.ConnectionType.QueuedConnection)
+        signals.failed.connect(self._on_export_failed, Qt.ConnectionType.QueuedConnection)
+        # The snapshot costs 4 bytes per color; formatting happens chunk by chunk
+        self._export_task = ExportTask(self.store[:], filename, fmt, signals)
+        self.export_button.setEnabled(False)
+        self._show_status(f"Exporting {os.path.basename(filename)}...")
+        QThreadPool.globalInstance().start(self._export_task)
+
+    def _on_export_progress(self, done, total):
+        self._show_status(f"Exporting... {done * 100 // max(total, 1)}%")
+
+    def _on_export_finished(self, filename):
+        self._end_export()
+        self._show_export_success_message(filename)
+
+    def _on_export_failed(self, message):
+        self._end_export()
+        QMessageBox.critical(self, "Export Error", f"Failed to export palette: {message}")
+
+    def _end_export(self):
+        self._export_task = None
+        self.export_button.setEnabled(True)
+        self.status_label.hide()
+    
+    def _show_export_success_message(self, filepath):
+        """Show success message after export."""
+        msg = QMessageBox(self)
+        msg.setIcon(QMessageBox.Icon.Information)
+        msg.setWindowTitle("Export Successful")
+        msg.setText("Palette exported successfully!")
+        msg.setInformativeText(f"File saved to:\n{filepath}")
+        msg.exec()
+
+    @property
+    def colors(self):
+        """The palette's PaletteStore of packed 0xAARRGGBB colors."""
+        return self.store
+
+    def add_color(self, color: QColor):
+        """Adds a color to the palette; returns False if skipped as a duplicate."""
+        if not isinstance(color, QColor) or not color.isValid():
+            tracing.warning("Invalid color passed to palette")
+            return False
+
+        if not self.model.append(color.rgba()):
+            return False
+        self._follow_newest = True # Scroll to bottom (shows newest color)
+        return True
+
+    def add_colors(self, colors):
+        """Adds many colors (QColors, packed 0xRRGGBB ints or a uint32 array) in one model update."""
+        if isinstance(colors, array) and colors.typecode == 'I':
+            # Already packed, e.g. an import chunk
+            values = np.frombuffer(colors, dtype=np.uint32) | np.uint32(OPAQUE)
+        elif isinstance(colors, np.ndarray):
+            # Packed 0xRRGGBB, e.g. a multi-sample grab
+            values = colors.astype(np.uint32) | np.uint32(OPAQUE)
+        else:
+            values = [color.rgba() if isinstance(color, QColor) else opaque(int(color))
+                      for color in colors if not isinstance(color, QColor) or color.isValid()]
+
+        added = self.model.extend(values)
+        if added:
+            self._follow_newest = True
+        return added
+
+    def remove_selected(self):
+        """Removes the selected color."""
+        index = self.list_view.currentIndex()
+        if index.isValid():
+            self.model.remove(index.row())
+
+    def move_selected(self, step):
+        """Moves the selected color step rows up (negative) or down, keeping it selected."""
+        index = self.list_view.currentIndex()
+        if not index.isValid():
+            return
+        row = index.row()
+        target = row + step
+        if not 0 <= target < len(self.model):
+            return
+        # moveRows counts the destination before the move: moving down lands before target + 1
+        self.model.move_rows(row, 1, target + 1 if step > 0 else target)
+        self.list_view.setCurrentIndex(self.model.index(target))
+
+    def set_dedupe(self, enabled: bool):
+        """Skips colors that are already in the palette when adding."""
+        self.store.dedupe = enabled
+
+    def import_palette(self):
+        """Asks for a CSV/JSON palette file and appends its colors in the background."""
+        if self._import_task is not None:
+            QMessageBox.information(self, "Import in Progress", "A palette import is already running.")
+            return
+
+        filename, _ = QFileDialog.getOpenFileName(
+            self, "Import Palette", "", "Palette Files (*.csv *.json);;CSV Files (*.csv);;JSON Files (*.json)"
+        )
+        if not filename:
+            return  # User cancelled
+        self.import_file(filename)
+
+    def import_file(self, filename):
+        """Streams colors from filename into the palette without blocking the UI."""
+        signals = ImportSignals(self)
+        signals.chunk_ready.connect(self._on_import_chunk, Qt.ConnectionType.QueuedConnection)
+        signals.finished.connect(self._on_import_finished, Qt.ConnectionType.QueuedConnection)
+        signals.failed.connect(self._on_import_failed, Qt.ConnectionType.QueuedConnection)
+        self._import_task = ImportTask(filename, signals)
+        self.import_button.setEnabled(False)
+        self._show_status(f"Importing {os.path.basename(filename)}...")
+        QThreadPool.globalInstance().start(self._import_task)
+
+    def _on_import_chunk(self, task, chunk):
+        if task is self._import_task:
+            with self.history.edit("Import Palette", merge_key=task): # One undo step per import
+                self.add_colors(chunk)
+            self._show_status(f"Importing... {task.count:,} colors")
+
+    def _on_import_finished(self, task, count):
+        if task is not self._import_task:
+            return
+        self._end_import()
+        self._show_status(f"Imported {count:,} colors", 3000)
+
+    def _on_import_failed(self, task, message):
+        if task is not self._import_task:
+            return
+        self._end_import()
+        QMessageBox.critical(self, "Import Error", f"Failed to import palette: {message}")
+
+    def _end_import(self):
+        self._import_task = None
+        self.import_button.setEnabled(True)
+        self.status_label.hide()
+
+    def _cancel_import(self):
+        if self._import_task is not None:
+            self._import_task.cancelled = True
+            self._end_import()
+
+    def _show_status(self, text, timeout_ms=0):
+        """Shows text under the palette; hides it again after timeout_ms if given."""
+        self.status_label.setText(text)
+        self.status_label.show()
+        if timeout_ms:
+            QTimer.singleShot(timeout_ms, functools.partial(self._clear_status, text))
+
+    def _clear_status(self, text):
+        if self.status_label.text() == text: # Not replaced by a newer message
+            self.status_label.hide()
+
+    def _on_scroll_range_changed(self, minimum, maximum):
+        if self._follow_newest:
+            self.list_view.verticalScrollBar().setValue(maximum)
+
+    def _on_user_scroll(self, action):
+        self._follow_newest = False
+
+    def _on_swatch_clicked(self, index):
+        """Copies the clicked row's hex code to the clipboard."""
+        self.copy_to_clipboard(index.data(Qt.ItemDataRole.DisplayRole))
+
+    def copy_to_clipboard(self, text):
+        """Copies the provided text to the system clipboard."""
+        clipboard = QGuiApplication.clipboard()
+        if clipboard:
+            clipboard.setText(text)
+            tracing.info(f"Copied to clipboard: {text}")
+            # Optional: Show temporary status message
+            parent_widget = self.parent()
+            # Check type first, then get and check status bar
+            if isinstance(parent_widget, QMainWindow):
+                 status_bar = parent_widget.statusBar()
+                 if status_bar: # Check if statusBar() returned a valid object
+                     status_bar.showMessage(f"Copied: {text}", 2000) # Show for 2 seconds
+        else:
+            tracing.warning("Error: Could not access clipboard.")
+
+
+    def consolidate_palette(self):
+        """Asks for a ΔE threshold and merges near-duplicate colors in the background."""
+        if len(self.store) < 2 or self._consolidate_task is not None:
+            return
+        dialog = ConsolidateDialog(self)
+        if dialog.exec() != QDialog.DialogCode.Accepted:
+            return
+        self.consolidate(dialog.threshold(), dialog.representative())
+
+    def consolidate(self, threshold, representative="first"):
+        """Merges colors within threshold ΔE of each other on a worker thread."""
+        signals = ConsolidateSignals(self)
+        signals.finished.connect(self._on_consolidate_finished, Qt.ConnectionType.QueuedConnection)
+        signals.failed.connect(self._on_consolidate_failed, Qt.ConnectionType.QueuedConnection)
+        self._consolidate_task = ConsolidateTask(self.store[:], threshold, representative, signals)
+        self.consolidate_button.setEnabled(False)
+        self._show_status(f"Merging colors within ΔE {threshold:g}...")
+        QThreadPool.globalInstance().start(self._consolidate_task)
+
+    def _on_consolidate_finished(self, task, result, report):
+        self._consolidate_task = None
+        self.consolidate_button.setEnabled(True)
+        self.status_label.hide()
+        if not np.array_equal(self.store.array(), task.colors):
+            QMessageBox.information(self, "Merge Similar Colors",
+                                    "The palette changed while merging; nothing was merged.")
+            return
+        before, after = len(task.colors), len(result.colors)
+        if after == before:
+            self._show_status(f"No colors within ΔE {task.threshold:g} of each other", 3000)
+            return
+        with self.history.edit("Merge Similar Colors"):
+            self.model.reset_colors(result.colors | np.uint32(OPAQUE))
+
+        msg = QMessageBox(self)
+        msg.setIcon(QMessageBox.Icon.Information)
+        msg.setWindowTitle("Merge Similar Colors")
+        msg.setText(f"Merged {before:,} colors into {after:,}.")
+        removed = before - after
+        msg.setInformativeText(f"{removed:,} near-duplicate {'color was' if removed == 1 else 'colors were'} "
+                               f"merged (within ΔE {task.threshold:g}), keeping the "
+                               f"{ConsolidateDialog.REPRESENTATIVE_LABELS[task.representative].lower()} "
+                               "color of each group.")
+        msg.setDetailedText("\n".join(report))
+        msg.exec()
+
+    def _on_consolidate_failed(self, task, message):
+        self._consolidate_task = None
+        self.consolidate_button.setEnabled(True)
+        self.status_label.hide()
+        QMessageBox.critical(self, "Merge Error", f"Failed to merge colors: {message}")
+
+    # --- Contrast ---
+    def show_contrast(self):
+        """Opens the contrast report for a snapshot of the palette; built on first use."""
+        if len(self.store) < 2:
+            QMessageBox.information(self, "Palette Contrast", "Add at least two colors to compare.")
+            return
+        if self._contrast_window is None:
+            from contrast_window import ContrastWindow
+            self._contrast_window = ContrastWindow() # Top-level, like this window
+        self._contrast_window.show_contrast(self.store[:])
+
+    # --- Palette Library ---
+    def save_to_library(self):
+        """Asks for a name and tags, then stores the palette in the library in the background."""
+        from library_window import SaveToLibraryDialog
+
+        if not len(self.store):
+            QMessageBox.warning(self, "Empty Palette", "Cannot save an empty palette.")
+            return
+        if self._save_task is not None:
+            return
+        dialog = SaveToLibraryDialog(f"Palette {datetime.now():%Y-%m-%d %H:%M}", self)
+        if dialog.exec() != QDialog.DialogCode.Accepted or not dialog.name():
+            return
+        self.save_to_library_as(dialog.name(), dialog.tags())
+
+    def save_to_library_as(self, name, tags=()):
+        """Stores a snapshot of the palette in the library as name on a worker thread."""
+        from library_window import SaveSignals, SaveTask
+
+        signals = SaveSignals(self)
+        signals.finished.connect(self._on_library_saved, Qt.ConnectionType.QueuedConnection)
+        signals.failed.connect(self._on_library_save_failed, Qt.ConnectionType.QueuedConnection)
+        self._save_task = SaveTask(self.store[:], name, list(tags), self.library_path, signals)
+        self.library_button.setEnabled(False)
+        self._show_status(f"Saving {name} to the library...")
+        QThreadPool.globalInstance().start(self._save_task)
+
+    def _on_library_saved(self, task, palette_id):
+        self._save_task = None
+        self.library_button.setEnabled(True)
+        self._show_status(f"Saved {len(task.colors):,} colors to the library as {task.name}", 3000)
+        if self._library_window is not None and self._library_window.isVisible():
+            self._library_window.reload_tags()
+            self._library_window.refresh()
+
+    def _on_library_save_failed(self, task, message):
+        self._save_task = None
+        self.library_button.setEnabled(True)
+        self.status_label.hide()
+        QMessageBox.critical(self, "Library Error", f"Failed to save the palette: {message}")
+
+    def show_library(self, color: QColor | None = None):
+        """Opens the library window, searching for color if given; built on first use."""
+        if self._library_window is None:
+            from library_window import LibraryWindow
+            self._library_window = LibraryWindow(self.library_path) # Top-level, like this window
+            self._library_window.palette_opened.connect(self.open_library_palette)
+        self._library_window.show_library(color if isinstance(color, QColor) else None)
+
+    def open_library_palette(self, colors, name, append=False):
+        """Replaces the palette with colors from the library (or appends them); Undo reverts either."""
+        if append:
+            with self.history.edit(f"Append {name}"):
+                added = self.add_colors(colors)
+            self._show_status(f"Appended {added:,} colors from {name}", 3000)
+            return
+        self._cancel_import()
+        with self.history.edit(f"Open {name}"):
+            self.model.reset_colors(colors | np.uint32(OPAQUE))
+        self._show_status(f"Opened {name} ({len(colors):,} colors)", 3000)
+
+    def clear_palette(self):
+        """Removes all colors from the palette display; Undo brings them back."""
+        count = len(self.model)
+        if not count:
+            return
+        self._cancel_import()
+        self.model.clear()
+        shortcut = self.undo_action.shortcut().toString(QKeySequence.SequenceFormat.NativeText)
+        self._show_status(f"Cleared {count:,} {'color' if count == 1 else 'colors'} ({shortcut} to undo)", 5000)
+
+
+# --- Palette Consolidation ---
+class ConsolidateDialog(QDialog):
+    """Asks for the merge threshold and which color represents each merged group."""
+    REPRESENTATIVE_LABELS = {"first": "First added", "mean": "Average", "frequent": "Most frequent"}
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        from consolidate import DEFAULT_THRESHOLD, REPRESENTATIVES
+
+        self.setWindowTitle("Merge Similar Colors")
+        layout = QFormLayout(self)
+        self.threshold_box = QDoubleSpinBox()
+        self.threshold_box.setRange(0.1, 50.0)
+        self.threshold_box.setSingleStep(0.5)
+        self.threshold_box.setValue(DEFAULT_THRESHOLD)
+        self.threshold_box.setToolTip("CIE76 color difference; about 2.3 is just noticeable")
+        layout.addRow("Merge within ΔE:", self.threshold_box)
+        self.representative_box = QComboBox()
+        for representative in REPRESENTATIVES:
+            self.representative_box.addItem(self.REPRESENTATIVE_LABELS[representative], representative)
+        layout.addRow("Keep:", self.representative_box)
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+
+    def threshold(self):
+        return self.threshold_box.value()
+
+    def representative(self):
+        return self.representative_box.currentData()
+
+
+class ConsolidateSignals(QObject):
+    """Signals emitted by ConsolidateTask; delivered to the GUI thread as queued calls."""
+    finished = pyqtSignal(object, object, object) # task, consolidate.Consolidation, report lines
+    failed = pyqtSignal(object, str) # task, error message
+
+
+class ConsolidateTask(QRunnable):
+    """Clusters a palette snapshot on a worker thread."""
+    def __init__(self, colors, threshold, representative, signals):
+        super().__init__()
+        self.colors = colors
+        self.threshold = threshold
+        self.representative = representative
+        self.signals = signals
+
+    def run(self):
+        from consolidate import consolidate, merge_report
+        try:
+            with tracing.span("palette.consolidate", colors=len(self.colors), threshold=self.threshold):
+                result = consolidate(self.colors, self.threshold, self.representative)
+                report = merge_report(result, self.colors)
+        except Exception as e: # Escaping the worker thread would abort the app
+            self.signals.failed.emit(self, str(e) or type(e).__name__)
+            return
+        self.signals.finished.emit(self, result, report)
+
+
+# --- Palette Export ---
+class ExportSignals(QObject):
+    """Signals emitted by ExportTask; delivered to the GUI thread as queued calls."""
+    progress = pyqtSignal(int, int) # colors written, total
+    finished = pyqtSignal(str) # destination path
+    failed = pyqtSignal(str) # error message
+
+
+class ExportTask(QRunnable):
+    """Streams a palette snapshot to disk on a worker thread."""
+    def __init__(self, colors, filename, fmt, signals):
+        super().__init__()
+        self.colors = colors
+        self.filename = filename
+        self.fmt = fmt
+        self.signals = signals
+
+    def run(self):
+        try:
+            with tracing.span("palette.export", format=self.fmt, colors=len(self.colors)):
+                export_palette(self.colors, self.filename, self.fmt, progress=self.signals.progress.emit)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.finished.emit(self.filename)
+
+
+# --- Palette Import ---
+class ImportSignals(QObject):
+    """Signals emitted by ImportTask; delivered to the GUI thread as queued calls."""
+    chunk_ready = pyqtSignal(object, object) # task, array('I') of packed colors
+    finished = pyqtSignal(object, int) # task, total colors
+    failed = pyqtSignal(object, str) # task, error message
+
+
+class ImportTask(QRunnable):
+    """Parses a palette file on a worker thread and hands it over in chunks."""
+    def __init__(self, filename, signals):
+        super().__init__()
+        self.filename = filename
+        self.signals = signals
+        self.count = 0
+        self.cancelled = False
+
+    def run(self):
+        try:
+            with tracing.span("palette.import") as span:
+                for chunk in iter_chunks(iter_palette_colors(self.filename)):
+                    if self.cancelled:
+                        return
+                    self.count += len(chunk)
+                    self.signals.chunk_ready.emit(self, chunk)
+                span.set(colors=self.count)
+        except Exception as e: # Escaping the worker thread would abort the app
+            self.signals.failed.emit(self, str(e) or type(e).__name__)
+            return
+        self.signals.finished.emit(self, self.count)
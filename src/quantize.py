@@ -0,0 +1,98 @@
+"""Palette extraction: reduce an image's pixels to K representative colors.
+
+Two methods, both on a strided pixel subsample:
+    median-cut: repeatedly split the box with the widest channel range times
+        population at its median (RGB), then average each box.
+    k-means: Lloyd iterations in OKLab, seeded with the median-cut palette so
+        results are deterministic and converge in a few rounds.
+
+Results are lists of (packed 0xRRGGBB, pixel count), most common first. This
+module has no Qt dependency.
+"""
+import math
+
+import numpy as np
+
+from colorspace import convert, pack_rgb
+
+METHODS = ("median-cut", "kmeans")
+MAX_PIXELS = 1 << 16 # Pixels sampled per image
+KMEANS_ITERATIONS = 16
+
+
+def subsample(pixels, max_pixels=MAX_PIXELS):
+    """Returns an (N, 3) uint8 array of at most about max_pixels pixels from (H, W, 3) pixels."""
+    height, width = pixels.shape[:2]
+    step = max(1, math.ceil(math.sqrt(height * width / max_pixels))) if max_pixels else 1
+    return np.ascontiguousarray(pixels[::step, ::step]).reshape(-1, 3)
+
+
+def median_cut(flat, count):
+    """Median-cut palette of (N, 3) uint8 pixels; returns (rgb (M, 3) uint8, populations)."""
+    if not len(flat):
+        return np.empty((0, 3), dtype=np.uint8), np.empty(0, dtype=np.int64)
+
+    def score(box):
+        return int(np.ptp(box, axis=0).max()) * len(box) if len(box) > 1 else 0
+
+    boxes = [flat]
+    scores = [score(flat)]
+    while len(boxes) < count:
+        best = int(np.argmax(scores))
+        if scores[best] == 0:
+            break # Every remaining box holds a single color
+        box = boxes.pop(best)
+        scores.pop(best)
+        channel = int(np.argmax(np.ptp(box, axis=0)))
+        middle = len(box) // 2
+        order = np.argpartition(box[:, channel], middle)
+        for half in (box[order[:middle]], box[order[middle:]]):
+            boxes.append(half)
+            scores.append(score(half))
+
+    means = np.array([box.mean(axis=0) for box in boxes])
+    return np.rint(means).astype(np.uint8), np.array([len(box) for box in boxes], dtype=np.int64)
+
+
+def _nearest_centroid(points, centroids):
+    # |p - c|^2 = |p|^2 - 2 p.c + |c|^2; |p|^2 doesn't change the argmin
+    distances = (centroids ** 2).sum(axis=1) - 2 * points @ centroids.T
+    return np.argmin(distances, axis=1)
+
+
+def kmeans(flat, count, iterations=KMEANS_ITERATIONS):
+    """k-means palette of (N, 3) uint8 pixels in OKLab; returns (rgb (M, 3) uint8, populations)."""
+    seeds, _ = median_cut(flat, count)
+    if not len(seeds):
+        return seeds, np.empty(0, dtype=np.int64)
+    points = convert(pack_rgb(flat), "packed", "oklab")
+    centroids = convert(pack_rgb(seeds), "packed", "oklab")
+
+    for _ in range(iterations):
+        labels = _nearest_centroid(points, centroids)
+        populations = np.bincount(labels, minlength=len(centroids))
+        sums = np.stack([np.bincount(labels, weights=points[:, axis], minlength=len(centroids))
+                         for axis in range(3)], axis=1)
+        occupied = populations > 0
+        updated = centroids.copy()
+        updated[occupied] = sums[occupied] / populations[occupied, None]
+        converged = np.allclose(updated, centroids, atol=1e-5)
+        centroids = updated
+        if converged:
+            break
+
+    labels = _nearest_centroid(points, centroids)
+    populations = np.bincount(labels, minlength=len(centroids))
+    occupied = populations > 0
+    rgb = convert(convert(centroids[occupied], "oklab", "packed"), "packed", "rgb")
+    return rgb.astype(np.uint8), populations[occupied]
+
+
+def extract_palette(pixels, count, method="median-cut", max_pixels=MAX_PIXELS):
+    """Returns up to count (packed 0xRRGGBB, population) pairs for (H, W, 3) pixels, most common first."""
+    if method not in METHODS:
+        raise ValueError(f"Unknown extraction method: {method!r}")
+    flat = subsample(pixels, max_pixels)
+    rgb, populations = (median_cut if method == "median-cut" else kmeans)(flat, count)
+    order = np.argsort(-populations, kind="stable")
+    return list(zip(pack_rgb(rgb[order]).tolist(), populations[order].tolist()))
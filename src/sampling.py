@@ -0,0 +1,200 @@
+"""Region statistics for captured screen areas.
+
+Reductions operate on an (H, W, 3) uint8 NumPy view of the QImage's own
+pixel buffer, so a capture is reduced without copying or per-pixel Python
+loops.
+"""
+import math
+from collections import namedtuple
+from enum import Enum
+
+import numpy as np
+from PyQt6.QtCore import QRect, QSize
+from PyQt6.QtGui import QImage
+
+
+class SampleMode(Enum):
+    """Statistic used to reduce a captured region to a single color."""
+    CENTER = "center"
+    MEAN = "mean"
+    MEDIAN = "median"
+    MODE = "mode"
+    DOMINANT = "dominant"
+
+    @property
+    def label(self):
+        return self.value.capitalize()
+
+
+# Formats whose 32-bit pixels can be viewed in place, mapped to the slice
+# that selects (R, G, B) from a pixel. ARGB32 variants are stored as BGRA on
+# little-endian machines and ARGB on big-endian ones.
+_BGRA = slice(2, None, -1) if np.little_endian else slice(1, 4)
+_RGBA = slice(0, 3)
+_DIRECT_FORMATS = {
+    QImage.Format.Format_RGB32: _BGRA,
+    QImage.Format.Format_ARGB32: _BGRA,
+    QImage.Format.Format_ARGB32_Premultiplied: _BGRA,
+    QImage.Format.Format_RGBX8888: _RGBA,
+    QImage.Format.Format_RGBA8888: _RGBA,
+    QImage.Format.Format_RGBA8888_Premultiplied: _RGBA,
+}
+
+# Many colors from one capture: user-placed points, the centres of a
+# rows × columns grid over the selection, or its `count` dominant colors.
+MULTI_KINDS = ("points", "grid", "dominant")
+MultiSample = namedtuple("MultiSample", "kind rows columns count", defaults=(8, 8, 8))
+
+
+# Bits kept per channel when bucketing colors for DOMINANT.
+_BUCKET_BITS = 5
+
+# Regions above this many pixels are reduced from a strided subsample.
+MAX_SAMPLE_PIXELS = 1 << 20
+
+
+def image_to_rgb_view(image: QImage):
+    """Returns (pixels, image) where pixels is an (H, W, 3) view of image's bits.
+
+    The returned image must be kept alive for as long as the view is used;
+    it is the input itself unless a format conversion was unavoidable.
+    """
+    channels = _DIRECT_FORMATS.get(image.format())
+    if channels is None:
+        image = image.convertToFormat(QImage.Format.Format_RGB32)
+        channels = _BGRA
+
+    height, width = image.height(), image.width()
+    bytes_per_line = image.bytesPerLine()
+    bits = image.constBits()
+    bits.setsize(image.sizeInBytes())
+    raw = np.frombuffer(bits, dtype=np.uint8).reshape(height, bytes_per_line)
+    pixels = raw[:, :width * 4].reshape(height, width, 4)
+    # Fancy indexing would copy; a strided slice keeps this a view.
+    return pixels[:, :, channels], image
+
+
+def decode_region(width, height, mode: SampleMode, max_pixels=MAX_SAMPLE_PIXELS):
+    """Returns (clip, size): the part of a width × height capture that reducing it with mode reads,
+    and the smallest size to decode that part at.
+
+    CENTER reads one pixel. The other statistics read every pixel of regions
+    up to max_pixels and a regular subsample above that, so an evenly spaced
+    (nearest-neighbour) decode at size yields as many samples as
+    reduce_region's strided grid would, without the full-size buffer.
+    """
+    if mode is SampleMode.CENTER:
+        return QRect(width // 2, height // 2, 1, 1), QSize(1, 1)
+    clip = QRect(0, 0, width, height)
+    if max_pixels and width * height > max_pixels:
+        step = math.ceil(math.sqrt(width * height / max_pixels))
+        # Rounded down, so the decoded image is not strided a second time
+        return clip, QSize(max(1, width // step), max(1, height // step))
+    return clip, clip.size()
+
+
+def reduce_region(pixels, mode: SampleMode, max_pixels=MAX_SAMPLE_PIXELS):
+    """Reduces an (H, W, 3) uint8 array to an (r, g, b) tuple using mode.
+
+    Regions larger than max_pixels are read on a regular strided grid, which
+    is still a view; pass None to always use every pixel.
+    """
+    height, width = pixels.shape[:2]
+    if height == 0 or width == 0:
+        return None
+    if mode is SampleMode.CENTER:
+        r, g, b = pixels[height // 2, width // 2]
+        return int(r), int(g), int(b)
+
+    if max_pixels and height * width > max_pixels:
+        step = math.ceil(math.sqrt(height * width / max_pixels))
+        pixels = pixels[::step, ::step]
+    flat = pixels.reshape(-1, 3)
+    if mode is SampleMode.MEAN:
+        return _mean(flat)
+    if mode is SampleMode.MEDIAN:
+        return _median(flat)
+    if mode is SampleMode.MODE:
+        return _mode(flat)
+    if mode is SampleMode.DOMINANT:
+        return _dominant(flat)
+    raise ValueError(f"Unknown sample mode: {mode}")
+
+
+def _histograms(flat):
+    # bincount is several times faster than a widening sum over uint8 data
+    return [np.bincount(flat[:, channel], minlength=256) for channel in range(3)]
+
+
+def _mean(flat):
+    levels = np.arange(256)
+    return tuple(int(round(int(counts @ levels) / len(flat))) for counts in _histograms(flat))
+
+
+def _median(flat):
+    # Histogram medians are exact for uint8 and avoid sorting the region.
+    half = (len(flat) + 1) // 2
+    return tuple(int(np.searchsorted(np.cumsum(counts), half)) for counts in _histograms(flat))
+
+
+def _pack(flat):
+    return (flat[:, 0].astype(np.uint32) << 16) | (flat[:, 1].astype(np.uint32) << 8) | flat[:, 2]
+
+
+def _bucket_keys(flat):
+    shift = 8 - _BUCKET_BITS
+    q = (flat >> shift).astype(np.uint32)
+    return (q[:, 0] << (2 * _BUCKET_BITS)) | (q[:, 1] << _BUCKET_BITS) | q[:, 2]
+
+
+def _mode(flat):
+    # One sort of the packed colors; equal colors then form runs, the longest
+    # of which is the mode (the smallest color on a tie)
+    colors = np.sort(_pack(flat))
+    starts = np.flatnonzero(np.concatenate(([True], colors[1:] != colors[:-1])))
+    lengths = np.diff(np.append(starts, len(colors)))
+    best_color = int(colors[starts[int(np.argmax(lengths))]])
+    return (best_color >> 16) & 0xFF, (best_color >> 8) & 0xFF, best_color & 0xFF
+
+
+def _dominant(flat):
+    # Mean of the most populated bucket: the largest patch of similar color.
+    keys = _bucket_keys(flat)
+    bucket = int(np.argmax(np.bincount(keys)))
+    return _mean(flat[keys == bucket])
+
+
+def grid_positions(height, width, rows, columns):
+    """Returns (ys, xs) index arrays of the centres of a rows × columns grid, row by row."""
+    ys = ((2 * np.arange(rows) + 1) * height) // (2 * rows)
+    xs = ((2 * np.arange(columns) + 1) * width) // (2 * columns)
+    return np.repeat(ys, columns), np.tile(xs, rows)
+
+
+def sample_points(pixels, ys, xs):
+    """Packed 0xRRGGBB uint32 colors of (H, W, 3) pixels at the given positions, gathered in one pass."""
+    ys = np.clip(np.asarray(ys, dtype=np.intp), 0, pixels.shape[0] - 1)
+    xs = np.clip(np.asarray(xs, dtype=np.intp), 0, pixels.shape[1] - 1)
+    return _pack(pixels[ys, xs])
+
+
+def reduce_multi(pixels, spec: MultiSample, points=None):
+    """Reduces (H, W, 3) pixels to many packed 0xRRGGBB colors as described by spec.
+
+    points is a sequence of (x, y) pixel positions for the "points" kind.
+    """
+    height, width = pixels.shape[:2]
+    if height == 0 or width == 0:
+        return np.empty(0, dtype=np.uint32)
+    if spec.kind == "points":
+        if not points:
+            return np.empty(0, dtype=np.uint32)
+        xs, ys = zip(*points)
+        return sample_points(pixels, ys, xs)
+    if spec.kind == "grid":
+        rows, columns = min(spec.rows, height), min(spec.columns, width)
+        return sample_points(pixels, *grid_positions(height, width, rows, columns))
+    if spec.kind == "dominant":
+        from quantize import extract_palette
+        return np.array([rgb for rgb, _ in extract_palette(pixels, spec.count)], dtype=np.uint32)
+    raise ValueError(f"Unknown multi-sample kind: {spec.kind!r}")
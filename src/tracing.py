@@ -0,0 +1,208 @@
+"""Lightweight tracing: named spans recorded into an in-memory ring buffer.
+
+Tracing is off by default. span() then returns one shared no-op context
+manager, so instrumented code costs a function call and a global lookup.
+enable() starts recording complete spans and instant events into a bounded
+deque (the oldest are dropped first). Events can be recorded from any
+thread. dump() writes the buffer as plain JSON records or in Chrome trace
+format, which chrome://tracing and Perfetto open.
+
+info() and warning() replace the old print() diagnostics. Both record an
+instant event. Warnings always go to stderr; info only when verbose is set.
+This module imports only the standard library.
+"""
+import collections
+import os
+import statistics
+import sys
+import threading
+import time
+
+DEFAULT_CAPACITY = 100_000 # Events kept; about 20 MB at most
+FORMATS = ("chrome", "json")
+
+verbose = False # Print info() messages too
+
+_events = None # deque of (phase, name, start ns, duration ns, thread id, args) while enabled
+_recorded = 0
+_thread_names = {}
+_epoch_ns = time.perf_counter_ns()
+
+
+class _NullSpan:
+    """Stands in for a span while tracing is off."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        _record("X", self.name, self.start, end - self.start, self.args)
+        return False
+
+    def set(self, **args):
+        """Attaches arguments known only once the span is running (e.g. a result size)."""
+        self.args.update(args)
+
+
+def _record(phase, name, start_ns, duration_ns, args):
+    global _recorded
+    events = _events
+    if events is None:
+        return
+    tid = threading.get_native_id()
+    if tid not in _thread_names:
+        thread = threading.current_thread().name
+        # Threads Python didn't start (QThreadPool workers) are only "Dummy-N"
+        _thread_names[tid] = f"Worker {tid}" if thread.startswith("Dummy") else thread
+    events.append((phase, name, start_ns, duration_ns, tid, args))
+    _recorded += 1 # Only a statistic; a lost update under contention is harmless
+
+
+# --- Recording ---
+def enable(capacity=DEFAULT_CAPACITY):
+    """Starts recording into a fresh ring buffer of capacity events."""
+    global _events, _recorded, _epoch_ns
+    _thread_names.clear()
+    _recorded = 0
+    _epoch_ns = time.perf_counter_ns()
+    _events = collections.deque(maxlen=capacity)
+
+
+def disable():
+    """Stops recording; the events recorded so far are discarded."""
+    global _events
+    _events = None
+
+
+def is_enabled():
+    return _events is not None
+
+
+def span(name, **args):
+    """Context manager timing the enclosed block as a span called name."""
+    if _events is None:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+
+def add_span(name, start_ns, end_ns, **args):
+    """Records a span timed elsewhere, from time.perf_counter_ns() readings."""
+    if _events is not None:
+        _record("X", name, start_ns, end_ns - start_ns, args)
+
+
+def instant(name, **args):
+    """Records a point-in-time event."""
+    if _events is not None:
+        _record("i", name, time.perf_counter_ns(), 0, args)
+
+
+def info(message, **args):
+    """A diagnostic message: recorded as a "log" event, printed only when verbose."""
+    if _events is not None:
+        _record("i", "log", time.perf_counter_ns(), 0, dict(args, message=message))
+    if verbose:
+        print(message)
+
+
+def warning(message, **args):
+    """A problem worth seeing: recorded as a "warning" event and printed to stderr."""
+    if _events is not None:
+        _record("i", "warning", time.perf_counter_ns(), 0, dict(args, message=message))
+    print(message, file=sys.stderr)
+
+
+def events():
+    """A snapshot of the buffered events, oldest first."""
+    return list(_events) if _events is not None else []
+
+
+def dropped():
+    """Events recorded since enable() that the ring buffer has already discarded."""
+    return max(0, _recorded - len(_events)) if _events is not None else 0
+
+
+# --- Output ---
+def _category(name):
+    return name.split(".", 1)[0]
+
+
+def to_chrome(snapshot=None):
+    """The events as a Chrome trace ({"traceEvents": [...]}) with microsecond timestamps."""
+    snapshot = events() if snapshot is None else snapshot
+    pid = os.getpid()
+    trace = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+             for tid, name in list(_thread_names.items())]
+    for phase, name, start, duration, tid, args in snapshot:
+        event = {"name": name, "cat": _category(name), "ph": phase, "ts": (start - _epoch_ns) / 1000,
+                 "pid": pid, "tid": tid, "args": args}
+        if phase == "X":
+            event["dur"] = duration / 1000
+        else:
+            event["s"] = "t" # Thread-scoped instant
+        trace.append(event)
+    return {"traceEvents": trace, "displayTimeUnit": "ms", "otherData": {"dropped": dropped()}}
+
+
+def to_records(snapshot=None):
+    """The events as plain records with millisecond times since enable()."""
+    snapshot = events() if snapshot is None else snapshot
+    records = [{"type": "span" if phase == "X" else "instant", "name": name,
+                "start_ms": round((start - _epoch_ns) / 1e6, 4), "duration_ms": round(duration / 1e6, 4),
+                "thread": _thread_names.get(tid, str(tid)), "args": args}
+               for phase, name, start, duration, tid, args in snapshot]
+    return {"events": records, "dropped": dropped()}
+
+
+def dump(path, fmt="chrome"):
+    """Writes the buffered events to path as "chrome" trace or "json" records; returns the event count."""
+    import json
+
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown trace format: {fmt!r}")
+    snapshot = events()
+    data = to_chrome(snapshot) if fmt == "chrome" else to_records(snapshot)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, default=str)
+    return len(snapshot)
+
+
+def summary(snapshot=None):
+    """Lines with the count, median, 95th percentile and total milliseconds of every span name."""
+    snapshot = events() if snapshot is None else snapshot
+    durations = collections.defaultdict(list)
+    for phase, name, _, duration, _, _ in snapshot:
+        if phase == "X":
+            durations[name].append(duration / 1e6)
+    lines = [f"{'span':<28} {'count':>7} {'median':>10} {'p95':>10} {'total':>11}"]
+    for name, values in sorted(durations.items(), key=lambda item: -sum(item[1])):
+        values.sort()
+        p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+        lines.append(f"{name:<28} {len(values):>7} {statistics.median(values):>8.2f}ms {p95:>8.2f}ms "
+                     f"{sum(values):>9.1f}ms")
+    return lines
@@ -0,0 +1,97 @@
+import os
+import shutil
+
+import numpy as np
+
+from journal import JOURNAL_NAME, PaletteJournal
+
+
+def _saved_palette(directory):
+    """100 colors in snapshot generation 1 plus a 3-color journal tail, as after a crash."""
+    journal = PaletteJournal(directory)
+    journal.load()
+    colors = np.arange(100, dtype=np.uint32)
+    journal.insert(0, colors)
+    journal.close(colors)
+
+    journal = PaletteJournal(directory)
+    assert len(journal.load()) == 100
+    journal.insert(100, np.array([0xFF0000, 0x00FF00, 0x0000FF], dtype=np.uint32))
+    journal.close() # No final snapshot
+    return np.concatenate([colors, [0xFF0000, 0x00FF00, 0x0000FF]]).astype(np.uint32)
+
+
+def test_reload_replays_journal_on_snapshot(tmp_path):
+    expected = _saved_palette(tmp_path)
+    journal = PaletteJournal(tmp_path)
+    assert np.array_equal(journal.load(), expected)
+    assert journal.set_aside_path is None
+    journal.close()
+
+
+def test_unreadable_snapshot_is_set_aside(tmp_path):
+    expected = _saved_palette(tmp_path)
+    snapshot = tmp_path / "palette.1.cmpal"
+    intact = snapshot.read_bytes()
+    journal_data = (tmp_path / JOURNAL_NAME).read_bytes()
+    snapshot.write_bytes(intact[:4]) # Unreadable header
+
+    journal = PaletteJournal(tmp_path)
+    assert len(journal.load()) == 0
+    set_aside = journal.set_aside_path
+    assert set_aside is not None and os.path.dirname(set_aside) == str(tmp_path)
+    # Moved untouched: the journal is not truncated
+    with open(os.path.join(set_aside, JOURNAL_NAME), "rb") as f:
+        assert f.read() == journal_data
+    assert os.path.exists(os.path.join(set_aside, "palette.1.cmpal"))
+    journal.insert(0, np.array([0x123456], dtype=np.uint32))
+    journal.close(np.array([0x123456], dtype=np.uint32)) # Compacts into a new generation 1
+
+    # Later starts neither compact over nor delete the set-aside files
+    journal = PaletteJournal(tmp_path)
+    assert journal.load().tolist() == [0x123456]
+    journal.close(np.array([0x123456], dtype=np.uint32))
+    with open(os.path.join(set_aside, JOURNAL_NAME), "rb") as f:
+        assert f.read() == journal_data
+
+    # Once the snapshot is repaired the set-aside palette restores in full
+    recovered = tmp_path / "recovered"
+    shutil.copytree(set_aside, recovered)
+    (recovered / "palette.1.cmpal").write_bytes(intact)
+    journal = PaletteJournal(recovered)
+    assert np.array_equal(journal.load(), expected)
+    journal.close()
+
+
+def test_unreadable_journal_is_set_aside(tmp_path):
+    expected = _saved_palette(tmp_path)
+    snapshot_data = (tmp_path / "palette.1.cmpal").read_bytes()
+    journal_data = (tmp_path / JOURNAL_NAME).read_bytes()
+    (tmp_path / JOURNAL_NAME).write_bytes(b"") # Rename not yet durable at the crash
+
+    journal = PaletteJournal(tmp_path)
+    assert len(journal.load()) == 0
+    set_aside = journal.set_aside_path
+    assert set_aside is not None
+    # The intact snapshot is kept, not deleted as stale
+    with open(os.path.join(set_aside, "palette.1.cmpal"), "rb") as f:
+        assert f.read() == snapshot_data
+    journal.close(np.array([0x123456], dtype=np.uint32))
+
+    # With its journal restored the set-aside palette loads again
+    recovered = tmp_path / "recovered"
+    shutil.copytree(set_aside, recovered)
+    (recovered / JOURNAL_NAME).write_bytes(journal_data)
+    journal = PaletteJournal(recovered)
+    assert np.array_equal(journal.load(), expected)
+    journal.close()
+
+
+def test_missing_journal_keeps_snapshots(tmp_path):
+    _saved_palette(tmp_path)
+    os.unlink(tmp_path / JOURNAL_NAME)
+
+    journal = PaletteJournal(tmp_path)
+    assert len(journal.load()) == 0
+    assert os.path.exists(os.path.join(journal.set_aside_path, "palette.1.cmpal"))
+    journal.close()
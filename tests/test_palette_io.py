@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from palette_io import PaletteFormatError, iter_palette_colors
+
+
+def _write_json(tmp_path, colors):
+    path = tmp_path / "palette.json"
+    path.write_text(json.dumps({"name": "Test", "colors": colors}), encoding="utf-8")
+    return path
+
+
+def test_json_entries(tmp_path):
+    path = _write_json(tmp_path, ["#FF8800", {"hex": "00ff00"}, {"rgb": [1, 2, 3]}])
+    assert list(iter_palette_colors(path)) == [0xFF8800, 0x00FF00, 0x010203]
+
+
+@pytest.mark.parametrize("entry", [
+    {"rgb": [1, 2]},
+    {"rgb": [1, 2, 3, 4]},
+    {"rgb": ["a", "b", "c"]},
+    {"rgb": [1.5, 2, 3]},
+    {"rgb": [True, 0, 0]},
+    {"rgb": [0, 0, 256]},
+    {"rgb": [-1, 0, 0]},
+    {"rgb": "1,2,3"},
+    {"hex": 123},
+    {"hex": None},
+    {"hex": "#12345"},
+    {"name": "red"},
+    123,
+    None,
+    ["#FF0000"],
+])
+def test_malformed_json_entry(tmp_path, entry):
+    path = _write_json(tmp_path, ["#FF0000", entry])
+    with pytest.raises(PaletteFormatError):
+        list(iter_palette_colors(path))
+
+
+def test_csv_hex_and_rgb(tmp_path):
+    path = tmp_path / "palette.csv"
+    path.write_text("HEX,R,G,B\n#FF8800,255,136,0\n", encoding="utf-8")
+    assert list(iter_palette_colors(path)) == [0xFF8800]
+    path.write_text("R,G,B\n1,2,3\n", encoding="utf-8")
+    assert list(iter_palette_colors(path)) == [0x010203]
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from sampling import SampleMode, reduce_region
+
+
+def _region(height=64, width=64, color=(0, 0, 0)):
+    return np.full((height, width, 3), color, dtype=np.uint8)
+
+
+def test_center():
+    pixels = _region()
+    pixels[32, 32] = (1, 2, 3)
+    assert reduce_region(pixels, SampleMode.CENTER) == (1, 2, 3)
+
+
+def test_mean():
+    pixels = _region(2, 2)
+    pixels[0] = (100, 0, 255)
+    assert reduce_region(pixels, SampleMode.MEAN) == (50, 0, 128)
+
+
+def test_median():
+    pixels = _region(1, 5)
+    pixels[0] = [(10, 90, 0), (20, 80, 0), (30, 70, 255), (40, 60, 255), (50, 50, 255)]
+    assert reduce_region(pixels, SampleMode.MEDIAN) == (30, 70, 255)
+
+
+def test_mode_on_noisy_region():
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 256, (512, 512, 3), dtype=np.uint8)
+    # 40 scattered pixels of one color; no noise color repeats that often
+    ys, xs = rng.integers(0, 512, (2, 40))
+    pixels[ys, xs] = (12, 34, 56)
+    assert reduce_region(pixels, SampleMode.MODE) == (12, 34, 56)
+
+
+def test_mode_exact_color_outside_the_largest_bucket():
+    pixels = _region(10, 10, (200, 200, 200))
+    # A bucket of 60 distinct near-blacks outnumbers the 40 grey pixels
+    pixels[:6] = np.stack([np.arange(60) % 8, np.arange(60) // 8, np.zeros(60)], axis=1).reshape(6, 10, 3)
+    assert reduce_region(pixels, SampleMode.MODE) == (200, 200, 200)
+
+
+def test_dominant_averages_the_largest_bucket():
+    pixels = _region(10, 10, (250, 0, 0))
+    pixels[:6] = (0, 0, 200)
+    pixels[:3] = (0, 0, 202) # Same bucket
+    assert reduce_region(pixels, SampleMode.DOMINANT) == (0, 0, 201)
+
+
+@pytest.mark.parametrize("mode", list(SampleMode))
+def test_uniform_region(mode):
+    assert reduce_region(_region(color=(7, 8, 9)), mode) == (7, 8, 9)